@@ -0,0 +1,5 @@
+"""
+TecMedHub - Cliente Robusto para Impresoras Klipper/Moonraker
+
+Un módulo por componente; el punto de entrada es klipper_client.py.
+"""
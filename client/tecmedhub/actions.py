@@ -0,0 +1,276 @@
+"""
+TecMedHub - Registro de acciones
+"""
+
+import sys
+import os
+import logging
+import math
+import importlib
+import importlib.util
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Tuple
+
+from .config import MAX_BED_TEMP, MAX_HOTEND_TEMP
+from .moonraker import MoonrakerInterface
+
+
+def _to_number(value: Any) -> Any:
+    """Convertir a número conservando enteros (S200, no S200.0)"""
+    if isinstance(value, bool):
+        raise ValueError("booleano no es número")
+    number = float(value)
+    if math.isnan(number) or math.isinf(number):
+        raise ValueError("número no finito")
+    return int(number) if number.is_integer() else number
+
+
+def _to_dict(value: Any) -> Dict:
+    """Validar que el parámetro sea un objeto JSON"""
+    if not isinstance(value, dict):
+        raise ValueError("se esperaba un objeto")
+    return value
+
+
+class CommandAction:
+    """Acción registrada con su esquema de parámetros, prioridad, clase de rate limit y handler
+    
+    Una acción se resuelve de dos formas:
+    - gcode(params) -> List[str]: líneas G-code (se pueden agrupar en lote)
+    - handler(processor, params) -> bool: lógica arbitraria
+    """
+    
+    # Prioridad hasta la que una acción se adelanta a las demás del mismo lote
+    URGENT_PRIORITY = 10
+    
+    PARAM_TYPES = {
+        'number': _to_number,
+        'int': int,
+        'str': str,
+        'dict': _to_dict
+    }
+    
+    def __init__(self, name: str, handler=None, gcode=None, params: Optional[Dict] = None,
+                 priority: int = 50, rate_class: str = 'default', dangerous: bool = False,
+                 security_check: Optional[str] = None):
+        if (handler is None) == (gcode is None):
+            raise ValueError(f"La acción {name} necesita handler o gcode (solo uno)")
+        
+        self.name = name
+        self.handler = handler
+        self.gcode = gcode
+        self.priority = priority
+        self.rate_class = rate_class
+        self.dangerous = dangerous
+        self.security_check = security_check  # None, 'gcode' o 'macro'
+        self.validate = self._compile_schema(name, params or {})
+    
+    @classmethod
+    def _compile_schema(cls, action_name: str, schema: Dict):
+        """Compilar el esquema a una función de validación"""
+        compiled = []
+        for name, spec in schema.items():
+            kind = spec.get('type', 'number')
+            if kind not in cls.PARAM_TYPES:
+                raise ValueError(f"Tipo de parámetro desconocido en {action_name}.{name}: {kind}")
+            compiled.append((
+                name,
+                cls.PARAM_TYPES[kind],
+                spec.get('default'),
+                spec.get('min'),
+                spec.get('max'),
+                spec.get('required', False)
+            ))
+        compiled = tuple(compiled)
+        
+        def validate(cmd: Dict) -> Dict:
+            params = dict(cmd)
+            for name, convert, default, minimum, maximum, required in compiled:
+                value = cmd.get(name)
+                if value is None or value == '':
+                    if required:
+                        raise ValueError(f"Parámetro requerido: {name}")
+                    params[name] = default
+                    continue
+                
+                try:
+                    value = convert(value)
+                except (TypeError, ValueError):
+                    raise ValueError(f"Parámetro inválido {name}: {value!r}")
+                
+                if (minimum is not None and value < minimum) or \
+                   (maximum is not None and value > maximum):
+                    raise ValueError(f"{name}={value} fuera de rango [{minimum}, {maximum}]")
+                params[name] = value
+            return params
+        
+        return validate
+
+
+class ActionRegistry:
+    """Tabla de despacho de acciones (búsqueda O(1) por nombre)"""
+    
+    def __init__(self):
+        self.actions = {}
+    
+    def register(self, name: str, **kwargs) -> CommandAction:
+        """Registrar (o reemplazar) una acción"""
+        action = CommandAction(name, **kwargs)
+        self.actions[name] = action
+        return action
+    
+    def get(self, name: Optional[str]) -> Optional[CommandAction]:
+        """Buscar acción por nombre"""
+        return self.actions.get(name)
+    
+    def names(self) -> List[str]:
+        """Nombres de acciones registradas"""
+        return sorted(self.actions)
+    
+    def load_plugins(self, plugins: List[str], logger: logging.Logger, loaded: Optional[Dict] = None):
+        """Cargar módulos de plugins que definen register_actions(registry)
+        
+        loaded: plugin -> (firma del archivo, módulo) de cargas anteriores; un
+        plugin solo se vuelve a ejecutar si su archivo cambió.
+        """
+        loaded = {} if loaded is None else loaded
+        for plugin in plugins:
+            try:
+                signature, module = loaded.get(plugin, (None, None))
+                reloaded = module is None or self._plugin_signature(plugin) != signature
+                if reloaded:
+                    module = self._load_plugin(plugin, module)
+                    loaded[plugin] = (self._plugin_signature(plugin), module)
+                
+                before = set(self.actions)
+                module.register_actions(self)
+                if reloaded:
+                    added = sorted(set(self.actions) - before)
+                    logger.info(f"🔌 Plugin cargado: {plugin} ({', '.join(added) or 'sin acciones nuevas'})")
+                
+            except Exception as e:
+                # Un plugin roto no debe impedir que el cliente arranque
+                loaded.pop(plugin, None)
+                logger.warning(f"No se pudo cargar plugin {plugin}: {e}")
+    
+    @staticmethod
+    def _plugin_signature(plugin: str) -> Optional[Tuple[int, int]]:
+        """Firma (mtime, tamaño) del archivo del plugin, None si no se conoce"""
+        path = plugin if plugin.endswith('.py') else getattr(sys.modules.get(plugin), '__file__', None)
+        try:
+            st = os.stat(path)
+            return (st.st_mtime_ns, st.st_size)
+        except (OSError, TypeError):
+            return None
+    
+    @staticmethod
+    def _load_plugin(plugin: str, previous=None):
+        """Ejecutar (o volver a ejecutar) el módulo de un plugin"""
+        if plugin.endswith('.py'):
+            module_name = f"tecmedhub_plugin_{Path(plugin).stem}"
+            spec = importlib.util.spec_from_file_location(module_name, plugin)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            return module
+        if previous is not None:
+            return importlib.reload(previous)
+        return importlib.import_module(plugin)
+
+
+def register_builtin_actions(registry: ActionRegistry):
+    """Acciones incluidas en el cliente"""
+    from .commands import CommandProcessor  # commands importa este módulo
+    
+    def command(endpoint: str):
+        return lambda processor, params: processor.moonraker.command(endpoint)
+    
+    # Comandos de movimiento
+    registry.register('home', gcode=lambda p: ["G28"])
+    registry.register('home_x', gcode=lambda p: ["G28 X"])
+    registry.register('home_y', gcode=lambda p: ["G28 Y"])
+    registry.register('home_z', gcode=lambda p: ["G28 Z"])
+    
+    # Comandos de temperatura
+    registry.register(
+        'heat',
+        gcode=lambda p: [f"M104 S{p['hotend_temp']}", f"M140 S{p['bed_temp']}"],
+        params={
+            'hotend_temp': {'type': 'number', 'default': 200, 'min': 0, 'max': MAX_HOTEND_TEMP},
+            'bed_temp': {'type': 'number', 'default': 60, 'min': 0, 'max': MAX_BED_TEMP}
+        }
+    )
+    registry.register('cool_down', gcode=lambda p: ["M104 S0", "M140 S0"])
+    
+    # Control de impresión
+    registry.register('pause', handler=command("printer/print/pause"), priority=10, rate_class='critical')
+    registry.register('resume', handler=command("printer/print/resume"))
+    registry.register('cancel', handler=command("printer/print/cancel"), priority=10, rate_class='critical')
+    registry.register(
+        'print',
+        handler=CommandProcessor.print_file,
+        params={
+            'file': {'type': 'str', 'required': True},
+            'download_url': {'type': 'str', 'default': ''},
+            'checksum': {'type': 'str', 'default': ''},
+            'hotend_temp': {'type': 'number', 'default': None, 'min': 0, 'max': MAX_HOTEND_TEMP},
+            'bed_temp': {'type': 'number', 'default': None, 'min': 0, 'max': MAX_BED_TEMP}
+        }
+    )
+    
+    # Velocidad y flow
+    registry.register(
+        'set_speed',
+        gcode=lambda p: [f"M220 S{p['speed']}"],
+        params={'speed': {'type': 'number', 'default': 100, 'min': 10, 'max': 200}}  # Rango de api/commands.php
+    )
+    registry.register(
+        'set_flow',
+        gcode=lambda p: [f"M221 S{p['flow']}"],
+        params={'flow': {'type': 'number', 'default': 100}}
+    )
+    
+    # Ventiladores
+    registry.register('toggle_fan', gcode=lambda p: ["M106 S255"])
+    registry.register(
+        'set_fan',
+        gcode=lambda p: [f"M106 S{p['speed']}"],
+        params={'speed': {'type': 'number', 'default': 255, 'min': 0, 'max': 255}}
+    )
+    registry.register('fan_off', gcode=lambda p: ["M107"])
+    
+    # Sistema
+    registry.register('emergency_stop', handler=command("printer/emergency_stop"),
+                      priority=0, rate_class='critical', dangerous=True)
+    registry.register('firmware_restart', handler=command("printer/firmware_restart"),
+                      rate_class='system', dangerous=True)
+    registry.register('reboot', handler=command("machine/reboot"),
+                      rate_class='system', dangerous=True)
+    registry.register('shutdown', handler=command("machine/shutdown"),
+                      rate_class='system', dangerous=True)
+    
+    # Diagnóstico
+    registry.register(
+        'profile',
+        handler=CommandProcessor.start_profile,
+        params={'duration': {'type': 'number', 'default': 0, 'min': 0, 'max': 3600}},
+        rate_class='system'
+    )
+    
+    # Comando G-code personalizado
+    registry.register(
+        'gcode',
+        gcode=lambda p: [line.strip() for line in p['gcode'].splitlines() if line.strip()],
+        params={'gcode': {'type': 'str', 'required': True}},
+        security_check='gcode'
+    )
+    
+    # Macro de Klipper
+    registry.register(
+        'macro',
+        gcode=lambda p: [MoonrakerInterface.format_macro(p['macro_name'], **(p['params'] or {}))],
+        params={
+            'macro_name': {'type': 'str', 'required': True},
+            'params': {'type': 'dict', 'default': None}
+        },
+        security_check='macro'
+    )
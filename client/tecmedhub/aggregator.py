@@ -0,0 +1,551 @@
+"""
+TecMedHub - Agregador de laboratorio (edge)
+"""
+
+import time
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+import signal
+import threading
+
+from .config import ConfigManager
+from .log import setup_logging
+from .state import JsonStateBackend
+from .http_client import RobustHTTPClient
+
+
+class EdgeAggregator:
+    """Un solo enlace al servidor para todas las impresoras de un laboratorio
+    
+    Corre en una máquina del laboratorio (klipper_client.py --aggregator) y
+    habla el mismo protocolo que el servidor PHP, así que a los clientes solo
+    se les cambia server_url/files_url para apuntar a él. Hacia el servidor:
+    - update_printer se combina (queda el último por impresora) y se envía
+      junto con el resto de acciones POST en un solo 'batch' comprimido
+      cada batch_interval;
+    - los comandos se piden para todas las impresoras en una sola consulta
+      (long-poll si el servidor la admite) y se reparten a cada una;
+    - las descargas (action=download_file) se guardan en cache_dir y se
+      comparten entre impresoras, pero solo se sirven a un printer_token que
+      el servidor autorizó para ese archivo (la descarga misma o list_files).
+    Si el servidor no admite 'batch' o get_commands con varios tokens, se
+    vuelve a peticiones individuales, pero siempre desde una sola sesión.
+    Durante un corte del enlace los clientes siguen funcionando: las
+    actualizaciones se combinan, las demás acciones esperan en un outbox
+    persistente (respuesta 202 'queued', nunca 'success') y los archivos ya
+    descargados se siguen sirviendo a quien ya tenía permiso.
+    """
+    
+    TOKEN_PARAMS = ('token', 'printer_token')
+    # Acciones cuya confirmación mueve un cursor en el cliente: no se encolan,
+    # pasan al servidor y el cliente reintenta desde su propio registro
+    PASSTHROUGH_ACTIONS = ('sync_jobs',)
+    MAX_GRANTS = 10000
+    POOL_SIZE = 32  # Conexiones abiertas al servidor (proxy, lotes y long-poll)
+    
+    def __init__(self, config_path: str):
+        self.config_manager = ConfigManager(config_path)
+        self.config = self.config_manager.config
+        self.logger = setup_logging(self.config)
+        
+        agg_config = self.config.get('aggregator', {})
+        server = urlparse(self.config['server_url'])
+        self.server_url = self.config['server_url']
+        self.upstream = (agg_config.get('upstream') or f"{server.scheme}://{server.netloc}").rstrip('/')
+        self.port = agg_config.get('port', 7140)
+        self.bind = agg_config.get('bind', '0.0.0.0')
+        self.batch_interval = max(agg_config.get('batch_interval', 5), 0.5)
+        self.command_interval = max(agg_config.get('command_interval', 3), 0.5)
+        self.long_poll = agg_config.get('long_poll', 25)
+        self.compress = agg_config.get('compress', True)
+        self.max_outbox = agg_config.get('max_outbox', 5000)
+        self.cache_dir = Path(agg_config.get('cache_dir', 'aggregator_cache'))
+        self.cache_max = agg_config.get('cache_max_mb', 2048) * 1024 * 1024
+        self.grant_ttl = agg_config.get('grant_ttl', 300)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        
+        # Clientes hacia el servidor sobre una sola sesión: lotes, comandos
+        # (long-poll) y proxy (un hilo por petición de las impresoras)
+        self.http = RobustHTTPClient(self.config, self.logger, RobustHTTPClient.new_session(self.POOL_SIZE))
+        self.command_http = self.http.fork()
+        self.proxy_http = self.http.fork()
+        
+        self.lock = threading.Lock()
+        self.pending = {}       # token -> último update_printer
+        self.inbox = {}         # token -> comandos por entregar
+        self.hints = {}         # token -> indicación de cámara del servidor
+        self.printers = {}      # token -> última vez visto (monotonic)
+        self.file_locks = {}    # clave de caché -> [Lock, usuarios] (una sola descarga por archivo)
+        self.grants = {}        # (token, ruta, archivo) -> cuándo lo autorizó el servidor (monotonic)
+        self.batch_supported = True
+        self.multi_commands_supported = True
+        self.outbox_backend = JsonStateBackend(agg_config.get('outbox_file', 'aggregator_outbox.json'))
+        try:
+            self.outbox = self.outbox_backend.read() or []
+        except Exception as e:
+            self.logger.warning(f"Outbox ilegible, se descarta: {e}")
+            self.outbox = []
+        self.outbox_dirty = False
+        # Los comandos que el servidor ya entregó (y borró) no se pierden al reiniciar
+        self.inbox_backend = JsonStateBackend(agg_config.get('inbox_file', 'aggregator_inbox.json'))
+        try:
+            self.inbox = self.inbox_backend.read() or {}
+        except Exception as e:
+            self.logger.warning(f"Inbox ilegible, se descarta: {e}")
+        
+        self.stop_event = threading.Event()
+        self.httpd = None
+        self.threads = []
+        self.stats = {'client_requests': 0, 'upstream_requests': 0, 'bytes_raw': 0,
+                      'bytes_sent': 0, 'cache_hits': 0, 'cache_misses': 0}
+        
+        signal.signal(signal.SIGINT, lambda sig, frame: self.stop_event.set())
+        signal.signal(signal.SIGTERM, lambda sig, frame: self.stop_event.set())
+    
+    def run(self):
+        """Loop principal: enviar lotes cada batch_interval"""
+        self._start_server()
+        command_thread = threading.Thread(target=self._command_loop, name='aggregator-commands', daemon=True)
+        command_thread.start()
+        self.threads.append(command_thread)
+        
+        self.logger.info("="*70)
+        self.logger.info(f"🏫 Agregador de laboratorio en el puerto {self.port}")
+        self.logger.info(f"Servidor: {self.server_url}")
+        self.logger.info("="*70)
+        
+        last_report = time.monotonic()
+        try:
+            while not self.stop_event.wait(self.batch_interval):
+                self.flush()
+                if time.monotonic() - last_report >= self.config['intervals'].get('health_check', 60):
+                    self.report()
+                    last_report = time.monotonic()
+        finally:
+            self.shutdown()
+    
+    def shutdown(self):
+        """Enviar lo pendiente y guardar el outbox"""
+        self.logger.info("🛑 Deteniendo agregador...")
+        self.stop_event.set()
+        try:
+            self.flush()
+        except Exception as e:
+            self.logger.warning(f"No se pudo enviar el último lote: {e}")
+        self._save_outbox()
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+    
+    def _count(self, key: str, amount: int = 1):
+        with self.lock:
+            self.stats[key] += amount
+    
+    def report(self):
+        """Resumir peticiones de clientes frente a peticiones al servidor"""
+        with self.lock:
+            stats = dict(self.stats)
+            for key in self.stats:
+                self.stats[key] = 0
+        active = sum(1 for seen in self.printers.values() if time.monotonic() - seen < 300)
+        ratio = stats['bytes_sent'] / stats['bytes_raw'] if stats['bytes_raw'] else 1
+        self.logger.info(
+            f"📦 {stats['client_requests']} peticiones de {active} impresoras → "
+            f"{stats['upstream_requests']} al servidor; lotes al {ratio:.0%} de su tamaño; "
+            f"caché {stats['cache_hits']}/{stats['cache_hits'] + stats['cache_misses']}; "
+            f"outbox {len(self.outbox)}"
+        )
+    
+    # --- Lado del servidor -------------------------------------------------
+    
+    def flush(self):
+        """Enviar las actualizaciones combinadas y el outbox"""
+        with self.lock:
+            updates, self.pending = self.pending, {}
+            queued = list(self.outbox)
+        if not updates and not queued:
+            return
+        
+        if self.batch_supported:
+            result = self._post_batch(list(updates.values()) + [item['payload'] for item in queued])
+            if result is not None and result.get('success'):
+                self._sent(queued)
+                for token, item in (result.get('results') or {}).items():
+                    if isinstance(item, dict) and isinstance(item.get('camera'), dict):
+                        self.hints[token] = item['camera']
+                return
+            if result is None:
+                self._requeue(updates)  # Servidor caído: reintentar en el próximo lote
+                return
+            self.batch_supported = False
+            self.logger.warning("⚠️  El servidor no admite 'batch'; se envía de a una petición")
+        
+        for token, payload in updates.items():
+            result = self._post(payload)
+            if result is None:
+                self._requeue(updates)
+                return
+            if isinstance(result.get('camera'), dict):
+                self.hints[token] = result['camera']
+        sent = []
+        for item in queued:
+            if self._post(item['payload']) is None:
+                break
+            sent.append(item)
+        self._sent(sent)
+    
+    def _requeue(self, updates: Dict):
+        with self.lock:
+            for token, payload in updates.items():
+                self.pending.setdefault(token, payload)  # Si ya llegó uno más nuevo, gana ese
+    
+    def _sent(self, items: List[Dict]):
+        if not items:
+            return
+        sent = {id(item) for item in items}
+        with self.lock:
+            self.outbox = [item for item in self.outbox if id(item) not in sent]
+            self.outbox_dirty = True
+        self._save_outbox()
+    
+    def _save_outbox(self):
+        if not self.outbox_dirty:
+            return
+        with self.lock:
+            snapshot = list(self.outbox)
+            self.outbox_dirty = False
+        try:
+            self.outbox_backend.write(snapshot)
+        except Exception as e:
+            self.logger.warning(f"Error guardando outbox: {e}")
+    
+    def _post_batch(self, items: List[Dict]) -> Optional[Dict]:
+        """Un solo POST con todos los items (gzip); None si el servidor no respondió"""
+        body = json.dumps({'action': 'batch', 'items': items}, separators=(',', ':')).encode()
+        headers = {'Content-Type': 'application/json'}
+        self._count('bytes_raw', len(body))
+        if self.compress:
+            import gzip
+            body = gzip.compress(body, compresslevel=6)
+            headers['Content-Encoding'] = 'gzip'
+        self._count('bytes_sent', len(body))
+        return self._upstream_json(self.http, 'POST', self.server_url, data=body, headers=headers)
+    
+    def _post(self, payload: Dict) -> Optional[Dict]:
+        return self._upstream_json(self.http, 'POST', self.server_url, json=payload)
+    
+    def _upstream_json(self, http: RobustHTTPClient, method: str, url: str, timeout=None, **kwargs) -> Optional[Dict]:
+        self._count('upstream_requests')
+        response = http.request(method, url, max_attempts=1,
+                                timeout=timeout or self.config['timeouts']['server'], **kwargs)
+        if response is None:
+            return None
+        try:
+            result = response.json()
+        except ValueError:
+            return {'success': False, 'message': 'Respuesta no JSON'}
+        return result if isinstance(result, dict) else {'success': False}
+    
+    def _command_loop(self):
+        """Pedir los comandos de todas las impresoras y repartirlos"""
+        while not self.stop_event.is_set():
+            started = time.monotonic()
+            now = time.monotonic()
+            tokens = sorted(token for token, seen in self.printers.items() if now - seen < 300)
+            if tokens:
+                try:
+                    self._fetch_commands(tokens)
+                except Exception as e:
+                    self.logger.debug(f"Error consultando comandos: {e}")
+            self.stop_event.wait(max(self.command_interval - (time.monotonic() - started), 0))
+    
+    def _fetch_commands(self, tokens: List[str]):
+        if self.multi_commands_supported:
+            result = self._upstream_json(
+                self.command_http, 'GET', self.server_url,
+                params={'action': 'get_commands', 'tokens': ','.join(tokens), 'wait': self.long_poll},
+                timeout=self.long_poll + self.config['timeouts']['server']
+            )
+            if result is None:
+                return
+            if result.get('success') and isinstance(result.get('commands'), dict):
+                for token, commands in result['commands'].items():
+                    self._deliver(token, commands)
+                return
+            self.multi_commands_supported = False
+            self.logger.warning("⚠️  El servidor no admite get_commands con varios tokens; se consulta de a uno")
+        
+        for token in tokens:
+            result = self._upstream_json(self.command_http, 'GET', self.server_url,
+                                         params={'action': 'get_commands', 'token': token})
+            if result is None:
+                return
+            if result.get('success'):
+                self._deliver(token, result.get('commands') or [])
+    
+    def _deliver(self, token: str, commands):
+        if isinstance(commands, list) and commands:
+            with self.lock:
+                self.inbox.setdefault(token, []).extend(commands)
+            self._save_inbox()
+    
+    def _save_inbox(self):
+        with self.lock:
+            snapshot = {token: list(commands) for token, commands in self.inbox.items()}
+        try:
+            self.inbox_backend.write(snapshot)
+        except Exception as e:
+            self.logger.warning(f"Error guardando inbox: {e}")
+    
+    # --- Lado de las impresoras --------------------------------------------
+    
+    def _start_server(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        
+        aggregator = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            
+            def log_message(self, format, *args):
+                aggregator.logger.debug(f"{self.client_address[0]}: {format % args}")
+            
+            def do_GET(self):
+                aggregator._count('client_requests')
+                aggregator.handle_get(self)
+            
+            def do_POST(self):
+                aggregator._count('client_requests')
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                aggregator.handle_post(self, body)
+        
+        self.httpd = ThreadingHTTPServer((self.bind, self.port), Handler)
+        self.httpd.daemon_threads = True
+        thread = threading.Thread(target=self.httpd.serve_forever, name='aggregator-http', daemon=True)
+        thread.start()
+        self.threads.append(thread)
+    
+    @staticmethod
+    def _reply(handler, payload: Dict, status: int = 200):
+        body = json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header('Content-Type', 'application/json')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+    
+    def handle_post(self, handler, body: bytes):
+        path = urlparse(handler.path).path
+        if not path.endswith('api.php'):
+            return self._proxy(handler, 'POST', body)
+        try:
+            payload = json.loads(body or b'{}')
+        except ValueError:
+            return self._reply(handler, {'success': False, 'message': 'JSON inválido'}, 400)
+        
+        action = payload.get('action') if isinstance(payload, dict) else None
+        token = payload.get('token') if isinstance(payload, dict) else None
+        if action == 'update_printer' and token:
+            with self.lock:
+                self.pending[token] = payload
+                self.printers[token] = time.monotonic()
+            reply = {'success': True, 'message': 'OK'}
+            if token in self.hints:
+                reply['camera'] = self.hints[token]
+            return self._reply(handler, reply)
+        
+        if action and action not in self.PASSTHROUGH_ACTIONS:
+            # Guardar y confirmar: el outbox persiste y nunca descarta lo aceptado,
+            # así que se envía en el próximo lote aunque el servidor esté caído
+            with self.lock:
+                full = len(self.outbox) >= self.max_outbox
+                if not full:
+                    self.outbox.append({'payload': payload})
+                    self.outbox_dirty = True
+            if full:
+                self.logger.warning(f"Outbox lleno: se rechaza '{action}'")
+                return self._reply(handler, {'success': False, 'message': 'Outbox lleno'}, 503)
+            return self._reply(handler, {'success': True, 'queued': True, 'message': 'Encolado'})
+        
+        self._proxy(handler, 'POST', body)
+    
+    def handle_get(self, handler):
+        url = urlparse(handler.path)
+        query = parse_qs(url.query)
+        action = query.get('action', [''])[0]
+        
+        if action == 'get_commands' and query.get('token'):
+            token = query['token'][0]
+            with self.lock:
+                self.printers[token] = time.monotonic()
+                commands = self.inbox.pop(token, [])
+            if commands:
+                self._save_inbox()
+            # Que las descargas de los comandos también pasen por la caché del agregador
+            base = f"http://{handler.headers.get('Host', f'127.0.0.1:{self.port}')}"
+            for index, command in enumerate(commands):
+                if isinstance(command, dict) and str(command.get('download_url', '')).startswith(self.upstream):
+                    commands[index] = dict(command, download_url=base + command['download_url'][len(self.upstream):])
+            return self._reply(handler, {'success': True, 'commands': commands})
+        
+        if action == 'download_file':
+            return self._serve_cached(handler, url, query)
+        
+        self._proxy(handler, 'GET', None)
+    
+    def _proxy(self, handler, method: str, body: Optional[bytes]):
+        """Pasar la petición tal cual al servidor (imágenes, get_printers, ...)"""
+        headers = {key: handler.headers[key] for key in ('Content-Type',) if handler.headers.get(key)}
+        self._count('upstream_requests')
+        response = self.proxy_http.request(method, self.upstream + handler.path, data=body, headers=headers,
+                                           timeout=self.config['timeouts']['server'], max_attempts=1)
+        if response is None:
+            return self._reply(handler, {'success': False, 'message': 'Servidor no disponible'}, 502)
+        handler.send_response(response.status_code)
+        handler.send_header('Content-Type', response.headers.get('Content-Type', 'application/octet-stream'))
+        handler.send_header('Content-Length', str(len(response.content)))
+        handler.end_headers()
+        handler.wfile.write(response.content)
+    
+    def _cache_key(self, url, query: Dict) -> str:
+        """Misma clave para todas las impresoras: sin los tokens de la URL"""
+        import hashlib
+        
+        params = sorted((key, value) for key, values in query.items()
+                        if key not in self.TOKEN_PARAMS for value in values)
+        return hashlib.sha1(f"{url.path}?{params}".encode()).hexdigest()
+    
+    def _serve_cached(self, handler, url, query: Dict):
+        token = next((query[key][0] for key in self.TOKEN_PARAMS if query.get(key)), '')
+        filename = os.path.basename(query.get('file', [''])[0])
+        if not token or not filename:
+            return self._proxy(handler, 'GET', None)  # Que el servidor conteste el error
+        
+        key = self._cache_key(url, query)
+        path = self.cache_dir / key
+        grant = (token, url.path, filename)
+        with self.lock:
+            entry = self.file_locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+        
+        # El archivo se abre con el lock tomado: si después _trim_cache lo
+        # borra, el descriptor abierto se sigue pudiendo leer. Las respuestas
+        # se envían ya fuera del lock.
+        error = None
+        try:
+            with entry[0]:
+                f = self._open_cached(path)
+                if f is not None:
+                    if self._authorized(grant, url.path):
+                        self._count('cache_hits')
+                    else:
+                        f.close()
+                        f, error = None, 'No autorizado para descargar este archivo'
+                else:
+                    self._count('cache_misses')
+                    error = self._fetch_to_cache(handler.path, path)
+                    f = self._open_cached(path) if error is None else None
+                    if f is not None:
+                        self._grant(grant)  # El servidor ya revisó este token al entregar el archivo
+                        self._trim_cache()
+        finally:
+            with self.lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    self.file_locks.pop(key, None)
+        
+        if f is None:
+            error = error or 'Archivo no encontrado'
+            return self._reply(handler, {'success': False, 'message': error},
+                               502 if error == 'Servidor no disponible' else 200)
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            handler.send_response(200)
+            handler.send_header('Content-Type', 'application/octet-stream')
+            handler.send_header('Content-Length', str(size))
+            handler.end_headers()
+            for chunk in iter(lambda: f.read(65536), b''):
+                handler.wfile.write(chunk)
+    
+    @staticmethod
+    def _open_cached(path: Path):
+        """Abrir una copia de la caché marcándola como usada; None si no está"""
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(f.fileno())
+        except OSError:
+            pass
+        return f
+    
+    def _authorized(self, grant, files_path: str) -> bool:
+        """¿Puede este token bajar el archivo? Mismo criterio que files.php
+        (propio de la impresora o global), preguntado con list_files y
+        recordado grant_ttl segundos. Sin servidor valen los permisos viejos."""
+        with self.lock:
+            granted = self.grants.get(grant)
+        if granted is not None and time.monotonic() - granted < self.grant_ttl:
+            return True
+        
+        token, _, filename = grant
+        result = self._upstream_json(self.proxy_http, 'GET', self.upstream + files_path,
+                                     params={'action': 'list_files', 'printer_token': token})
+        if result is None:
+            return granted is not None
+        files = result.get('files') if result.get('success') else None
+        if isinstance(files, list) and any(isinstance(f, dict) and f.get('name') == filename for f in files):
+            self._grant(grant)
+            return True
+        with self.lock:
+            self.grants.pop(grant, None)
+        return False
+    
+    def _grant(self, grant):
+        now = time.monotonic()
+        with self.lock:
+            self.grants[grant] = now
+            if len(self.grants) > self.MAX_GRANTS:
+                recent = sorted(self.grants.items(), key=lambda item: item[1])[-self.MAX_GRANTS // 2:]
+                self.grants = {key: seen for key, seen in recent if now - seen < self.grant_ttl}
+    
+    def _fetch_to_cache(self, request_path: str, path: Path) -> Optional[str]:
+        self._count('upstream_requests')
+        response = self.proxy_http.get(self.upstream + request_path, stream=True, max_attempts=1,
+                                       timeout=self.config['timeouts']['file_download'])
+        if response is None:
+            return 'Servidor no disponible'
+        if response.headers.get('content-type', '').startswith('application/json'):
+            try:
+                return response.json().get('message') or 'Archivo no encontrado'
+            except ValueError:
+                return 'Archivo no encontrado'
+        
+        part = path.with_suffix('.part')
+        try:
+            with open(part, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=65536):
+                    f.write(chunk)
+            os.replace(part, path)
+        except OSError as e:
+            part.unlink(missing_ok=True)
+            return str(e)
+        return None
+    
+    def _trim_cache(self):
+        """Borrar los archivos usados hace más tiempo si la caché pasa de cache_max_mb"""
+        files = []
+        for file_path in self.cache_dir.iterdir():
+            if file_path.suffix != '.part':
+                stat = file_path.stat()
+                files.append((stat.st_mtime, stat.st_size, file_path))
+        total = sum(size for _, size, _ in files)
+        for _, size, file_path in sorted(files):
+            if total <= self.cache_max:
+                break
+            file_path.unlink(missing_ok=True)
+            total -= size
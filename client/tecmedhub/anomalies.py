@@ -0,0 +1,217 @@
+"""
+TecMedHub - Detección de anomalías térmicas y de progreso
+"""
+
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+
+class Ewma:
+    """Promedio móvil exponencial (memoria O(1))"""
+    
+    __slots__ = ('alpha', 'value')
+    
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.value = None
+    
+    def update(self, x: float) -> float:
+        self.value = x if self.value is None else self.value + self.alpha * (x - self.value)
+        return self.value
+    
+    def reset(self):
+        self.value = None
+
+
+class Cusum:
+    """CUSUM de dos lados: acumula desvíos persistentes por encima de 'drift'"""
+    
+    __slots__ = ('drift', 'threshold', 'high', 'low')
+    
+    def __init__(self, drift: float, threshold: float):
+        self.drift = drift
+        self.threshold = threshold
+        self.high = 0.0
+        self.low = 0.0
+    
+    def update(self, deviation: float) -> bool:
+        """Agregar un desvío; True si se supera el umbral"""
+        self.high = max(0.0, self.high + deviation - self.drift)
+        self.low = max(0.0, self.low - deviation - self.drift)
+        return self.high > self.threshold or self.low > self.threshold
+    
+    def reset(self):
+        self.high = 0.0
+        self.low = 0.0
+
+
+class HeaterMonitor:
+    """Vigila un calentador: no alcanza el objetivo o se desvía una vez estable
+    
+    'raised' son las anomalías vigentes: salen al cambiar el objetivo o
+    cuando la condición se normaliza (llega al objetivo, deja de subir con el
+    calentador apagado, el CUSUM vuelve bajo el umbral).
+    """
+    
+    def __init__(self, name: str, config: Dict):
+        self.name = name
+        self.settle_band = config.get('settle_band', 3.0)
+        self.heat_timeout = config.get('heat_timeout', {}).get(name, 600)
+        self.min_heat_rate = config.get('min_heat_rate', 0.02)
+        self.off_heating_rate = config.get('off_heating_rate', 0.3)
+        self.cusum = Cusum(config.get('cusum_drift', 2.0), config.get('cusum_threshold', 30.0))
+        self.slope = Ewma(0.3)
+        self.target = None
+        self.target_since = 0.0
+        self.settled = False
+        self.last_temp = None
+        self.last_time = None
+        self.raised = set()
+    
+    def observe(self, temperature: float, target: float, now: float) -> List[Tuple[str, str]]:
+        """Procesar una muestra; devuelve anomalías nuevas (tipo, mensaje)"""
+        if target != self.target:
+            self.target = target
+            self.target_since = now
+            self.settled = False
+            self.cusum.reset()
+            self.raised.clear()
+        
+        if self.last_time is not None and now > self.last_time:
+            self.slope.update((temperature - self.last_temp) / (now - self.last_time))
+        self.last_temp = temperature
+        self.last_time = now
+        slope = self.slope.value or 0.0
+        
+        found = []
+        recovered = set()
+        if target <= 0:
+            # Calentador apagado pero la temperatura sigue subiendo
+            if slope > self.off_heating_rate and temperature > 50:
+                found.append(('thermal_runaway',
+                               f"{self.name} sube {slope:.2f}°C/s con el calentador apagado ({temperature:.1f}°C)"))
+            elif slope <= 0 or temperature <= 50:
+                recovered.add('thermal_runaway')
+        
+        elif not self.settled:
+            if abs(temperature - target) <= self.settle_band:
+                self.settled = True
+                recovered.add('heater_not_reaching_target')
+            elif now - self.target_since > self.heat_timeout and slope < self.min_heat_rate:
+                found.append(('heater_not_reaching_target',
+                              f"{self.name} no alcanza {target:.0f}°C tras {now - self.target_since:.0f}s "
+                              f"({temperature:.1f}°C, {slope:.3f}°C/s)"))
+        
+        elif self.cusum.update(temperature - target):
+            found.append(('thermal_runaway',
+                          f"{self.name} se desvía del objetivo {target:.0f}°C ({temperature:.1f}°C)"))
+        else:
+            recovered.add('thermal_runaway')  # El CUSUM volvió bajo el umbral
+        
+        self.raised -= recovered
+        new = [item for item in found if item[0] not in self.raised]
+        self.raised.update(kind for kind, _ in new)
+        return new
+
+
+class AnomalyDetector:
+    """Detector incremental sobre el estado de get_full_status()
+    
+    Cada señal guarda solo unos pocos números (EWMA, CUSUM, último cambio),
+    así que procesar una muestra cuesta lo mismo sin importar cuánto lleve
+    corriendo el cliente.
+    """
+    
+    SEVERITY = {
+        'thermal_runaway': 'critical',
+        'heater_not_reaching_target': 'warning',
+        'progress_stall': 'warning',
+        'filament_out': 'warning'
+    }
+    HEATERS = ('extruder', 'heater_bed')
+    HEATER_KINDS = ('thermal_runaway', 'heater_not_reaching_target')
+    
+    def __init__(self, config: Dict):
+        self.apply_config(config)
+    
+    def apply_config(self, config: Dict):
+        """Aplicar configuración (reinicia las estadísticas)"""
+        self.detector_config = config.get('anomaly_detection', {})
+        self.stall_seconds = self.detector_config.get('progress_stall_seconds', 900)
+        self.heaters = {name: HeaterMonitor(name, self.detector_config) for name in self.HEATERS}
+        self.last_progress = None
+        self.progress_since = 0.0
+        self.active = {}  # tipo:origen -> evento
+    
+    def observe(self, status: Dict, now: Optional[float] = None) -> List[Dict]:
+        """Procesar una muestra del estado; devuelve las anomalías nuevas"""
+        now = time.monotonic() if now is None else now
+        found = []
+        
+        for name, monitor in self.heaters.items():
+            heater = status.get(name)
+            if heater and 'temperature' in heater:
+                for kind, message in monitor.observe(heater['temperature'], heater.get('target', 0), now):
+                    found.append((kind, name, message))
+                for kind in self.HEATER_KINDS:
+                    if kind not in monitor.raised:
+                        self.active.pop(f"{kind}:{name}", None)
+        
+        state = status.get('print_stats', {}).get('state')
+        self._check_progress(status, state, now, found)
+        self._check_filament(status, state, found)
+        
+        events = []
+        for kind, source, message in found:
+            key = f"{kind}:{source}"
+            if key in self.active:
+                continue
+            event = {
+                'type': kind,
+                'source': source,
+                'severity': self.SEVERITY.get(kind, 'warning'),
+                'message': message,
+                'timestamp': datetime.now().isoformat()
+            }
+            self.active[key] = event
+            events.append(event)
+        return events
+    
+    def _check_progress(self, status: Dict, state: Optional[str], now: float, found: List):
+        """Progreso congelado mientras print_stats dice que imprime"""
+        key = 'progress_stall:print_stats'
+        if state != 'printing':
+            self.last_progress = None
+            self.active.pop(key, None)
+            return
+        
+        progress = status.get('display_status', {}).get('progress')
+        if progress is None:
+            progress = status.get('virtual_sdcard', {}).get('progress')
+        if progress is None:
+            return
+        
+        if progress != self.last_progress:
+            self.last_progress = progress
+            self.progress_since = now
+            self.active.pop(key, None)
+        elif now - self.progress_since > self.stall_seconds:
+            found.append(('progress_stall', 'print_stats',
+                          f"Progreso detenido en {progress * 100:.1f}% hace {now - self.progress_since:.0f}s"))
+    
+    def _check_filament(self, status: Dict, state: Optional[str], found: List):
+        """Sensores de filamento que reportan falta de filamento durante la impresión"""
+        for name, sensor in status.items():
+            if not name.startswith(('filament_switch_sensor', 'filament_motion_sensor')):
+                continue
+            key = f"filament_out:{name}"
+            if state in ('printing', 'paused') and sensor.get('enabled', True) \
+                    and sensor.get('filament_detected') is False:
+                found.append(('filament_out', name, f"{name}: sin filamento"))
+            else:
+                self.active.pop(key, None)
+    
+    def active_anomalies(self) -> List[Dict]:
+        """Anomalías vigentes para incluir en el estado"""
+        return list(self.active.values())
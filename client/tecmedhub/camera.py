@@ -0,0 +1,290 @@
+"""
+TecMedHub - Gestor de cámara
+"""
+
+import requests
+import time
+import os
+import logging
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import io
+
+from .http_client import RobustHTTPClient
+
+
+_pillow_image = None
+
+
+def load_pillow():
+    """Importar Pillow solo al necesitarlo (None si no está instalado)"""
+    global _pillow_image
+    if _pillow_image is None:
+        try:
+            from PIL import Image
+            _pillow_image = Image
+        except ImportError:
+            _pillow_image = False  # Sin Pillow las capturas se envían tal cual
+    return _pillow_image or None
+
+
+# ==============================================================================
+# GESTOR DE CÁMARA
+# ==============================================================================
+
+class MultipartStream:
+    """Cuerpo multipart/form-data generado al vuelo desde un stream
+    
+    El archivo se lee por bloques en un único bytearray reutilizado y se
+    entrega como memoryview, así que la memoria usada no depende del
+    tamaño de la imagen. Con longitud conocida se envía Content-Length;
+    si no, se itera con iter() y requests usa transferencia chunked.
+    """
+    
+    def __init__(self, fields: Dict[str, str], file_field: str, filename: str,
+                 content_type: str, source, length: Optional[int] = None,
+                 buffer_size: int = 64 * 1024):
+        self.boundary = os.urandom(16).hex()
+        self.source = source
+        self.file_length = length
+        self.buffer = bytearray(buffer_size)
+        
+        parts = [
+            f'--{self.boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+            for name, value in fields.items()
+        ]
+        parts.append(
+            f'--{self.boundary}\r\n'
+            f'Content-Disposition: form-data; name="{file_field}"; filename="{filename}"\r\n'
+            f'Content-Type: {content_type}\r\n\r\n'
+        )
+        self.preamble = ''.join(parts).encode('utf-8')
+        self.epilogue = f'\r\n--{self.boundary}--\r\n'.encode('utf-8')
+    
+    @property
+    def content_type(self) -> str:
+        return f'multipart/form-data; boundary={self.boundary}'
+    
+    def __len__(self) -> int:
+        if self.file_length is None:
+            raise TypeError("Longitud desconocida: usar iter() para envío chunked")
+        return len(self.preamble) + self.file_length + len(self.epilogue)
+    
+    def __iter__(self):
+        yield self.preamble
+        
+        view = memoryview(self.buffer)
+        remaining = self.file_length
+        while remaining is None or remaining > 0:
+            target = view if remaining is None else view[:min(len(view), remaining)]
+            count = self.source.readinto(target)
+            if not count:
+                break
+            yield view[:count]
+            if remaining is not None:
+                remaining -= count
+        
+        if remaining:
+            raise IOError(f"La cámara envió {remaining} bytes menos de lo anunciado")
+        
+        yield self.epilogue
+
+
+class ImageTranscoder:
+    """Redimensiona y recomprime capturas a un presupuesto de bytes (requiere Pillow)"""
+    
+    MIN_QUALITY = 30
+    
+    @property
+    def available(self) -> bool:
+        return load_pillow() is not None
+    
+    def transcode(self, data: bytes, profile: Dict) -> bytes:
+        """Ajustar la imagen al perfil: tamaño máximo, calidad y bytes máximos"""
+        max_size = (profile.get('max_width', 1280), profile.get('max_height', 960))
+        max_bytes = profile.get('max_bytes')
+        quality = profile.get('quality', 85)
+        
+        image = load_pillow().open(io.BytesIO(data))
+        # Para JPEG decodifica directamente a escala reducida (menos memoria y CPU)
+        image.draft('RGB', max_size)
+        image = image.convert('RGB')
+        image.thumbnail(max_size)
+        
+        for _ in range(3):
+            encoded = self._encode(image, quality)
+            if max_bytes is None or len(encoded) <= max_bytes:
+                return encoded
+            
+            # Búsqueda binaria de la mayor calidad que entra en el presupuesto
+            low, high = self.MIN_QUALITY, quality - 1
+            best = None
+            while low <= high:
+                middle = (low + high) // 2
+                candidate = self._encode(image, middle)
+                if len(candidate) <= max_bytes:
+                    best = candidate
+                    low = middle + 1
+                else:
+                    high = middle - 1
+            if best is not None:
+                return best
+            
+            # Ni con la calidad mínima alcanza: reducir tamaño y reintentar
+            image = image.resize((max(image.width * 3 // 4, 1), max(image.height * 3 // 4, 1)))
+        
+        return encoded
+    
+    @staticmethod
+    def _encode(image, quality: int) -> bytes:
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=quality, optimize=True)
+        return output.getvalue()
+
+
+class CameraManager:
+    """Gestión inteligente de múltiples cámaras"""
+    
+    def __init__(self, config: Dict, logger: logging.Logger, http_client: RobustHTTPClient):
+        self.config = config
+        self.logger = logger
+        self.http = http_client
+        self.camera_config = config.get('camera', {})
+        self.last_capture = {}
+        self.timelapse_frames = []
+        self.hint = None
+        self.hint_expires = 0
+    
+    def apply_config(self, config: Dict):
+        """Aplicar configuración recargada (conserva frames y tiempos de captura)"""
+        self.config = config
+        self.camera_config = config.get('camera', {})
+    
+    def capture_snapshot(self, camera_index: int = 0) -> Optional[bytes]:
+        """Capturar imagen de cámara específica"""
+        if not self.camera_config.get('enabled', True):
+            return None
+        
+        urls = self.camera_config.get('urls', [])
+        if camera_index >= len(urls):
+            return None
+        
+        url = urls[camera_index]
+        
+        try:
+            response = self.http.get(
+                url,
+                timeout=self.config['timeouts']['camera']
+            )
+            
+            if response and response.status_code == 200:
+                self.last_capture[camera_index] = datetime.now()
+                return response.content
+            
+        except Exception as e:
+            self.logger.warning(f"Error capturando cámara {camera_index}: {e}")
+        
+        return None
+    
+    def open_snapshot_stream(self, camera_index: int = 0) -> Optional[requests.Response]:
+        """Abrir la respuesta de la cámara sin leer el cuerpo (el llamador debe cerrarla)"""
+        if not self.camera_config.get('enabled', True):
+            return None
+        
+        urls = self.camera_config.get('urls', [])
+        if camera_index >= len(urls):
+            return None
+        
+        try:
+            response = self.http.get(
+                urls[camera_index],
+                timeout=self.config['timeouts']['camera'],
+                stream=True,
+                max_attempts=1
+            )
+            
+            if response and response.status_code == 200:
+                self.last_capture[camera_index] = datetime.now()
+                response.raw.decode_content = True
+                return response
+            
+            if response is not None:
+                response.close()
+            
+        except Exception as e:
+            self.logger.warning(f"Error capturando cámara {camera_index}: {e}")
+        
+        return None
+    
+    def apply_hint(self, hint: Dict):
+        """Registrar la indicación del servidor: {"profile": ..., "viewers": n, "ttl": s}"""
+        self.hint = hint
+        self.hint_expires = time.monotonic() + hint.get('ttl', self.camera_config.get('hint_ttl', 60))
+    
+    def is_idle(self) -> bool:
+        """Nadie está mirando según la última indicación vigente del servidor"""
+        if self.hint is None or time.monotonic() > self.hint_expires:
+            return False
+        return 'profile' not in self.hint and self.hint.get('viewers', 1) == 0
+    
+    def current_profile(self) -> Tuple[str, Optional[Dict]]:
+        """Perfil de calidad para la próxima captura (None = imagen original)
+        
+        Solo se recomprime si una indicación vigente del servidor pide un
+        perfil distinto de camera.resolution; si no, la captura se envía tal
+        cual por streaming (sin cargarla en memoria).
+        """
+        name = self.camera_config.get('resolution', 'high')
+        if self.hint is None or time.monotonic() > self.hint_expires:
+            return name, None
+        
+        if self.hint.get('profile'):
+            requested = self.hint['profile']
+        elif self.is_idle():
+            requested = self.camera_config.get('idle_profile', 'thumbnail')
+        else:
+            return name, None
+        
+        if requested == name:
+            return name, None
+        return requested, self.camera_config.get('profiles', {}).get(requested)
+    
+    def should_capture(self, camera_index: int = 0) -> bool:
+        """Determinar si es momento de capturar"""
+        if not self.camera_config.get('enabled', True):
+            return False
+        
+        interval = self.camera_config.get('capture_interval', 30)
+        if self.is_idle():
+            interval = self.camera_config.get('idle_capture_interval', interval)
+        last = self.last_capture.get(camera_index)
+        
+        if last is None:
+            return True
+        
+        return (datetime.now() - last).total_seconds() >= interval
+    
+    def capture_timelapse_frame(self, printing: bool) -> Optional[bytes]:
+        """Capturar frame para timelapse"""
+        if not printing or not self.camera_config.get('timelapse_enabled', True):
+            return None
+        
+        interval = self.camera_config.get('timelapse_interval', 60)
+        
+        if not self.timelapse_frames or \
+           (datetime.now() - self.timelapse_frames[-1]['timestamp']).total_seconds() >= interval:
+            
+            frame = self.capture_snapshot(0)
+            if frame:
+                self.timelapse_frames.append({
+                    'timestamp': datetime.now(),
+                    'data': frame
+                })
+                
+                # Limitar frames en memoria
+                if len(self.timelapse_frames) > 100:
+                    self.timelapse_frames.pop(0)
+                
+                return frame
+        
+        return None
@@ -0,0 +1,951 @@
+"""
+TecMedHub - Cliente principal
+"""
+
+import requests
+import time
+import sys
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+import traceback
+import signal
+import threading
+
+from .config import ConfigManager, ConfigWatcher, STATE_FILE, VERSION
+from .log import setup_logging
+from .state import StateManager
+from .http_client import RobustHTTPClient
+from .moonraker import MoonrakerInterface
+from .telemetry import TelemetrySampler
+from .anomalies import AnomalyDetector
+from .jobs import EtaEstimator, JobStore, JobTracker
+from .metadata import MetadataIndex
+from .profiler import Profiler
+from .camera import CameraManager, ImageTranscoder, MultipartStream
+from .files import FileManager, FilePrefetcher
+from .peer_cache import PeerCache
+from .commands import CommandProcessor
+from .scheduler import Scheduler
+
+
+class PrinterClient:
+    """Cliente principal robusto y completo"""
+    
+    FLUSH_CHECK_INTERVAL = 5  # Segundos entre revisiones de la escritura diferida
+    # Campos de la última actualización aceptada que repite el heartbeat de arranque
+    BOOT_CARRIED_FIELDS = ('files', 'last_completed', 'print_speed')
+    
+    def __init__(self, config_path: str):
+        # Configuración
+        self.config_manager = ConfigManager(config_path)
+        self.config = self.config_manager.config
+        
+        # Logging
+        self.logger = setup_logging(self.config)
+        self.logger.info("="*70)
+        self.logger.info("🌈 TECMEDHUB - CLIENTE DE IMPRESORA 🌈")
+        self.logger.info(f"Versión: {VERSION}")
+        self.logger.info("="*70)
+        
+        # Estado persistente
+        state_config = self.config.get('state', {})
+        self.state_manager = StateManager(
+            STATE_FILE,
+            flush_interval=state_config.get('flush_interval', 300),
+            backend=state_config.get('backend', 'json')
+        )
+        if self.state_manager.load_error:
+            self.logger.warning(f"Estado guardado ilegible, se reinicia: {self.state_manager.load_error}")
+        
+        # Cliente HTTP
+        self.http_client = RobustHTTPClient(self.config, self.logger)
+        
+        # Componentes
+        self.moonraker = MoonrakerInterface(self.config, self.logger, self.http_client)
+        self.camera_manager = CameraManager(self.config, self.logger, self.http_client)
+        self.image_transcoder = ImageTranscoder()
+        self.file_manager = FileManager(self.config, self.logger, self.http_client)
+        self.print_state = None
+        self.file_manager.is_printing = lambda: self.print_state == 'printing'
+        self.command_processor = CommandProcessor(
+            self.config, self.logger, self.moonraker, self.file_manager
+        )
+        
+        # Telemetría: el muestreo corre en otro hilo (misma sesión, otro cliente)
+        self.telemetry = None
+        if self.config.get('telemetry', {}).get('enabled', True):
+            self.telemetry = TelemetrySampler(
+                self.config,
+                self.logger,
+                MoonrakerInterface(self.config, self.logger, self.http_client.fork())
+            )
+        
+        # Recarga de configuración en caliente
+        self.config_watcher = None
+        if self.config.get('config_reload', {}).get('enabled', True):
+            self.config_watcher = ConfigWatcher(
+                config_path,
+                poll_interval=self.config['config_reload'].get('poll_interval', 2)
+            )
+        
+        # Detección de anomalías
+        self.anomaly_detector = None
+        if self.config.get('anomaly_detection', {}).get('enabled', True):
+            self.anomaly_detector = AnomalyDetector(self.config)
+        
+        # Índice de metadatos de G-code (consultas en segundo plano)
+        self.metadata_index = None
+        if self.config.get('metadata_index', {}).get('enabled', True):
+            self.metadata_index = MetadataIndex(self.config, self.logger)
+        
+        # Tiempo restante
+        self.eta_estimator = EtaEstimator(self.config, self.get_file_metadata)
+        
+        # Registro de trabajos de impresión
+        self.job_tracker = None
+        self.last_completed = None
+        jobs_config = self.config.get('jobs', {})
+        if jobs_config.get('enabled', True):
+            self.job_tracker = JobTracker(
+                JobStore(jobs_config.get('store_file', 'print_jobs.jsonl'), jobs_config.get('max_entries', 1000)),
+                self.get_file_metadata,
+                on_start=self._job_started
+            )
+        
+        # Descarga anticipada de archivos asignados
+        self.prefetcher = None
+        if self.config.get('prefetch', {}).get('enabled', True) and self.config.get('files_url'):
+            self.prefetcher = FilePrefetcher(
+                self.config, self.logger, self.file_manager,
+                lambda: self.print_state in CommandProcessor.IDLE_STATES
+            )
+        
+        # Caché compartida con otras impresoras de la red local
+        self.peer_cache = None
+        if self.config.get('peer_cache', {}).get('enabled', False):
+            if self.file_manager.cache is None:
+                self.logger.warning("⚠️  peer_cache necesita gcode_cache.enabled; queda deshabilitada")
+            else:
+                self.peer_cache = PeerCache(self.config, self.logger, self.file_manager)
+                self.file_manager.peers = self.peer_cache
+        
+        # Profiling bajo demanda
+        self.profiler = None
+        if self.config.get('profiling', {}).get('enabled', True):
+            self.profiler = Profiler(self.config, self.logger, self.upload_profile)
+            self.command_processor.profiler = self.profiler
+        
+        # Control de ejecución
+        self.running = False
+        self.stop_requested = False
+        self.shut_down = False
+        self.threads = []
+        self.startup_complete = threading.Event()
+        self.startup_failed = False
+        self.boot_lock = threading.Lock()  # Un 'booting' en vuelo no debe pisar el 'error'
+        self.created_at = time.monotonic()
+        self.first_update_at = None
+        
+        # Tareas periódicas del loop principal
+        self.scheduler = Scheduler(self.config, self.logger)
+        
+        # Estadísticas
+        self.start_time = datetime.now()
+        self.stats = {
+            'updates_sent': 0,
+            'commands_received': 0,
+            'errors': 0,
+            'reconnections': 0
+        }
+        
+        # Configurar señales
+        signal.signal(signal.SIGINT, self._signal_handler)
+        signal.signal(signal.SIGTERM, self._signal_handler)
+        if self.profiler is not None and hasattr(signal, 'SIGUSR1'):
+            signal.signal(signal.SIGUSR1, self._profile_signal_handler)
+    
+    def _signal_handler(self, sig, frame):
+        """Manejar señales de terminación: el loop termina y run() apaga"""
+        self.logger.info("\n👋 Señal de terminación recibida")
+        self.stop_requested = True
+        self.running = False
+        self.scheduler.wake()
+    
+    def _profile_signal_handler(self, sig, frame):
+        """SIGUSR1: iniciar profiling con la duración por defecto"""
+        self.profiler.start(reason='SIGUSR1')
+    
+    def startup_checks(self) -> bool:
+        """Verificaciones de inicio"""
+        self.logger.info("🔍 Realizando verificaciones de inicio...")
+        
+        # Verificar conexión a Moonraker
+        self.logger.info(f"   Conectando a Moonraker: {self.config['moonraker_url']}")
+        if not self.moonraker.check_connection():
+            self.logger.error("   ❌ No se puede conectar a Moonraker")
+            self.logger.error("   Verifica que Moonraker esté corriendo")
+            return False
+        self.logger.info("   ✅ Conexión a Moonraker OK")
+        
+        if self.moonraker.discover_objects():
+            self.logger.info(f"   Objetos consultados: {', '.join(self.moonraker.status_fields)}")
+        
+        # Verificar conexión al servidor
+        self.logger.info(f"   Conectando al servidor: {self.config['server_url']}")
+        try:
+            response = self.http_client.get(
+                f"{self.config['server_url']}?action=get_printers",
+                timeout=self.config['timeouts']['server']
+            )
+            if response and response.status_code == 200:
+                self.logger.info("   ✅ Conexión al servidor OK")
+            else:
+                self.logger.warning("   ⚠️  Servidor no responde correctamente")
+        except:
+            self.logger.warning("   ⚠️  No se puede conectar al servidor (continuará intentando)")
+        
+        # Último trabajo: del registro local, o una sola vez del historial de Moonraker
+        if self.job_tracker is not None and self.job_tracker.store.last_record is None:
+            self.last_completed = self._history_last_completed()
+        
+        # Información del sistema
+        printer_info = self.moonraker.get_printer_info()
+        if printer_info:
+            state = printer_info.get('state', 'unknown')
+            self.logger.info(f"   Estado de impresora: {state}")
+        
+        self.logger.info("✅ Verificaciones completadas\n")
+        return True
+    
+    def collect_printer_data(self) -> Dict:
+        """Recolectar todos los datos de la impresora"""
+        data = {
+            'action': 'update_printer',
+            'token': self.config['printer_token'],
+            'name': self.config['printer_name'],
+            'client_version': VERSION,
+            'uptime': self.get_uptime(),
+            'timestamp': datetime.now().isoformat()
+        }
+        
+        # Estado completo
+        full_status = self.moonraker.get_full_status()
+        
+        # Estado básico
+        print_stats = full_status.get('print_stats', {})
+        state = print_stats.get('state', 'unknown')
+        self.print_state = print_stats.get('state')
+        if self.file_manager.cache is not None:
+            # El archivo en impresión nunca se expulsa de la caché
+            self.file_manager.cache.set_active(
+                print_stats.get('filename') if state in JobTracker.ACTIVE_STATES else None
+            )
+        
+        status_map = {
+            'printing': 'printing',
+            'paused': 'printing',
+            'standby': 'idle',
+            'ready': 'idle',
+            'error': 'error',
+            'complete': 'idle'
+        }
+        data['status'] = status_map.get(state, 'idle')
+        
+        # Temperaturas
+        extruder = full_status.get('extruder', {})
+        heater_bed = full_status.get('heater_bed', {})
+        
+        data['temp_hotend'] = round(extruder.get('temperature', 0), 1)
+        data['temp_bed'] = round(heater_bed.get('temperature', 0), 1)
+        data['temp_hotend_target'] = round(extruder.get('target', 0), 1)
+        data['temp_bed_target'] = round(heater_bed.get('target', 0), 1)
+        
+        # Velocidad y ventiladores
+        gcode_move = full_status.get('gcode_move', {})
+        fan = full_status.get('fan', {})
+        
+        data['print_speed'] = int(gcode_move.get('speed_factor', 1.0) * 100)
+        data['fan_speed'] = int(fan.get('speed', 0) * 100)
+        
+        # Todos los calentadores, sensores y ventiladores descubiertos
+        data.update(self.moonraker.collect_channels(full_status))
+        
+        # Progreso de impresión (el estimador se alimenta en cada muestra)
+        remaining = self.eta_estimator.observe(full_status)
+        if state in ['printing', 'paused']:
+            display_status = full_status.get('display_status', {})
+            data['progress'] = int(display_status.get('progress', 0) * 100)
+            data['current_file'] = print_stats.get('filename', '')
+            
+            # Tiempo restante estimado
+            if remaining is not None:
+                data['time_remaining'] = int(remaining / 60)
+                data['eta'] = (datetime.now() + timedelta(seconds=remaining)).isoformat(timespec='seconds')
+        
+        # Último trabajo completado
+        if self.job_tracker is not None:
+            synced_id = self.state_manager.state.get('jobs_synced', 0)
+            if self.job_tracker.observe(full_status, synced_id=synced_id):
+                self.scheduler.run_soon('job_sync')
+            last_completed = self.job_tracker.last_completed() or self.last_completed
+        else:
+            last_completed = self._history_last_completed()
+        if last_completed:
+            data['last_completed'] = last_completed
+        
+        # Anomalías: las nuevas se envían de inmediato, las vigentes van en el estado
+        if self.anomaly_detector is not None and full_status:
+            for event in self.anomaly_detector.observe(full_status):
+                self.push_event(event)
+            data['anomalies'] = self.anomaly_detector.active_anomalies()
+        
+        # Telemetría agregada desde el último reporte
+        if self.telemetry is not None:
+            data['telemetry'] = self.telemetry.report()
+        
+        # Información del sistema
+        system_stats = full_status.get('system_stats', {})
+        if system_stats:
+            data['system'] = {
+                'cpu_usage': round(system_stats.get('cpu_usage', 0), 1),
+                'memory_usage': round(system_stats.get('memavail', 0) / 1024 / 1024, 1),
+                'cpu_temp': round(system_stats.get('cputemp', 0), 1)
+            }
+        
+        # Archivos locales
+        files = self.moonraker.get_files()
+        if self.metadata_index is not None:
+            self.metadata_index.schedule(files)
+        data['files'] = [self._file_entry(f) for f in files[:50]]  # Limitar a 50 archivos
+        
+        # Datos configurables
+        data.update(self._configured_fields())
+        
+        # Capturar imagen si corresponde (de la cámara al servidor sin pasar por memoria)
+        if self.camera_manager.should_capture():
+            image_url = self.upload_snapshot()
+            if image_url:
+                data['image'] = image_url
+        
+        # Timelapse si está imprimiendo
+        if state == 'printing':
+            timelapse_frame = self.camera_manager.capture_timelapse_frame(True)
+            # Los frames se almacenan en memoria, podrías enviarlos al finalizar
+        
+        return data
+    
+    def _configured_fields(self) -> Dict:
+        """Campos de update_printer que salen de printer_data en la configuración"""
+        printer_data = self.config.get('printer_data', {})
+        return {
+            'tags': printer_data.get('tags', []),
+            'filament': printer_data.get('filament', {}),
+            'bed_status': printer_data.get('bed_status', ''),
+            'location': printer_data.get('location', '')
+        }
+    
+    def _file_entry(self, f: Dict) -> Dict:
+        """Archivo local con los metadatos del slicer ya indexados"""
+        name = f.get('filename') or f.get('path', '')
+        entry = {
+            'name': name,
+            'size': self.file_manager.format_bytes(f.get('size', 0)),
+            'modified': f.get('modified', 0)
+        }
+        if self.metadata_index is not None:
+            metadata = self.metadata_index.get(f.get('path') or name)
+            if metadata:
+                entry['metadata'] = metadata
+        return entry
+    
+    def get_file_metadata(self, filename: str) -> Optional[Dict]:
+        """Metadatos de un archivo: del índice local o, si falta, de Moonraker"""
+        if self.metadata_index is not None:
+            metadata = self.metadata_index.get(filename)
+            if metadata:
+                return metadata
+        return self.moonraker.get_file_metadata(filename)
+    
+    def _job_started(self, filename: str):
+        """Nuevo trabajo visto por el JobTracker: cuenta como uso en la caché de G-code"""
+        if self.file_manager.cache is not None:
+            self.file_manager.cache.touch(filename, count=True)
+    
+    def _history_last_completed(self) -> Optional[str]:
+        """Último trabajo según el historial de Moonraker"""
+        history = self.moonraker.get_job_history(limit=1)
+        if history:
+            last_job = history[0]
+            filename = last_job.get('filename', '')
+            end_time = last_job.get('end_time', 0)
+            if end_time:
+                end_dt = datetime.fromtimestamp(end_time)
+                return f"{filename} ({end_dt.strftime('%H:%M')})"
+        return None
+    
+    def sync_jobs(self) -> bool:
+        """Enviar al servidor, en lote, los trabajos aún no sincronizados"""
+        jobs_config = self.config.get('jobs', {})
+        cursor = self.state_manager.state.get('jobs_synced', 0)
+        pending = self.job_tracker.store.read_after(cursor, jobs_config.get('sync_batch', 50))
+        if not pending:
+            return True
+        
+        try:
+            response = self.http_client.post(
+                self.config['server_url'],
+                json={
+                    'action': 'sync_jobs',
+                    'token': self.config['printer_token'],
+                    'name': self.config['printer_name'],
+                    'jobs': pending
+                },
+                timeout=self.config['timeouts']['server'],
+                max_attempts=1
+            )
+            if response and response.status_code == 200 and response.json().get('success'):
+                self.state_manager.state['jobs_synced'] = pending[-1]['id']
+                self.state_manager.mark_dirty()
+                self.logger.info(f"📋 {len(pending)} trabajo(s) sincronizado(s)")
+                return True
+        except Exception as e:
+            self.logger.debug(f"Error sincronizando trabajos: {e}")
+        return False
+    
+    def upload_profile(self, report: Dict) -> bool:
+        """Subir un reporte de profiling al servidor"""
+        try:
+            response = self.http_client.post(
+                self.config['server_url'],
+                json={
+                    'action': 'profile_report',
+                    'token': self.config['printer_token'],
+                    'name': self.config['printer_name'],
+                    'created': report['created'],
+                    'summary': report['summary'],
+                    'stacks': report['stacks']
+                },
+                timeout=self.config['timeouts']['server'],
+                max_attempts=1
+            )
+            return bool(response and response.status_code == 200)
+        except Exception as e:
+            self.logger.debug(f"Error subiendo profiling: {e}")
+            return False
+    
+    def upload_image(self, image_data: bytes) -> Optional[str]:
+        """Subir imagen al servidor"""
+        try:
+            upload_url = self.config['server_url'].replace('api.php', 'upload_image.php')
+            
+            files = {'image': ('snapshot.jpg', image_data, 'image/jpeg')}
+            data = {'token': self.config['printer_token']}
+            
+            response = self.http_client.post(
+                upload_url,
+                files=files,
+                data=data,
+                timeout=self.config['timeouts']['server']
+            )
+            
+            return self._parse_upload_response(response)
+            
+        except Exception as e:
+            self.logger.debug(f"Error subiendo imagen: {e}")
+        
+        return None
+    
+    def upload_snapshot(self, camera_index: int = 0) -> Optional[str]:
+        """Subir captura con el perfil de calidad que corresponda"""
+        profile_name, profile = self.camera_manager.current_profile()
+        if profile is None or not self.image_transcoder.available:
+            return self.upload_snapshot_stream(camera_index)
+        
+        snapshot = self.camera_manager.capture_snapshot(camera_index)
+        if not snapshot:
+            return None
+        
+        try:
+            image = self.image_transcoder.transcode(snapshot, profile)
+        except Exception as e:
+            self.logger.warning(f"Error transcodificando captura ({profile_name}): {e}")
+            image = snapshot
+        
+        if self.config['logging'].get('verbose'):
+            self.logger.debug(
+                f"📷 Captura {profile_name}: {self.file_manager.format_bytes(len(snapshot))} → "
+                f"{self.file_manager.format_bytes(len(image))}"
+            )
+        return self.upload_image(image)
+    
+    def upload_snapshot_stream(self, camera_index: int = 0) -> Optional[str]:
+        """Subir captura enviando la respuesta de la cámara directo al servidor"""
+        stream = self.camera_manager.open_snapshot_stream(camera_index)
+        if stream is None:
+            return None
+        
+        try:
+            upload_url = self.config['server_url'].replace('api.php', 'upload_image.php')
+            content_length = stream.headers.get('content-length')
+            
+            body = MultipartStream(
+                fields={'token': self.config['printer_token']},
+                file_field='image',
+                filename='snapshot.jpg',
+                content_type=stream.headers.get('content-type', 'image/jpeg').split(';')[0],
+                source=stream.raw,
+                length=int(content_length) if content_length and content_length.isdigit() else None,
+                buffer_size=self.config['camera'].get('stream_buffer_kb', 64) * 1024
+            )
+            
+            # Un stream no se puede releer: un solo intento
+            response = self.http_client.post(
+                upload_url,
+                data=body if body.file_length is not None else iter(body),
+                headers={'Content-Type': body.content_type},
+                timeout=self.config['timeouts']['server'],
+                max_attempts=1
+            )
+            
+            return self._parse_upload_response(response)
+            
+        except Exception as e:
+            self.logger.debug(f"Error subiendo imagen: {e}")
+        finally:
+            stream.close()
+        
+        return None
+    
+    @staticmethod
+    def _parse_upload_response(response: Optional[requests.Response]) -> Optional[str]:
+        """Extraer la URL de la imagen de la respuesta del servidor"""
+        if response and response.status_code == 200:
+            result = response.json()
+            if result.get('success'):
+                return result.get('image_url')
+        return None
+    
+    def push_event(self, event: Dict) -> bool:
+        """Enviar un evento fuera de banda (sin esperar a la próxima actualización)
+        
+        Un solo intento: corre dentro del loop principal, y si falla la anomalía
+        sigue en 'anomalies' de la actualización, que se reencola si no llega.
+        """
+        level = logging.ERROR if event.get('severity') == 'critical' else logging.WARNING
+        self.logger.log(level, f"🚨 Anomalía {event['type']}: {event['message']}")
+        
+        try:
+            response = self.http_client.post(
+                self.config['server_url'],
+                json={
+                    'action': 'printer_event',
+                    'token': self.config['printer_token'],
+                    'name': self.config['printer_name'],
+                    'event': event
+                },
+                timeout=self.config['timeouts']['server'],
+                max_attempts=1
+            )
+            return bool(response and response.status_code == 200)
+        except Exception as e:
+            self.logger.debug(f"Error enviando evento: {e}")
+            return False
+    
+    def send_status_update(self) -> bool:
+        """Enviar actualización de estado al servidor"""
+        try:
+            data = self.collect_printer_data()
+            
+            response = self.http_client.post(
+                self.config['server_url'],
+                json=data,
+                timeout=self.config['timeouts']['server']
+            )
+            
+            if response and response.status_code == 200:
+                result = response.json()
+                if result.get('success'):
+                    self._record_first_update()
+                    
+                    # Indicación de calidad de cámara según quién está mirando
+                    if isinstance(result.get('camera'), dict):
+                        self.camera_manager.apply_hint(result['camera'])
+                    
+                    self.stats['updates_sent'] += 1
+                    self.state_manager.state['last_known'] = {
+                        key: data[key] for key in self.BOOT_CARRIED_FIELDS if key in data
+                    }
+                    self.state_manager.state['last_update'] = datetime.now().isoformat()
+                    self.state_manager.state['total_updates'] += 1
+                    self.state_manager.mark_dirty()
+                    
+                    if self.config['logging'].get('verbose'):
+                        self.logger.debug(f"✅ Actualización enviada: {data['status']}")
+                    
+                    return True
+                else:
+                    self.logger.warning(f"Servidor rechazó actualización: {result.get('message')}")
+            else:
+                # Guardar para reenvío
+                self.state_manager.add_pending_update(data)
+                self.stats['errors'] += 1
+                
+        except Exception as e:
+            self.logger.error(f"Error enviando actualización: {e}")
+            self.stats['errors'] += 1
+            # Guardar para reenvío
+            data = self.collect_printer_data()
+            self.state_manager.add_pending_update(data)
+        
+        return False
+    
+    def check_commands(self):
+        """Verificar y ejecutar comandos pendientes"""
+        try:
+            url = f"{self.config['server_url']}?action=get_commands&token={self.config['printer_token']}"
+            
+            response = self.http_client.get(
+                url,
+                timeout=self.config['timeouts']['server']
+            )
+            
+            if response and response.status_code == 200:
+                result = response.json()
+                if result.get('success'):
+                    commands = result.get('commands', [])
+                    
+                    if commands:
+                        self.stats['commands_received'] += len(commands)
+                        self.command_processor.process_commands(commands)
+                        self.state_manager.state['statistics']['commands_executed'] += len(commands)
+                        self.state_manager.mark_dirty()
+            
+        except Exception as e:
+            self.logger.debug(f"Error verificando comandos: {e}")
+    
+    def health_check(self):
+        """Verificación de salud del sistema"""
+        self.logger.info("🏥 Health Check")
+        
+        # Verificar conexión a Moonraker
+        if not self.moonraker.check_connection():
+            self.logger.warning("   ⚠️  Moonraker desconectado, intentando reconectar...")
+            self.stats['reconnections'] += 1
+            
+            # Intentar reconectar
+            for i in range(3):
+                time.sleep(2)
+                if self.moonraker.check_connection():
+                    self.logger.info("   ✅ Moonraker reconectado")
+                    break
+        else:
+            self.logger.info("   ✅ Moonraker OK")
+        
+        # Estadísticas
+        uptime = datetime.now() - self.start_time
+        self.logger.info(f"   Uptime: {uptime}")
+        self.logger.info(f"   Updates enviados: {self.stats['updates_sent']}")
+        self.logger.info(f"   Comandos recibidos: {self.stats['commands_received']}")
+        self.logger.info(f"   Errores: {self.stats['errors']}")
+        self.logger.info(f"   Reconexiones: {self.stats['reconnections']}")
+        if self.peer_cache is not None:
+            peers = self.peer_cache.stats
+            self.logger.info(
+                f"   Red local: {peers['hits']} descargas de pares, {peers['misses']} del servidor, "
+                f"{peers['served']} entregadas ({self.file_manager.format_bytes(peers['served_bytes'])})"
+            )
+        if self.prefetcher is not None:
+            prefetch = self.prefetcher.stats
+            self.logger.info(
+                f"   Prefetch: {prefetch['downloaded']} archivos "
+                f"({self.file_manager.format_bytes(prefetch['bytes'])}), {prefetch['failed']} fallidos"
+            )
+        scheduler = self.scheduler.stats()
+        late = max(scheduler, key=lambda name: scheduler[name]['late_max_ms'])
+        self.logger.info(
+            f"   Planificador: retraso máx {scheduler[late]['late_max_ms']:.0f} ms ({late}), "
+            f"{sum(job['skipped'] for job in scheduler.values())} ejecuciones omitidas"
+        )
+        
+        # Guardar estado (se escribe en el próximo flush diferido)
+        self.state_manager.state['statistics'] = self.stats
+        self.state_manager.mark_dirty()
+    
+    def check_config_reload(self):
+        """Recargar configuración si el archivo cambió"""
+        if self.config_watcher is None or not self.config_watcher.has_changed():
+            return
+        
+        self.logger.info("🔄 Cambio detectado en la configuración, recargando...")
+        try:
+            new_config = self.config_manager.read_config()
+        except Exception as e:
+            self.logger.error(f"   ❌ Configuración rechazada, se mantiene la actual: {e}")
+            return
+        
+        self.apply_config(new_config)
+    
+    def apply_config(self, new_config: Dict):
+        """Aplicar una configuración ya validada a todos los componentes"""
+        old_config = self.config
+        try:
+            # Primero lo que puede fallar (compilar validadores, crear directorios)
+            self.command_processor.apply_config(new_config)
+            self.file_manager.apply_config(new_config)
+        except Exception as e:
+            self.command_processor.apply_config(old_config)
+            self.file_manager.apply_config(old_config)
+            self.logger.error(f"   ❌ No se pudo aplicar la configuración: {e}")
+            return
+        
+        self.http_client.apply_config(new_config)
+        self.moonraker.apply_config(new_config)
+        self.camera_manager.apply_config(new_config)
+        if self.telemetry is not None:
+            self.telemetry.moonraker.http.apply_config(new_config)
+            self.telemetry.moonraker.apply_config(new_config)
+            self.telemetry.apply_config(new_config)
+        self.state_manager.flush_interval = new_config['state'].get('flush_interval', 300)
+        if self.anomaly_detector is not None:
+            self.anomaly_detector.apply_config(new_config)
+        self.eta_estimator.apply_config(new_config)
+        if self.profiler is not None:
+            self.profiler.apply_config(new_config)
+        if self.prefetcher is not None:
+            self.prefetcher.apply_config(new_config)
+        if self.peer_cache is not None:
+            self.peer_cache.apply_config(new_config)
+        self.scheduler.apply_config(new_config)
+        if self.job_tracker is not None:
+            self.job_tracker.store.max_entries = new_config['jobs'].get('max_entries', 1000)
+        
+        level = getattr(logging, new_config['logging'].get('level', 'INFO'))
+        self.logger.setLevel(level)
+        for handler in self.logger.handlers:
+            handler.setLevel(level)
+        
+        self.config = new_config
+        self.config_manager.config = new_config
+        
+        # Lo que solo se aplica al reiniciar
+        for key in ('state', 'config_reload', 'metadata_index'):
+            if old_config.get(key) != new_config.get(key):
+                self.logger.warning(f"   ⚠️  Cambios en '{key}' se aplican al reiniciar")
+        for key in ('enabled', 'store_file'):
+            if old_config.get('jobs', {}).get(key) != new_config.get('jobs', {}).get(key):
+                self.logger.warning(f"   ⚠️  Cambios en 'jobs.{key}' se aplican al reiniciar")
+        for key in ('enabled', 'port', 'bind', 'discovery', 'multicast_group', 'discovery_port', 'max_uploads'):
+            if old_config.get('peer_cache', {}).get(key) != new_config.get('peer_cache', {}).get(key):
+                self.logger.warning(f"   ⚠️  Cambios en 'peer_cache.{key}' se aplican al reiniciar")
+        for key in ('enabled', 'index_file'):
+            if old_config.get('gcode_cache', {}).get(key) != new_config.get('gcode_cache', {}).get(key):
+                self.logger.warning(f"   ⚠️  Cambios en 'gcode_cache.{key}' se aplican al reiniciar")
+        if old_config.get('prefetch', {}).get('enabled') != new_config.get('prefetch', {}).get('enabled') or \
+                (self.prefetcher is None and old_config.get('files_url') != new_config.get('files_url')):
+            self.logger.warning("   ⚠️  Activar o desactivar 'prefetch' se aplica al reiniciar")
+        
+        self.logger.info("   ✅ Configuración recargada")
+    
+    def get_uptime(self) -> str:
+        """Calcular uptime"""
+        delta = datetime.now() - self.start_time
+        hours = int(delta.total_seconds() // 3600)
+        minutes = int((delta.total_seconds() % 3600) // 60)
+        return f"{hours}h {minutes}m"
+    
+    def send_boot_heartbeat(self, status: str = 'booting') -> bool:
+        """Avisar al servidor que la impresora está arrancando (un solo intento)
+        
+        Con status='error' avisa que las verificaciones de inicio fallaron;
+        después de eso ya no se envían más 'booting'.
+        
+        update_printer reemplaza todos los campos de la impresora, así que el
+        heartbeat repite los que ya se conocen sin Moonraker: los de
+        printer_data y los guardados de la última actualización aceptada
+        (archivos, último trabajo). Temperaturas y progreso quedan sin dato.
+        """
+        data = dict(self.state_manager.state.get('last_known') or {})
+        data.update(self._configured_fields())
+        data.update({
+            'action': 'update_printer',
+            'token': self.config['printer_token'],
+            'name': self.config['printer_name'],
+            'client_version': VERSION,
+            'status': status,
+            'uptime': self.get_uptime(),
+            'timestamp': datetime.now().isoformat()
+        })
+        with self.boot_lock:
+            if status == 'booting' and self.startup_failed:
+                return False
+            try:
+                response = self.http_client.post(
+                    self.config['server_url'],
+                    json=data,
+                    timeout=self.config['timeouts']['server'],
+                    max_attempts=1
+                )
+                if response and response.status_code == 200 and response.json().get('success'):
+                    self._record_first_update()
+                    return True
+            except Exception as e:
+                self.logger.debug(f"Error enviando heartbeat de arranque: {e}")
+            return False
+    
+    def _record_first_update(self):
+        """Medir el tiempo hasta la primera actualización aceptada"""
+        if self.first_update_at is None:
+            self.first_update_at = time.monotonic()
+            elapsed = self.first_update_at - self.created_at
+            self.stats['time_to_first_update'] = round(elapsed, 3)
+            self.logger.info(f"⏱️  Primera actualización enviada a los {elapsed:.2f}s")
+    
+    def _background_startup(self):
+        """Verificaciones de inicio sin bloquear el loop principal
+        
+        Si fallan, como sin fast_start: se informa el error al servidor y el
+        cliente se detiene (run() sale con código 1).
+        """
+        if self.startup_checks():
+            self.startup_complete.set()
+            self.scheduler.run_soon('status_update')  # Primer estado completo sin esperar el intervalo
+            return
+        self.logger.error("❌ Fallo en verificaciones de inicio")
+        self.startup_failed = True
+        self.send_boot_heartbeat('error')
+        self.stop_requested = True
+        self.running = False
+        self.scheduler.wake()
+    
+    def _schedule_jobs(self):
+        """Registrar las tareas periódicas (los intervalos se releen en cada ejecución)"""
+        intervals = lambda key: lambda: self.config['intervals'][key]
+        started = self.startup_complete.is_set
+        
+        # Con fast_start run() ya envió el heartbeat: el siguiente va tras un intervalo
+        # (o antes, si las verificaciones terminan; ver _background_startup)
+        booting = not started()
+        first_delay = self.config['intervals']['status_update'] if booting else 0
+        self.scheduler.add('status_update', self._status_job, intervals('status_update'), delay=first_delay)
+        if booting and started():
+            self.scheduler.run_soon('status_update')  # Terminaron mientras se registraba la tarea
+        self.scheduler.add('command_check', lambda: started() and self.check_commands(), intervals('command_check'))
+        self.scheduler.add('health_check', lambda: started() and self.health_check(), intervals('health_check'))
+        self.scheduler.add('cleanup', lambda: started() and self.file_manager.cleanup_old_files(), 3600)
+        if self.job_tracker is not None:
+            self.scheduler.add('job_sync', lambda: started() and self.sync_jobs(),
+                               lambda: self.config.get('jobs', {}).get('sync_interval', 300))
+        if self.config_watcher is not None:
+            self.scheduler.add('config_reload', self.check_config_reload,
+                               lambda: self.config['config_reload'].get('poll_interval', 2))
+        self.scheduler.add('flush', self._flush_job, self.FLUSH_CHECK_INTERVAL)
+    
+    def _status_job(self):
+        """Actualización de estado (solo heartbeat mientras arranca)"""
+        if not self.startup_complete.is_set():
+            self.send_boot_heartbeat()
+        elif self.send_status_update():
+            if self.config['logging'].get('verbose'):
+                self.logger.debug(f"✓ Status actualizado")
+    
+    def _flush_job(self):
+        """Escritura diferida del estado, el índice de metadatos y la caché"""
+        self.state_manager.maybe_flush()
+        if self.metadata_index is not None:
+            self.metadata_index.maybe_flush()
+        if self.file_manager.cache is not None:
+            self.file_manager.cache.maybe_flush()
+    
+    def run(self):
+        """Loop principal"""
+        if self.config.get('startup', {}).get('fast_start', True):
+            # Aparecer en el dashboard antes de verificar Moonraker
+            self.send_boot_heartbeat()
+            startup_thread = threading.Thread(target=self._background_startup, name='startup', daemon=True)
+            startup_thread.start()
+            self.threads.append(startup_thread)
+        else:
+            if not self.startup_checks():
+                self.logger.error("❌ Fallo en verificaciones de inicio")
+                sys.exit(1)
+            self.startup_complete.set()
+        
+        self.logger.info("="*70)
+        self.logger.info(f"Impresora: {self.config['printer_name']}")
+        self.logger.info(f"Token: {self.config['printer_token']}")
+        self.logger.info(f"Servidor: {self.config['server_url']}")
+        self.logger.info(f"Moonraker: {self.config['moonraker_url']}")
+        self.logger.info("="*70)
+        self.logger.info("▶️  Cliente iniciado (Ctrl+C para detener)\n")
+        
+        self.running = not self.stop_requested
+        
+        if self.telemetry is not None:
+            self.telemetry.start()
+            if self.telemetry.thread is not None:
+                self.threads.append(self.telemetry.thread)
+        
+        if self.metadata_index is not None:
+            self.metadata_index.start(self.http_client)
+            self.threads.extend(self.metadata_index.threads)
+        
+        if self.prefetcher is not None:
+            self.prefetcher.start()
+            if self.prefetcher.thread is not None:
+                self.threads.append(self.prefetcher.thread)
+        
+        if self.peer_cache is not None:
+            self.peer_cache.start()
+            self.threads.extend(self.peer_cache.threads)
+        
+        self._schedule_jobs()
+        try:
+            self.scheduler.run(lambda: self.running)
+        except KeyboardInterrupt:
+            self.logger.info("\n👋 Detenido por el usuario")
+        except Exception as e:
+            self.logger.error(f"❌ Error crítico: {e}")
+            self.logger.debug(traceback.format_exc())
+        finally:
+            self.shutdown()
+        if self.startup_failed:
+            sys.exit(1)
+    
+    def shutdown(self):
+        """Apagado limpio (una sola vez; el logging lo detiene main() al salir)"""
+        if self.shut_down:
+            return
+        self.shut_down = True
+        self.logger.info("\n🛑 Iniciando apagado...")
+        self.running = False
+        self.scheduler.wake()
+        
+        if self.telemetry is not None:
+            self.telemetry.stop()
+        if self.metadata_index is not None:
+            self.metadata_index.stop()
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+        if self.peer_cache is not None:
+            self.peer_cache.stop()
+        if self.file_manager.cache is not None:
+            self.file_manager.cache.flush()
+        if self.profiler is not None:
+            self.profiler.stop()
+        
+        # Guardar estado final
+        self.state_manager.close()
+        if self.config_watcher is not None:
+            self.config_watcher.close()
+        
+        # Estadísticas finales
+        self.logger.info("📊 Estadísticas finales:")
+        self.logger.info(f"   Tiempo activo: {self.get_uptime()}")
+        self.logger.info(f"   Updates enviados: {self.stats['updates_sent']}")
+        self.logger.info(f"   Comandos ejecutados: {self.stats['commands_received']}")
+        self.logger.info(f"   Errores: {self.stats['errors']}")
+        
+        self.logger.info("="*70)
+        self.logger.info("👋 Cliente detenido correctamente")
+        self.logger.info("="*70)
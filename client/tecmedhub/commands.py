@@ -0,0 +1,409 @@
+"""
+TecMedHub - Procesador de comandos
+"""
+
+import time
+import logging
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+import traceback
+from collections import deque
+
+from .log import AUDIT
+from .moonraker import MoonrakerInterface
+from .files import FileManager
+from .validator import GcodeValidator
+from .actions import ActionRegistry, CommandAction, register_builtin_actions
+
+
+class CommandProcessor:
+    """Procesamiento robusto de comandos del servidor"""
+    
+    MACRO_TOKEN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+    
+    # Temperaturas en la cabecera del G-code: M104/M109/M140/M190, parámetros de
+    # PRINT_START (BED=60 EXTRUDER=215) y ajustes del slicer en comentarios
+    HEATER_CODES = {'M104': 'hotend_temp', 'M109': 'hotend_temp', 'M140': 'bed_temp', 'M190': 'bed_temp'}
+    MACRO_TEMP = re.compile(r'\b(BED|BED_TEMP|EXTRUDER|EXTRUDER_TEMP|HOTEND|HOTEND_TEMP)=(\d+(?:\.\d+)?)\b', re.I)
+    SLICER_TEMP = re.compile(r'^\s*first_layer_(bed_)?temperature\s*=\s*(\d+(?:\.\d+)?)')
+    IDLE_STATES = ('standby', 'complete', 'cancelled', 'error')
+    
+    def __init__(self, config: Dict, logger: logging.Logger, 
+                 moonraker: MoonrakerInterface, file_manager: FileManager):
+        self.logger = logger
+        self.moonraker = moonraker
+        self.file_manager = file_manager
+        self.last_command_time = {}  # Por clase de rate limit
+        self.command_history = deque(maxlen=100)
+        self.profiler = None  # Lo asigna PrinterClient si el profiling está habilitado
+        self.plugin_modules = {}  # Plugins ya cargados (se reejecutan solo si cambia su archivo)
+        self.apply_config(config)
+    
+    def apply_config(self, config: Dict):
+        """Construir tabla de despacho y validadores (también al recargar)"""
+        security_config = config.get('security', {})
+        
+        # Tabla de despacho
+        registry = ActionRegistry()
+        register_builtin_actions(registry)
+        registry.load_plugins(config.get('commands', {}).get('plugins', []), self.logger, self.plugin_modules)
+        
+        # Patrones y límites de seguridad compilados una sola vez
+        gcode_validator = GcodeValidator(
+            security_config.get('allowed_gcode_patterns', []),
+            security_config.get('gcode_limits', {})
+        )
+        macro_whitelist = GcodeValidator.compile_patterns(
+            security_config.get('allowed_macro_patterns', ['*'])
+        )
+        
+        # Reemplazo de una vez: nunca queda una mezcla de configuración vieja y nueva
+        self.config = config
+        self.security_config = security_config
+        self.registry = registry
+        self.gcode_validator = gcode_validator
+        self.macro_whitelist = macro_whitelist
+    
+    def process_command(self, cmd: Dict, rate_checked: Optional[set] = None) -> bool:
+        """Procesar comando con validación de seguridad"""
+        prepared = self._prepare_command(cmd)
+        if prepared is None:
+            return False
+        
+        return self._run_prepared(*prepared, rate_checked=rate_checked)
+    
+    def _run_prepared(self, action: CommandAction, params: Dict, lines: Optional[List[str]],
+                      rate_checked: Optional[set] = None) -> bool:
+        """Admitir y ejecutar un comando ya resuelto"""
+        if not self._admit_command(action, params, lines, rate_checked):
+            return False
+        
+        self.logger.info(f"🔨 Ejecutando comando: {action.name}", extra=AUDIT)
+        
+        # Ejecutar comando
+        try:
+            if lines is not None:
+                result = self.moonraker.execute_gcode_lines(lines)
+            else:
+                result = bool(action.handler(self, params))
+            self._log_result(action.name, result)
+            return result
+            
+        except Exception as e:
+            self.logger.error(f"   ❌ Error ejecutando {action.name}: {e}")
+            self.logger.debug(traceback.format_exc())
+            return False
+    
+    def process_commands(self, commands: List[Dict]) -> List[bool]:
+        """Procesar comandos en el orden del servidor agrupando G-codes consecutivos en un solo script
+        
+        El rate limit se aplica una vez por clase a toda la consulta: los
+        comandos que el servidor entregó juntos entran juntos.
+        """
+        # emergency_stop, pause y cancel se adelantan; el resto respeta el orden recibido
+        order = sorted(range(len(commands)), key=lambda i: self._priority_of(commands[i]))
+        rate_checked = set()
+        
+        batch_config = self.config.get('gcode_batch', {})
+        if not batch_config.get('enabled', True):
+            results = [False] * len(commands)
+            for index in order:
+                results[index] = self.process_command(commands[index], rate_checked)
+            return results
+        
+        results = [False] * len(commands)
+        batch = self.moonraker.gcode_batch(
+            max_lines=batch_config.get('max_lines', 50),
+            flush_deadline=batch_config.get('flush_deadline', 0.5)
+        )
+        
+        def flush():
+            if not batch.pending:
+                return
+            try:
+                batch_results = batch.flush()
+            except Exception as e:
+                self.logger.error(f"   ❌ Error ejecutando lote G-code: {e}")
+                self.logger.debug(traceback.format_exc())
+                return
+            for index, ok in batch_results.items():
+                results[index] = ok
+                self._log_result(commands[index].get('action', 'unknown'), ok)
+            if batch.last_error:
+                self.logger.error(f"   Error de Klipper: {batch.last_error}")
+        
+        for index in order:
+            cmd = commands[index]
+            prepared = self._prepare_command(cmd)
+            
+            if prepared is None:
+                continue
+            
+            # Comandos que no son G-code: enviar lo acumulado para respetar el orden
+            if prepared[2] is None:
+                flush()
+                results[index] = self._run_prepared(*prepared, rate_checked=rate_checked)
+                continue
+            
+            action, params, lines = prepared
+            if not batch.accepts(lines):
+                flush()
+            
+            if not self._admit_command(action, params, lines, rate_checked):
+                continue
+            
+            self.logger.info(f"🔨 Encolando comando: {action.name} ({len(lines)} líneas)")
+            batch.add(lines, source=index)
+        
+        flush()
+        return results
+    
+    def _priority_of(self, cmd: Dict) -> int:
+        """Clave de orden: solo las acciones urgentes se adelantan (menor va antes)"""
+        action = self.registry.get(cmd.get('action'))
+        if action is None or action.priority > CommandAction.URGENT_PRIORITY:
+            return CommandAction.URGENT_PRIORITY + 1
+        return action.priority
+    
+    def _prepare_command(self, cmd: Dict) -> Optional[Tuple[CommandAction, Dict, Optional[List[str]]]]:
+        """Resolver acción, validar parámetros y generar G-code si corresponde"""
+        name = cmd.get('action', 'unknown')
+        action = self.registry.get(name)
+        if action is None:
+            self.logger.warning(f"Comando desconocido: {name}")
+            return None
+        
+        try:
+            params = action.validate(cmd)
+        except ValueError as e:
+            self.logger.error(f"Parámetros inválidos para {name}: {e}")
+            return None
+        
+        lines = None
+        if action.gcode is not None:
+            lines = action.gcode(params)
+            if not lines:
+                self.logger.error(f"Comando {name} no generó G-code")
+                return None
+        
+        return action, params, lines
+    
+    def _admit_command(self, action: CommandAction, params: Dict,
+                       lines: Optional[List[str]], rate_checked: Optional[set] = None) -> bool:
+        """Aplicar rate limiting y validación, y registrar el comando
+        
+        rate_checked: clases que ya pasaron el rate limit en esta consulta
+        """
+        # Rate limiting (una vez por clase y consulta)
+        if rate_checked is None or action.rate_class not in rate_checked:
+            if not self._check_rate_limit(action.rate_class):
+                self.logger.warning(f"Rate limit alcanzado para comando: {action.name}")
+                return False
+            if rate_checked is not None:
+                rate_checked.add(action.rate_class)
+        
+        # Validación de seguridad
+        if not self._validate_command(action, params, lines):
+            self.logger.error(f"Comando rechazado por validación de seguridad: {action.name}")
+            return False
+        
+        # Registrar comando
+        self.command_history.append({
+            'timestamp': datetime.now().isoformat(),
+            'action': action.name,
+            'params': params
+        })
+        return True
+    
+    def _log_result(self, action: str, result: bool):
+        """Registrar resultado de un comando"""
+        if result:
+            self.logger.info(f"   ✅ Comando {action} ejecutado correctamente", extra=AUDIT)
+        else:
+            self.logger.error(f"   ❌ Comando {action} falló")
+    
+    def _check_rate_limit(self, rate_class: str = 'default') -> bool:
+        """Verificar límite de tasa de comandos por clase"""
+        rate_classes = self.security_config.get('rate_classes', {})
+        rate_limit = rate_classes.get(rate_class, self.security_config.get('rate_limit_seconds', 1))
+        now = time.time()
+        
+        if now - self.last_command_time.get(rate_class, 0) < rate_limit:
+            return False
+        
+        self.last_command_time[rate_class] = now
+        return True
+    
+    def _validate_command(self, action: CommandAction, params: Dict,
+                          lines: Optional[List[str]]) -> bool:
+        """Validar comando según configuración de seguridad"""
+        # Whitelist solo para G-code arbitrario; límites de parámetros para todo G-code
+        if lines is not None:
+            error = self.gcode_validator.validate(lines, whitelist=action.security_check == 'gcode')
+            if error:
+                self.logger.error(f"G-code rechazado en {action.name}: {error}")
+                return False
+        
+        if action.security_check == 'macro' and not self._validate_macro(params):
+            return False
+        
+        if not self.security_config.get('validate_dangerous_commands', True):
+            return True
+        
+        if action.dangerous:
+            # En producción, podrías implementar un sistema de confirmación
+            self.logger.warning(f"⚠️  Comando peligroso: {action.name}")
+        
+        return True
+    
+    def _validate_macro(self, params: Dict) -> bool:
+        """Verificar nombre y parámetros de macro (sin inyección de líneas)"""
+        macro_name = params['macro_name']
+        if not self.MACRO_TOKEN.match(macro_name):
+            self.logger.error(f"Nombre de macro inválido: {macro_name!r}")
+            return False
+        
+        if self.macro_whitelist is not None and not self.macro_whitelist.fullmatch(macro_name.upper()):
+            self.logger.error(f"Macro no permitida: {macro_name}")
+            return False
+        
+        for key, value in (params.get('params') or {}).items():
+            if not self.MACRO_TOKEN.match(str(key)) or re.search(r'\s', str(value)):
+                self.logger.error(f"Parámetro de macro inválido: {key}={value!r}")
+                return False
+        return True
+    
+    def print_file(self, params: Dict) -> bool:
+        """Imprimir archivo, descargándolo si no existe localmente"""
+        filename = params['file']
+        
+        # Verificar si el archivo existe localmente
+        local_path = self.file_manager.gcode_dir / filename
+        
+        if local_path.exists():
+            if self.file_manager.cache is not None:
+                self.file_manager.cache.touch(filename)
+            return self.moonraker.command(f"printer/print/start?filename={quote(filename)}")
+        
+        download_url = params.get('download_url', '')
+        if not download_url:
+            self.logger.error(f"Archivo {filename} no existe y no hay URL de descarga")
+            return False
+        
+        start_config = self.config.get('print_start', {})
+        if start_config.get('pipelined', True):
+            return self._pipelined_print(filename, download_url, params, start_config)
+        
+        # Descargar del servidor
+        success, error = self.file_manager.download_file(filename, download_url, params.get('checksum', ''))
+        if not success:
+            self.logger.error(f"Error descargando archivo: {error}")
+            return False
+        
+        # Iniciar impresión
+        return self.moonraker.command(f"printer/print/start?filename={quote(filename)}")
+    
+    def _pipelined_print(self, filename: str, download_url: str, params: Dict, start_config: Dict) -> bool:
+        """Precalentar y descargar en paralelo; imprimir cuando el archivo está verificado
+        
+        Los calentadores suben mientras llegan los datos, así que el M190/M109 del
+        G-code de inicio encuentra la cama y el hotend ya (casi) a temperatura.
+        """
+        started = time.monotonic()
+        preheat = {'sent_at': None}
+        
+        def send_preheat(temps: Dict, source: str):
+            if preheat['sent_at'] is not None:
+                return
+            lines = [f"{'M104' if key == 'hotend_temp' else 'M140'} S{value:g}" for key, value in temps.items()]
+            error = self.gcode_validator.validate(lines, whitelist=False)
+            if error:
+                self.logger.warning(f"Precalentamiento rechazado ({source}): {error}")
+                return
+            if self.moonraker.execute_gcode_lines(lines):
+                preheat['sent_at'] = time.monotonic()
+                self.logger.info(f"🔥 Precalentando desde {source}: {', '.join(lines)}")
+            else:
+                self.logger.warning(f"No se pudo precalentar: {self.moonraker.last_error}")
+        
+        # Nunca tocar los calentadores de una impresión en curso
+        on_header = None
+        if self._printer_idle():
+            temps = {key: params[key] for key in ('hotend_temp', 'bed_temp') if params.get(key)}
+            if temps:
+                send_preheat(temps, 'comando')
+            elif start_config.get('preheat_from_header', True):
+                def on_header(header: bytes):
+                    temps = self._header_temps(header)
+                    if temps:
+                        send_preheat(temps, 'cabecera')
+                    else:
+                        self.logger.debug(f"Sin temperaturas en la cabecera de {filename}")
+        else:
+            self.logger.warning("Impresora ocupada o sin estado: se descarga sin precalentar")
+        
+        success, error = self.file_manager.download_file(
+            filename, download_url, params.get('checksum', ''),
+            on_header=on_header, header_bytes=start_config.get('header_bytes', 65536)
+        )
+        
+        if success:
+            heating = f", calentando hace {time.monotonic() - preheat['sent_at']:.0f}s" if preheat['sent_at'] else ""
+            self.logger.info(f"⏱️  Archivo listo en {time.monotonic() - started:.1f}s{heating}")
+            if self.moonraker.command(f"printer/print/start?filename={quote(filename)}"):
+                return True
+            self.logger.error(f"Error iniciando impresión de {filename}: {self.moonraker.last_error}")
+        else:
+            self.logger.error(f"Error descargando archivo: {error}")
+        
+        if preheat['sent_at'] is not None and start_config.get('cool_down_on_failure', True):
+            self.logger.info("❄️  Apagando calentadores del precalentamiento")
+            self.moonraker.execute_gcode_lines(["M104 S0", "M140 S0"])
+        return False
+    
+    def _printer_idle(self) -> bool:
+        """True si Klipper responde y no hay una impresión en curso o pausada"""
+        result = self.moonraker.query('printer/objects/query?print_stats=state')
+        if not result:
+            return False
+        state = result.get('status', {}).get('print_stats', {}).get('state')
+        return state in self.IDLE_STATES
+    
+    @classmethod
+    def _header_temps(cls, header: bytes) -> Dict[str, float]:
+        """Primeras temperaturas de hotend y cama en la cabecera de un G-code"""
+        temps = {}
+        for line in header.decode('utf-8', errors='ignore').splitlines():
+            code, _, comment = line.partition(';')
+            words = code.upper().split()
+            found = []
+            if words and words[0] in cls.HEATER_CODES:
+                found = [(cls.HEATER_CODES[words[0]], word[1:]) for word in words[1:] if word.startswith('S')]
+            elif words:
+                found = [('bed_temp' if name.upper().startswith('BED') else 'hotend_temp', value)
+                         for name, value in cls.MACRO_TEMP.findall(code)]
+            else:
+                match = cls.SLICER_TEMP.match(comment)
+                if match:
+                    found = [('bed_temp' if match.group(1) else 'hotend_temp', match.group(2))]
+            
+            for key, value in found:
+                try:
+                    value = float(value)
+                except ValueError:
+                    continue  # Plantillas sin resolver, p.ej. S[first_layer_temperature]
+                if value > 0:
+                    temps.setdefault(key, value)
+            
+            if len(temps) == 2:
+                break
+        return temps
+    
+    def start_profile(self, params: Dict) -> bool:
+        """Iniciar una sesión de profiling (duración 0 = la de la configuración)"""
+        if self.profiler is None:
+            self.logger.warning("Profiling deshabilitado en la configuración")
+            return False
+        return self.profiler.start(params.get('duration') or None, reason='comando')
@@ -0,0 +1,522 @@
+"""
+TecMedHub - Configuración por defecto, validación y recarga en caliente
+"""
+
+import time
+import json
+import sys
+import os
+import logging
+import struct
+from typing import Dict, Optional, Tuple
+
+from .validator import GcodeValidator
+from .scheduler import Scheduler
+
+
+VERSION = "4.0.0"
+CONFIG_FILE = "printer_config.json"
+STATE_FILE = "printer_state.json"
+LOG_FILE = "printer_client.log"
+
+# Temperaturas máximas por defecto: límites de las acciones y de security.gcode_limits
+MAX_HOTEND_TEMP = 300
+MAX_BED_TEMP = 120
+
+DEFAULT_CONFIG = {
+    "server_url": "https://tmeduca.org/printerhub/api.php",
+    "printer_token": "TECMED_PRINTER_001",
+    "printer_name": "🦄 Mi Impresora 3D",
+    "moonraker_url": "http://localhost:7125",
+    "files_url": "",                   # printer-api/files.php (vacío = sin descarga anticipada)
+    
+    # Configuración de cámara
+    "camera": {
+        "enabled": True,
+        "urls": ["http://localhost:8080/?action=snapshot"],
+        "resolution": "high",
+        "idle_profile": "thumbnail",
+        "hint_ttl": 60,
+        "capture_interval": 30,
+        "idle_capture_interval": 120,
+        "stream_buffer_kb": 64,
+        "profiles": {
+            "thumbnail": {"max_width": 320, "max_height": 240, "quality": 70, "max_bytes": 20000},
+            "low": {"max_width": 640, "max_height": 480, "quality": 75, "max_bytes": 60000},
+            "high": {"max_width": 1280, "max_height": 960, "quality": 85, "max_bytes": 200000},
+            "full": None
+        },
+        "timelapse_enabled": True,
+        "timelapse_interval": 60
+    },
+    
+    # Intervalos de actualización (segundos)
+    "intervals": {
+        "status_update": 5,
+        "command_check": 3,
+        "health_check": 60,
+        "reconnect_attempt": 10
+    },
+    
+    # Timeouts (segundos)
+    "timeouts": {
+        "moonraker": 5,
+        "server": 10,
+        "camera": 5,
+        "file_download": 60
+    },
+    
+    # Configuración de reintentos
+    "retries": {
+        "max_attempts": 5,
+        "exponential_backoff": True,
+        "base_delay": 2
+    },
+    
+    # Telemetría de alta frecuencia (agregada por intervalo de reporte)
+    "telemetry": {
+        "enabled": True,
+        "sample_interval": 1.0,
+        "buffer_seconds": 300,
+        "series_points": 0,
+        "channels": [
+            "extruder.temperature", "extruder.target", "extruder.power",
+            "heater_bed.temperature", "heater_bed.target", "heater_bed.power",
+            "fan.speed",
+            "motion_report.live_velocity", "motion_report.live_extruder_velocity",
+            "system_stats.sysload", "system_stats.memavail"
+        ]
+    },
+    
+    # Detección de anomalías en el cliente
+    "anomaly_detection": {
+        "enabled": True,
+        "settle_band": 3.0,
+        "cusum_drift": 2.0,
+        "cusum_threshold": 30.0,
+        "heat_timeout": {
+            "extruder": 300,
+            "heater_bed": 900
+        },
+        "min_heat_rate": 0.02,
+        "off_heating_rate": 0.3,
+        "progress_stall_seconds": 900,
+        "filament_sensors": []
+    },
+    
+    # Configuración de archivos
+    "file_management": {
+        "auto_cleanup": True,
+        "max_age_days": 30,
+        "verify_checksums": True,
+        "gcode_directory": "/home/pi/printer_data/gcodes"
+    },
+    
+    # Inicio de impresión: precalentar mientras se descarga el archivo
+    "print_start": {
+        "pipelined": True,
+        "preheat_from_header": True,    # Temperaturas leídas de la cabecera del G-code
+        "header_bytes": 65536,
+        "cool_down_on_failure": True    # Apagar calentadores si la descarga falla
+    },
+    
+    # Descargas: menos velocidad y prioridad mientras imprime para no afectar a Klipper
+    "download_throttle": {
+        "enabled": True,
+        "printing_rate_kb": 256,        # KB/s máximos mientras print_stats.state == printing
+        "burst_kb": 256,
+        "write_buffer_kb": 1024,        # Escrituras secuenciales grandes
+        "sync_every_mb": 4,             # fdatasync periódico (0 = solo al final)
+        "lower_priority": True,         # Descargar en un hilo con nice/ionice bajos
+        "nice": 10,
+        "ionice": True
+    },
+    
+    # Caché del directorio de G-code: cuota con expulsión de los menos usados
+    "gcode_cache": {
+        "enabled": True,
+        "quota_mb": 4096,
+        "low_water": 0.8,               # Al pasar la cuota, borrar hasta quedar en 80%
+        "policy": "lru",                # lru (último uso) o lfu (cantidad de impresiones)
+        "pinned": [],                   # Patrones que nunca se borran, p.ej. "calibracion_*.gcode"
+        "index_file": "gcode_cache.json",
+        "flush_interval": 300,
+        "rescan_interval": 21600        # Reconciliar con el disco (archivos subidos por otros medios)
+    },
+    
+    # Compartir G-code con otras impresoras de la red local (requiere gcode_cache)
+    "peer_cache": {
+        "enabled": False,
+        "port": 7130,                   # Endpoint HTTP /peer/... para los pares
+        "bind": "0.0.0.0",
+        "peers": [],                    # Pares fijos, p.ej. "http://192.168.1.21:7130"
+        "discovery": True,              # Anuncios por multicast UDP
+        "multicast_group": "239.255.71.30",
+        "discovery_port": 7131,
+        "announce_interval": 60,
+        "max_uploads": 2,               # Transferencias simultáneas a otros pares
+        "timeout": 5
+    },
+    
+    # Agregador de laboratorio (klipper_client.py --aggregator): un solo enlace
+    # al servidor para todas las impresoras; los clientes apuntan server_url y
+    # files_url a http://<agregador>:<port>/<misma ruta>
+    "aggregator": {
+        "port": 7140,
+        "bind": "0.0.0.0",
+        "upstream": "",                 # Origen del servidor (vacío = el de server_url)
+        "batch_interval": 5,            # Segundos entre lotes de actualizaciones
+        "command_interval": 3,          # Segundos entre consultas de comandos
+        "long_poll": 25,                # Espera máxima de get_commands con varios tokens
+        "compress": True,               # Lotes comprimidos con gzip
+        "max_outbox": 5000,             # Acciones guardadas durante un corte
+        "outbox_file": "aggregator_outbox.json",
+        "inbox_file": "aggregator_inbox.json",   # Comandos ya pedidos al servidor y aún no entregados
+        "cache_dir": "aggregator_cache",
+        "cache_max_mb": 2048,
+        "grant_ttl": 300                # Segundos que vale un permiso de descarga ya verificado
+    },
+    
+    # Descarga anticipada de los archivos asignados (requiere files_url)
+    "prefetch": {
+        "enabled": True,
+        "sync_interval": 600,
+        "max_rate_kb": 512,             # KB/s, 0 = sin límite
+        "max_disk_mb": 2048,            # No descargar si el directorio de G-code pasaría de esto
+        "only_when_idle": True
+    },
+    
+    # Planificador de las tareas del loop principal (reloj monotónico)
+    "scheduler": {
+        "jitter": 0.1,                  # Fracción del intervalo sumada al azar a cada ejecución
+        "misfire": "skip",              # Ejecuciones atrasadas: skip | catch_up | reschedule
+        "late_warning": 5,              # Segundos de retraso que se registran como advertencia
+        "jobs": {}                      # Por tarea, p.ej. {"health_check": {"jitter": 0}}
+    },
+    
+    # Recarga de configuración en caliente
+    "config_reload": {
+        "enabled": True,
+        "poll_interval": 2
+    },
+    
+    # Configuración de logging
+    "logging": {
+        "level": "INFO",
+        "max_size_mb": 10,
+        "backup_count": 5,
+        "verbose": False,
+        "format": "text",
+        "queue_size": 10000,  # Registros en espera de escribirse (los DEBUG/INFO que no entran se descartan)
+        "rate_limit": {
+            "window": 60,
+            "burst": 5
+        }
+    },
+    
+    # Persistencia de estado (escritura diferida)
+    "state": {
+        "backend": "json",
+        "flush_interval": 300
+    },
+    
+    # Agrupación de G-codes en un solo script
+    "gcode_batch": {
+        "enabled": True,
+        "max_lines": 50,
+        "flush_deadline": 0.5
+    },
+    
+    # Comandos
+    "commands": {
+        "plugins": []
+    },
+    
+    # Seguridad
+    "security": {
+        "validate_dangerous_commands": True,
+        "rate_limit_seconds": 1,
+        "rate_classes": {
+            "critical": 0,
+            "system": 30
+        },
+        "allowed_gcode_patterns": ["G*", "M*", "T*"],
+        "allowed_macro_patterns": ["*"],
+        "gcode_limits": {
+            "M104": {"S": [0, MAX_HOTEND_TEMP]},
+            "M109": {"S": [0, MAX_HOTEND_TEMP]},
+            "M140": {"S": [0, MAX_BED_TEMP]},
+            "M190": {"S": [0, MAX_BED_TEMP]},
+            "M106": {"S": [0, 255]},
+            "SET_HEATER_TEMPERATURE": {"TARGET": [0, MAX_HOTEND_TEMP]}
+        }
+    },
+    
+    # Arranque
+    "startup": {
+        "fast_start": True
+    },
+    
+    # Estimación de tiempo restante
+    "eta": {
+        "rate_time_constant": 300,
+        "blend_progress": 0.3
+    },
+    
+    # Índice de metadatos de G-code
+    "metadata_index": {
+        "enabled": True,
+        "index_file": "file_metadata.json",
+        "workers": 2,
+        "flush_interval": 60
+    },
+    
+    # Diagnóstico en campo (SIGUSR1 o acción "profile")
+    "profiling": {
+        "enabled": True,
+        "default_duration": 30,
+        "max_duration": 600,
+        "sample_interval": 0.01,
+        "output_dir": "profiles",
+        "max_reports": 10,
+        "upload": False
+    },
+    
+    # Registro de trabajos de impresión
+    "jobs": {
+        "enabled": True,
+        "store_file": "print_jobs.jsonl",
+        "sync_interval": 300,
+        "sync_batch": 50,
+        "max_entries": 1000
+    },
+    
+    # Auto-actualización
+    "auto_update": {
+        "enabled": False,
+        "check_interval": 3600,
+        "update_url": ""
+    },
+    
+    # Datos de la impresora
+    "printer_data": {
+        "tags": ["Prusa", "PLA"],
+        "filament": {
+            "material": "PLA",
+            "color": "Negro",
+            "remaining": 100
+        },
+        "bed_status": "limpia",
+        "location": "Lab Principal"
+    }
+}
+
+
+# ==============================================================================
+# GESTOR DE CONFIGURACIÓN
+# ==============================================================================
+
+class ConfigManager:
+    """Gestión de configuración con validación y valores por defecto"""
+    
+    def __init__(self, config_path: str):
+        self.config_path = config_path
+        self.config = self.load_or_create()
+    
+    def load_or_create(self) -> Dict:
+        """Cargar configuración o crear una nueva"""
+        if not os.path.exists(self.config_path):
+            print(f"📝 Creando archivo de configuración: {self.config_path}")
+            self.save(DEFAULT_CONFIG)
+            print("✅ Archivo de configuración creado")
+            print("🔧 Por favor edita el archivo con tus datos y vuelve a ejecutar")
+            sys.exit(0)
+        
+        try:
+            return self.read_config()
+            
+        except json.JSONDecodeError as e:
+            print(f"❌ Error en formato JSON: {e}")
+            sys.exit(1)
+        except Exception as e:
+            print(f"❌ Error cargando configuración: {e}")
+            sys.exit(1)
+    
+    def read_config(self) -> Dict:
+        """Leer, validar y mezclar la configuración (lanza excepción si es inválida)"""
+        with open(self.config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        
+        # Validar campos requeridos
+        self._validate_config(config)
+        
+        # Mezclar con valores por defecto
+        config = self._merge_with_defaults(config)
+        self._validate_values(config)
+        
+        return config
+    
+    def _validate_config(self, config: Dict):
+        """Validar campos requeridos"""
+        required = ['server_url', 'printer_token', 'printer_name', 'moonraker_url']
+        for field in required:
+            if field not in config:
+                raise ValueError(f"Campo requerido faltante: {field}")
+    
+    def _validate_values(self, config: Dict):
+        """Validar tipos y rangos de la configuración ya mezclada"""
+        for section in ('intervals', 'timeouts'):
+            for key, value in config[section].items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+                    raise ValueError(f"{section}.{key} debe ser un número positivo: {value!r}")
+        
+        if not isinstance(getattr(logging, str(config['logging'].get('level', 'INFO')), None), int):
+            raise ValueError(f"logging.level inválido: {config['logging'].get('level')!r}")
+        if config['logging'].get('format', 'text') not in ('text', 'json'):
+            raise ValueError(f"logging.format inválido: {config['logging'].get('format')!r}")
+        queue_size = config['logging'].get('queue_size', 10000)
+        if isinstance(queue_size, bool) or not isinstance(queue_size, int) or queue_size <= 0:
+            raise ValueError(f"logging.queue_size debe ser un entero positivo: {queue_size!r}")
+        
+        if config['gcode_cache'].get('policy', 'lru') not in ('lru', 'lfu'):
+            raise ValueError(f"gcode_cache.policy inválido: {config['gcode_cache'].get('policy')!r}")
+        
+        scheduler = config['scheduler']
+        for name, options in [('scheduler', scheduler)] + [(f"scheduler.jobs.{job}", opts) for job, opts in scheduler.get('jobs', {}).items()]:
+            if options.get('misfire', 'skip') not in Scheduler.MISFIRE_POLICIES:
+                raise ValueError(f"{name}.misfire inválido: {options.get('misfire')!r}")
+            jitter = options.get('jitter', 0)
+            if isinstance(jitter, bool) or not isinstance(jitter, (int, float)) or not 0 <= jitter <= 1:
+                raise ValueError(f"{name}.jitter debe estar entre 0 y 1: {jitter!r}")
+        
+        if not isinstance(config['camera'].get('urls', []), list):
+            raise ValueError("camera.urls debe ser una lista")
+        
+        # Compilar patrones para detectar expresiones regulares inválidas
+        security = config['security']
+        GcodeValidator(security.get('allowed_gcode_patterns'), security.get('gcode_limits'))
+        GcodeValidator.compile_patterns(security.get('allowed_macro_patterns'))
+    
+    def _merge_with_defaults(self, config: Dict) -> Dict:
+        """Mezclar configuración con valores por defecto"""
+        def deep_merge(default, custom):
+            result = default.copy()
+            for key, value in custom.items():
+                if key in result and isinstance(result[key], dict) and isinstance(value, dict):
+                    result[key] = deep_merge(result[key], value)
+                else:
+                    result[key] = value
+            return result
+        
+        return deep_merge(DEFAULT_CONFIG, config)
+    
+    def save(self, config: Dict):
+        """Guardar configuración"""
+        with open(self.config_path, 'w', encoding='utf-8') as f:
+            json.dump(config, f, indent=4, ensure_ascii=False)
+    
+    def reload(self) -> Dict:
+        """Recargar configuración; lanza excepción si el archivo es inválido"""
+        self.config = self.read_config()
+        return self.config
+
+
+class ConfigWatcher:
+    """Detecta cambios en el archivo de configuración
+    
+    Usa inotify (Linux) sobre el directorio para enterarse de escrituras y
+    renombres sin hacer stat() continuamente; en otros sistemas compara la
+    firma (mtime, tamaño, inode) cada poll_interval segundos.
+    """
+    
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    EVENT_HEADER = struct.Struct('iIII')
+    
+    def __init__(self, path: str, poll_interval: float = 2.0):
+        self.path = os.path.abspath(path)
+        self.poll_interval = poll_interval
+        self.signature = self._signature()
+        self.last_poll = time.monotonic()
+        self.inotify_fd = self._init_inotify()
+    
+    def _signature(self) -> Optional[Tuple[int, int, int]]:
+        """Firma del archivo para detectar cambios"""
+        try:
+            st = os.stat(self.path)
+            return (st.st_mtime_ns, st.st_size, st.st_ino)
+        except OSError:
+            return None
+    
+    def _init_inotify(self) -> Optional[int]:
+        """Registrar un watch de inotify sobre el directorio del archivo"""
+        if not sys.platform.startswith('linux'):
+            return None
+        try:
+            import ctypes
+            import ctypes.util
+            
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                return None
+            mask = self.IN_MODIFY | self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+            directory = os.path.dirname(self.path).encode()
+            if libc.inotify_add_watch(fd, directory, mask) < 0:
+                os.close(fd)
+                return None
+            return fd
+        except Exception:
+            return None
+    
+    @property
+    def mode(self) -> str:
+        return 'inotify' if self.inotify_fd is not None else 'polling'
+    
+    def _drain_inotify(self) -> bool:
+        """Leer eventos pendientes; True si alguno toca nuestro archivo"""
+        name = os.path.basename(self.path)
+        touched = False
+        while True:
+            try:
+                buffer = os.read(self.inotify_fd, 4096)
+            except BlockingIOError:
+                return touched
+            except OSError:
+                return True
+            if not buffer:
+                return touched
+            
+            offset = 0
+            while offset + self.EVENT_HEADER.size <= len(buffer):
+                _, _, _, length = self.EVENT_HEADER.unpack_from(buffer, offset)
+                offset += self.EVENT_HEADER.size
+                event_name = buffer[offset:offset + length].rstrip(b'\0').decode(errors='replace')
+                offset += length
+                if event_name == name:
+                    touched = True
+    
+    def has_changed(self) -> bool:
+        """Verificar (sin bloquear) si el archivo cambió desde la última vez"""
+        if self.inotify_fd is not None:
+            if not self._drain_inotify():
+                return False
+        else:
+            now = time.monotonic()
+            if now - self.last_poll < self.poll_interval:
+                return False
+            self.last_poll = now
+        
+        signature = self._signature()
+        if signature is None or signature == self.signature:
+            return False
+        
+        self.signature = signature
+        return True
+    
+    def close(self):
+        if self.inotify_fd is not None:
+            os.close(self.inotify_fd)
+            self.inotify_fd = None
@@ -0,0 +1,716 @@
+"""
+TecMedHub - Gestor de archivos: descargas, caché con cuota y descarga anticipada
+"""
+
+import time
+import sys
+import os
+import logging
+import fnmatch
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+import traceback
+import threading
+
+from .state import JsonStateBackend
+from .http_client import RobustHTTPClient
+
+
+class TokenBucket:
+    """Limitador de velocidad (bytes/s) con ráfaga; rate 0 = sin límite
+    
+    Los tokens pueden quedar negativos: consume() nunca parte un bloque, solo
+    duerme lo que ese bloque se adelantó a la velocidad configurada.
+    """
+    
+    def __init__(self, rate: float = 0, burst: float = 65536):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.last = time.monotonic()
+    
+    def consume(self, amount: int) -> float:
+        """Descontar 'amount' bytes durmiendo si hace falta; devuelve lo dormido"""
+        now = time.monotonic()
+        if self.rate <= 0:
+            self.tokens = self.burst
+            self.last = now
+            return 0.0
+        
+        self.tokens = min(self.tokens + (now - self.last) * self.rate, self.burst) - amount
+        self.last = now
+        if self.tokens >= 0:
+            return 0.0
+        
+        delay = -self.tokens / self.rate
+        time.sleep(delay)
+        return delay
+
+
+class FileManager:
+    """Gestión de archivos G-code con limpieza automática"""
+    
+    def __init__(self, config: Dict, logger: logging.Logger, http_client: RobustHTTPClient):
+        self.config = config
+        self.logger = logger
+        self.http = http_client
+        self.lock = threading.Lock()
+        self.downloads = {}  # Descargas en curso: nombre -> {'done': Event, 'max_rate': bytes/s}
+        self.cache = None
+        self.is_printing = lambda: False  # Lo reemplaza PrinterClient con el estado de print_stats
+        self.peers = None  # PeerCache si está habilitada
+        self.apply_config(config)
+        if config.get('gcode_cache', {}).get('enabled', True):
+            self.cache = GcodeCache(config, logger, self.gcode_dir)
+    
+    def apply_config(self, config: Dict):
+        """Aplicar configuración (también al recargar)"""
+        file_config = config.get('file_management', {})
+        gcode_dir = Path(file_config.get('gcode_directory', '/tmp/gcodes'))
+        gcode_dir.mkdir(parents=True, exist_ok=True)
+        
+        self.config = config
+        self.file_config = file_config
+        self.throttle_config = config.get('download_throttle', {})
+        self.gcode_dir = gcode_dir
+        if self.cache is not None:
+            self.cache.apply_config(config, gcode_dir)
+    
+    def download_file(self, filename: str, source_url: str, expected_checksum: str = '',
+                      on_header=None, header_bytes: int = 0, max_rate: float = 0,
+                      http: Optional[RobustHTTPClient] = None) -> Tuple[bool, Optional[str]]:
+        """Descargar archivo del servidor con verificación
+        
+        Se escribe en <archivo>.part y solo se renombra si el tamaño y el checksum
+        (MD5, si se indica) coinciden: Moonraker nunca ve un archivo a medias.
+        on_header(bytes) recibe los primeros header_bytes apenas llegan.
+        max_rate limita la velocidad (bytes/s, 0 = sin límite). Si el archivo ya
+        se está descargando (p.ej. por el prefetch), se quita ese límite y se
+        espera esa descarga en lugar de empezar otra.
+        """
+        local_path = self.gcode_dir / filename
+        with self.lock:
+            pending = self.downloads.get(filename)
+            if pending is None:
+                current = self.downloads[filename] = {'done': threading.Event(), 'max_rate': max_rate}
+            else:
+                pending['max_rate'] = 0
+        
+        if pending is not None:
+            self.logger.info(f"⏳ {filename} ya se está descargando, esperando")
+            pending['done'].wait()
+            if not local_path.exists():
+                return False, "Falló la descarga en curso"
+            if on_header:
+                with open(local_path, 'rb') as f:
+                    self._notify_header(on_header, f.read(header_bytes))
+            return True, str(local_path)
+        
+        try:
+            args = (filename, source_url, expected_checksum, on_header, header_bytes, current, http or self.http)
+            if not self.throttle_config.get('lower_priority', True):
+                return self._fetch(*args)
+            
+            # Hilo propio con prioridad baja: bajar la del que llama (p.ej. el
+            # loop principal) no tendría vuelta atrás sin privilegios
+            result = []
+            worker = threading.Thread(
+                target=lambda: (self._lower_priority(), result.append(self._fetch(*args))),
+                name='download', daemon=True
+            )
+            worker.start()
+            worker.join()
+            return result[0] if result else (False, "Descarga interrumpida")
+        finally:
+            with self.lock:
+                del self.downloads[filename]
+            current['done'].set()
+    
+    def _lower_priority(self):
+        """Bajar la prioridad de CPU (nice) y de E/S (ionice) del hilo actual"""
+        tid = threading.get_native_id()
+        nice = self.throttle_config.get('nice', 10)
+        if nice and hasattr(os, 'setpriority'):
+            try:
+                os.setpriority(os.PRIO_PROCESS, tid, min(os.getpriority(os.PRIO_PROCESS, tid) + nice, 19))
+            except OSError as e:
+                self.logger.debug(f"No se pudo bajar la prioridad de CPU: {e}")
+        
+        # Clase best-effort, nivel más bajo (Linux, util-linux)
+        if self.throttle_config.get('ionice', True) and sys.platform.startswith('linux'):
+            import shutil
+            import subprocess
+            ionice = shutil.which('ionice')
+            if ionice:
+                try:
+                    subprocess.run([ionice, '-c', '2', '-n', '7', '-p', str(tid)],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=2)
+                except (OSError, subprocess.SubprocessError) as e:
+                    self.logger.debug(f"No se pudo bajar la prioridad de E/S: {e}")
+    
+    def _download_rate(self, current: Dict) -> float:
+        """Velocidad permitida ahora (bytes/s, 0 = sin límite)"""
+        rates = [current['max_rate']]
+        if self.throttle_config.get('enabled', True) and self.is_printing():
+            rates.append(self.throttle_config.get('printing_rate_kb', 256) * 1024)
+        rates = [rate for rate in rates if rate > 0]
+        return min(rates) if rates else 0
+    
+    def _fetch(self, filename: str, source_url: str, expected_checksum: str, on_header,
+               header_bytes: int, current: Dict, http: RobustHTTPClient) -> Tuple[bool, Optional[str]]:
+        """Probar primero los pares de la red local que tienen ese MD5; después el servidor"""
+        if self.peers is not None and expected_checksum:
+            for peer_url in self.peers.lookup(expected_checksum):
+                success, result = self._download(
+                    filename, f"{peer_url}/peer/gcode/{expected_checksum.lower()}", expected_checksum,
+                    on_header, header_bytes, current, self.peers.http, peer=True
+                )
+                if success:
+                    self.peers.stats['hits'] += 1
+                    return success, result
+                self.logger.debug(f"Par {peer_url} no entregó {filename}: {result}")
+            self.peers.stats['misses'] += 1
+        
+        return self._download(filename, source_url, expected_checksum, on_header, header_bytes, current, http)
+    
+    def _download(self, filename: str, source_url: str, expected_checksum: str, on_header,
+                  header_bytes: int, current: Dict, http: RobustHTTPClient,
+                  peer: bool = False) -> Tuple[bool, Optional[str]]:
+        local_path = self.gcode_dir / filename
+        part_path = self.gcode_dir / f"{filename}.part"
+        try:
+            self.logger.info(f"📥 Descargando: {filename}{' (red local)' if peer else ''}")
+            
+            # Un par que falla no se reintenta: se pasa al siguiente o al servidor
+            response = http.get(
+                source_url,
+                timeout=self.peers.timeout if peer else self.config['timeouts']['file_download'],
+                stream=True,
+                max_attempts=1 if peer else None
+            )
+            
+            if not response:
+                return False, "Error de conexión"
+            
+            # files.php responde los errores como JSON con código 200
+            if response.headers.get('content-type', '').startswith('application/json'):
+                try:
+                    message = response.json().get('message')
+                except ValueError:
+                    message = None
+                return False, message or "El servidor no devolvió un archivo"
+            
+            # Lo que viene de un par siempre se verifica
+            verify = (peer or self.file_config.get('verify_checksums', True)) and bool(expected_checksum)
+            md5 = None
+            if verify:
+                import hashlib
+                md5 = hashlib.md5()
+            header = bytearray() if on_header else None
+            
+            # Descargar con progress
+            total_size = int(response.headers.get('content-length', 0))
+            downloaded = 0
+            
+            # Hacer lugar antes de escribir (si no alcanza, la descarga sigue igual)
+            if self.cache is not None and total_size:
+                self.cache.make_room(total_size, exclude={filename})
+            
+            # Escrituras secuenciales grandes y fdatasync periódico: sin ráfagas
+            # de write-back que compitan con Klipper por la SD
+            throttle = self.throttle_config
+            bucket = TokenBucket(burst=throttle.get('burst_kb', 256) * 1024)
+            sync_every = throttle.get('sync_every_mb', 4) * 1024 * 1024
+            datasync = getattr(os, 'fdatasync', os.fsync)
+            unsynced = 0
+            
+            with open(part_path, 'wb', buffering=throttle.get('write_buffer_kb', 1024) * 1024) as f:
+                for chunk in response.iter_content(chunk_size=65536):
+                    if chunk:
+                        f.write(chunk)
+                        downloaded += len(chunk)
+                        unsynced += len(chunk)
+                        if sync_every and unsynced >= sync_every:
+                            f.flush()
+                            datasync(f.fileno())
+                            unsynced = 0
+                        if md5:
+                            md5.update(chunk)
+                        
+                        if header is not None:
+                            header += chunk[:header_bytes - len(header)]
+                            if len(header) >= header_bytes:
+                                self._notify_header(on_header, bytes(header))
+                                header = None
+                        
+                        if total_size > 0:
+                            progress = (downloaded / total_size) * 100
+                            if downloaded % (1024 * 1024) == 0:  # Log cada MB
+                                self.logger.info(f"   {progress:.1f}% descargado")
+                        
+                        # Límite de velocidad (se reevalúa por bloque: imprimiendo o no)
+                        bucket.rate = self._download_rate(current)
+                        bucket.consume(len(chunk))
+                
+                if header is not None:
+                    # Archivo más corto que la cabecera pedida
+                    self._notify_header(on_header, bytes(header))
+                
+                f.flush()
+                datasync(f.fileno())
+            
+            if total_size > 0 and downloaded != total_size:
+                part_path.unlink(missing_ok=True)
+                return False, f"Descarga incompleta ({downloaded} de {total_size} bytes)"
+            
+            if md5 and md5.hexdigest() != expected_checksum.lower():
+                part_path.unlink(missing_ok=True)
+                return False, f"Checksum no coincide ({md5.hexdigest()} != {expected_checksum})"
+            
+            os.replace(part_path, local_path)
+            if self.cache is not None:
+                self.cache.add(filename, md5=md5.hexdigest() if md5 else None)
+                if md5 and self.peers is not None:
+                    self.peers.announce_soon()
+            self.logger.info(f"✅ Descargado: {filename} ({self.format_bytes(downloaded)})")
+            return True, str(local_path)
+            
+        except Exception as e:
+            part_path.unlink(missing_ok=True)
+            self.logger.error(f"❌ Error descargando {filename}: {e}")
+            return False, str(e)
+    
+    def _notify_header(self, on_header, header: bytes):
+        """Entregar la cabecera sin que un error del callback corte la descarga"""
+        try:
+            on_header(header)
+        except Exception as e:
+            self.logger.warning(f"Error procesando cabecera de descarga: {e}")
+    
+    def disk_usage(self) -> int:
+        """Bytes ocupados por los G-code del directorio"""
+        if self.cache is not None:
+            return self.cache.total
+        total = 0
+        for file_path in self.gcode_dir.glob('*.gcode'):
+            try:
+                total += file_path.stat().st_size
+            except OSError:
+                pass
+        return total
+    
+    def cleanup_old_files(self):
+        """Limpiar archivos antiguos (con la caché: aplicar su cuota en vez de la edad)"""
+        if self.cache is not None:
+            self.cache.maybe_rescan()
+            self.cache.enforce()
+            return
+        
+        if not self.file_config.get('auto_cleanup', True):
+            return
+        
+        max_age_days = self.file_config.get('max_age_days', 30)
+        cutoff_date = datetime.now() - timedelta(days=max_age_days)
+        
+        try:
+            removed = 0
+            for file_path in self.gcode_dir.glob('*.gcode'):
+                mtime = datetime.fromtimestamp(file_path.stat().st_mtime)
+                if mtime < cutoff_date:
+                    file_path.unlink()
+                    removed += 1
+            
+            if removed > 0:
+                self.logger.info(f"🧹 Limpiados {removed} archivos antiguos")
+                
+        except Exception as e:
+            self.logger.warning(f"Error en limpieza de archivos: {e}")
+    
+    def calculate_checksum(self, file_path: Path) -> str:
+        """Calcular checksum MD5"""
+        import hashlib
+        
+        md5 = hashlib.md5()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(8192), b''):
+                md5.update(chunk)
+        return md5.hexdigest()
+    
+    @staticmethod
+    def format_bytes(bytes_val: int) -> str:
+        """Formatear bytes a string legible"""
+        for unit in ['B', 'KB', 'MB', 'GB']:
+            if bytes_val < 1024.0:
+                return f"{bytes_val:.1f} {unit}"
+            bytes_val /= 1024.0
+        return f"{bytes_val:.1f} TB"
+
+
+class GcodeCache:
+    """Índice en memoria del directorio de G-code con cuota y expulsión LRU/LFU
+    
+    El directorio se recorre una vez al iniciar (y cada rescan_interval, por
+    si se suben archivos desde Mainsail/Fluidd); después el índice se
+    mantiene con las descargas, los comandos print y los trabajos que ve el
+    JobTracker, así que decidir qué borrar no vuelve a recorrer el disco.
+    Al pasar la cuota se borra, empezando por el menos usado, hasta quedar
+    bajo low_water * cuota. Nunca se borran el archivo que se imprime, los
+    asignados a la impresora ni los que coinciden con los patrones 'pinned'.
+    """
+    
+    def __init__(self, config: Dict, logger: logging.Logger, gcode_dir: Path):
+        cache_config = config.get('gcode_cache', {})
+        self.logger = logger
+        self.backend = JsonStateBackend(cache_config.get('index_file', 'gcode_cache.json'))
+        self.lock = threading.RLock()
+        self.entries = {}      # nombre -> {'size', 'mtime', 'last_used', 'uses', 'md5'}
+        self.total = 0
+        self.active = None     # Archivo en impresión
+        self.assigned = set()  # Asignados por el servidor (prefetch)
+        self.dirty = False
+        self.last_flush = time.monotonic()
+        self.last_scan = 0
+        self.apply_config(config, gcode_dir)
+        
+        try:
+            saved = self.backend.read() or {}
+        except Exception as e:
+            self.logger.warning(f"Índice de la caché de G-code ilegible, se reconstruye: {e}")
+            saved = {}
+            try:
+                self.backend.quarantine()
+            except OSError:
+                pass
+        self.scan(saved)
+    
+    def apply_config(self, config: Dict, gcode_dir: Path):
+        """Aplicar configuración (también al recargar)"""
+        cache_config = config.get('gcode_cache', {})
+        self.gcode_dir = gcode_dir
+        self.quota = cache_config.get('quota_mb', 4096) * 1024 * 1024
+        self.low_water = min(max(cache_config.get('low_water', 0.8), 0.1), 1.0)
+        self.policy = cache_config.get('policy', 'lru')
+        self.pin_patterns = cache_config.get('pinned', [])
+        self.flush_interval = cache_config.get('flush_interval', 300)
+        self.rescan_interval = cache_config.get('rescan_interval', 21600)
+    
+    def scan(self, saved: Optional[Dict] = None):
+        """Reconstruir el índice desde el disco conservando el historial de uso"""
+        previous = saved if saved is not None else self.entries
+        entries = {}
+        for file_path in self.gcode_dir.glob('*.gcode'):
+            try:
+                stat = file_path.stat()
+            except OSError:
+                continue
+            prior = previous.get(file_path.name, {})
+            unchanged = prior.get('size') == stat.st_size and prior.get('mtime') == stat.st_mtime
+            entries[file_path.name] = {
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'last_used': prior.get('last_used', stat.st_mtime),
+                'uses': prior.get('uses', 0),
+                'md5': prior.get('md5') if unchanged else None
+            }
+        with self.lock:
+            self.entries = entries
+            self.total = sum(entry['size'] for entry in entries.values())
+            self.dirty = True
+        self.last_scan = time.monotonic()
+    
+    def maybe_rescan(self):
+        """Reconciliar con el disco cada rescan_interval"""
+        if time.monotonic() - self.last_scan >= self.rescan_interval:
+            self.scan()
+    
+    def add(self, name: str, md5: Optional[str] = None):
+        """Registrar un archivo recién descargado (con su MD5 si se verificó)"""
+        try:
+            stat = (self.gcode_dir / name).stat()
+        except OSError:
+            return
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is not None:
+                self.total -= entry['size']
+            self.entries[name] = {
+                'size': stat.st_size,
+                'mtime': stat.st_mtime,
+                'last_used': time.time(),
+                'uses': entry['uses'] if entry else 0,
+                'md5': md5
+            }
+            self.total += stat.st_size
+            self.dirty = True
+            self.enforce(exclude={name})
+    
+    def touch(self, name: str, count: bool = False):
+        """Marcar uso de un archivo (count=True al empezar una impresión)"""
+        with self.lock:
+            entry = self.entries.get(os.path.basename(name))
+            if entry is None:
+                return
+            entry['last_used'] = time.time()
+            if count:
+                entry['uses'] += 1
+            self.dirty = True
+    
+    def set_md5(self, name: str, md5: str, mtime: float):
+        """Registrar el MD5 de una copia local (si no cambió desde que se calculó)"""
+        with self.lock:
+            entry = self.entries.get(name)
+            if entry is not None and entry['mtime'] == mtime and entry.get('md5') != md5:
+                entry['md5'] = md5
+                self.dirty = True
+    
+    def hashes(self) -> Dict[str, str]:
+        """MD5 -> nombre de los archivos con checksum conocido"""
+        with self.lock:
+            return {entry['md5']: name for name, entry in self.entries.items() if entry.get('md5')}
+    
+    def set_active(self, name: Optional[str]):
+        self.active = os.path.basename(name) if name else None
+    
+    def set_assigned(self, names):
+        self.assigned = set(names)
+    
+    def is_pinned(self, name: str) -> bool:
+        return name == self.active or name in self.assigned or \
+            any(fnmatch.fnmatch(name, pattern) for pattern in self.pin_patterns)
+    
+    def make_room(self, size: int, limit: Optional[int] = None, exclude=()) -> bool:
+        """Liberar espacio para un archivo de 'size' bytes; False si no cabe bajo el límite"""
+        limit = min(limit, self.quota) if limit else self.quota
+        with self.lock:
+            if self.total + size <= limit:
+                return True
+            # Bajar hasta low_water para no expulsar en cada descarga
+            self._evict_to(min(limit, self.low_water * self.quota) - size, exclude)
+            return self.total + size <= limit
+    
+    def enforce(self, exclude=()):
+        """Volver bajo low_water si se pasó la cuota"""
+        with self.lock:
+            if self.total > self.quota:
+                self._evict_to(self.low_water * self.quota, exclude)
+    
+    def _evict_to(self, target: float, exclude) -> int:
+        if self.policy == 'lfu':
+            key = lambda item: (item[1]['uses'], item[1]['last_used'])
+        else:
+            key = lambda item: (item[1]['last_used'], item[1]['uses'])
+        
+        freed = removed = 0
+        for name, entry in sorted(self.entries.items(), key=key):
+            if self.total <= target:
+                break
+            if name in exclude or self.is_pinned(name):
+                continue
+            try:
+                (self.gcode_dir / name).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self.logger.warning(f"No se pudo borrar {name} de la caché: {e}")
+                continue
+            del self.entries[name]
+            self.total -= entry['size']
+            freed += entry['size']
+            removed += 1
+        
+        if removed:
+            self.dirty = True
+            self.logger.info(
+                f"🧹 Caché de G-code: {removed} archivos expulsados ({FileManager.format_bytes(freed)}), "
+                f"ocupado {FileManager.format_bytes(self.total)} de {FileManager.format_bytes(self.quota)}"
+            )
+        return freed
+    
+    def maybe_flush(self) -> bool:
+        """Escribir si hay cambios y pasó el intervalo"""
+        if self.dirty and time.monotonic() - self.last_flush >= self.flush_interval:
+            return self.flush()
+        return False
+    
+    def flush(self) -> bool:
+        """Guardar el índice inmediatamente"""
+        with self.lock:
+            snapshot = {name: dict(entry) for name, entry in self.entries.items()}
+            self.dirty = False
+        try:
+            self.backend.write(snapshot)
+            return True
+        except Exception as e:
+            self.dirty = True  # Sigue pendiente: se reintenta en el próximo maybe_flush
+            self.logger.debug(f"Error guardando índice de la caché de G-code: {e}")
+            return False
+        finally:
+            self.last_flush = time.monotonic()
+
+
+class FilePrefetcher:
+    """Descarga anticipada de los G-code asignados a la impresora
+    
+    Cada sync_interval consulta files.php?action=list_files (printer-api) y,
+    mientras la impresora está libre, descarga los archivos que faltan o cuyo
+    MD5 no coincide, con límite de velocidad y sin pasar la cuota de disco.
+    Cada archivo descargado se marca con mark_downloaded. Así un comando
+    print casi siempre encuentra el archivo ya en local.
+    
+    Solo cuentan los asignados a esta impresora ('assigned'): la biblioteca
+    global (printer_id NULL) es de todas, no se descarga de antemano, no se
+    protege en la caché y su marca 'downloaded' compartida no se toca.
+    """
+    
+    def __init__(self, config: Dict, logger: logging.Logger, file_manager: FileManager, is_idle):
+        self.logger = logger
+        self.file_manager = file_manager
+        self.is_idle = is_idle  # () -> bool
+        self.http = file_manager.http.fork()  # Corre en otro hilo
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.checksums = {}  # nombre -> (mtime, md5) de las copias locales ya verificadas
+        self.stats = {'downloaded': 0, 'bytes': 0, 'failed': 0}
+        self.apply_config(config)
+    
+    def apply_config(self, config: Dict):
+        """Aplicar configuración (también al recargar)"""
+        prefetch_config = config.get('prefetch', {})
+        self.config = config
+        self.files_url = config.get('files_url', '')
+        self.sync_interval = max(prefetch_config.get('sync_interval', 600), 10)
+        self.max_rate = prefetch_config.get('max_rate_kb', 512) * 1024
+        self.max_disk = prefetch_config.get('max_disk_mb', 2048) * 1024 * 1024
+        self.only_when_idle = prefetch_config.get('only_when_idle', True)
+        self.http.apply_config(config)
+    
+    def start(self):
+        """Iniciar hilo de descarga anticipada"""
+        if self.thread is not None or not self.files_url:
+            return
+        self.thread = threading.Thread(target=self._run, name='prefetch', daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Detener hilo (una descarga en curso termina antes de salir)"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+            self.thread = None
+    
+    def _run(self):
+        delay = self.config['intervals'].get('health_check', 60)  # Dejar arrancar al cliente
+        while not self.stop_event.wait(delay):
+            try:
+                done = self.sync()
+            except Exception as e:
+                self.logger.warning(f"Error en descarga anticipada: {e}")
+                self.logger.debug(traceback.format_exc())
+                done = False
+            # Ocupada o sin servidor: volver a mirar antes del intervalo completo
+            delay = self.sync_interval if done else min(self.sync_interval, 60)
+    
+    def _can_download(self) -> bool:
+        return not self.stop_event.is_set() and (not self.only_when_idle or self.is_idle())
+    
+    def sync(self) -> bool:
+        """Descargar lo que falta; False si hay que reintentar pronto"""
+        if not self._can_download():
+            return False
+        
+        files = self.list_files()
+        if files is None:
+            return False
+        files = [f for f in files if f.get('assigned') is True]
+        
+        cache = self.file_manager.cache
+        if cache is not None:
+            # Los asignados no se expulsan para hacer lugar a otros
+            cache.set_assigned(os.path.basename(f['name']) for f in files if f.get('name'))
+        
+        for f in files:
+            if not f.get('exists', True) or not f.get('name'):
+                continue
+            if not self._can_download():
+                return False
+            
+            name = os.path.basename(f['name'])
+            if self._is_current(name, f):
+                if not f.get('downloaded'):
+                    self.mark_downloaded(name)
+                continue
+            
+            size = f.get('size_bytes', 0)
+            if cache is not None:
+                fits = cache.make_room(size, limit=self.max_disk, exclude={name})
+            else:
+                fits = self.file_manager.disk_usage() + size <= self.max_disk
+            if not fits:
+                self.logger.debug(f"Prefetch: {name} no cabe en la cuota ({self.file_manager.format_bytes(size)})")
+                continue
+            
+            url = (f"{self.files_url}?action=download_file&file={quote(name)}"
+                   f"&printer_token={quote(self.config['printer_token'])}")
+            success, error = self.file_manager.download_file(
+                name, url, f.get('md5') or '', max_rate=self.max_rate, http=self.http
+            )
+            if not success:
+                self.stats['failed'] += 1
+                self.logger.warning(f"Prefetch de {name} falló: {error}")
+                continue
+            
+            self.stats['downloaded'] += 1
+            self.stats['bytes'] += size
+            self.mark_downloaded(name)
+        return True
+    
+    def list_files(self) -> Optional[List[Dict]]:
+        """Archivos asignados a esta impresora (o a todas)"""
+        response = self.http.get(
+            self.files_url,
+            params={'action': 'list_files', 'printer_token': self.config['printer_token']},
+            timeout=self.config['timeouts']['server'],
+            max_attempts=1
+        )
+        if response is None or response.status_code != 200:
+            return None
+        try:
+            result = response.json()
+        except ValueError:
+            return None
+        if not result.get('success'):
+            self.logger.debug(f"Prefetch: list_files rechazado: {result.get('message')}")
+            return None
+        return result.get('files') or []
+    
+    def mark_downloaded(self, name: str) -> bool:
+        """Avisar al servidor que el archivo ya está en la impresora"""
+        response = self.http.post(
+            self.files_url,
+            json={'action': 'mark_downloaded', 'file': name, 'printer_token': self.config['printer_token']},
+            timeout=self.config['timeouts']['server'],
+            max_attempts=1
+        )
+        return response is not None and response.status_code == 200
+    
+    def _is_current(self, name: str, f: Dict) -> bool:
+        """La copia local existe y coincide en tamaño y MD5 (calculado una vez por mtime)"""
+        local_path = self.file_manager.gcode_dir / name
+        try:
+            stat = local_path.stat()
+        except OSError:
+            return False
+        if f.get('size_bytes') and stat.st_size != f['size_bytes']:
+            return False
+        if not f.get('md5'):
+            return True
+        
+        cached = self.checksums.get(name)
+        if cached is None or cached[0] != stat.st_mtime:
+            cached = (stat.st_mtime, self.file_manager.calculate_checksum(local_path))
+            self.checksums[name] = cached
+            if self.file_manager.cache is not None:
+                self.file_manager.cache.set_md5(name, cached[1], stat.st_mtime)
+        return cached[1] == f['md5'].lower()
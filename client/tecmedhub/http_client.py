@@ -0,0 +1,98 @@
+"""
+TecMedHub - Cliente HTTP con reintentos
+"""
+
+import requests
+import time
+import logging
+from typing import Dict, Optional
+
+from .config import VERSION
+
+
+class RobustHTTPClient:
+    """Cliente HTTP con reintentos exponenciales y manejo de errores
+    
+    Varios clientes pueden compartir una sesión (y su pool de conexiones)
+    desde hilos distintos; cada uno conserva su propio last_error.
+    """
+    
+    def __init__(self, config: Dict, logger: logging.Logger, session: Optional[requests.Session] = None):
+        self.config = config
+        self.logger = logger
+        self.session = session or self.new_session()
+        self.last_error = None
+    
+    @staticmethod
+    def new_session(pool_size: int = 10) -> requests.Session:
+        """Sesión con hasta pool_size conexiones abiertas por host"""
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({
+            'User-Agent': f'TecMedHub-Client/{VERSION}'
+        })
+        return session
+    
+    def fork(self) -> 'RobustHTTPClient':
+        """Otro cliente sobre la misma sesión, para usar desde otro hilo"""
+        return RobustHTTPClient(self.config, self.logger, self.session)
+    
+    def apply_config(self, config: Dict):
+        """Aplicar configuración recargada"""
+        self.config = config
+    
+    def request(self, method: str, url: str, max_attempts: Optional[int] = None,
+                **kwargs) -> Optional[requests.Response]:
+        """Realizar petición con reintentos"""
+        retry_config = self.config.get('retries', {})
+        max_attempts = max_attempts or retry_config.get('max_attempts', 5)
+        base_delay = retry_config.get('base_delay', 2)
+        exponential = retry_config.get('exponential_backoff', True)
+        
+        for attempt in range(max_attempts):
+            try:
+                response = self.session.request(method, url, **kwargs)
+                response.raise_for_status()
+                return response
+                
+            except requests.exceptions.RequestException as e:
+                if attempt < max_attempts - 1:
+                    delay = base_delay * (2 ** attempt if exponential else 1)
+                    self.logger.warning(
+                        f"Intento {attempt + 1}/{max_attempts} falló: {e}. "
+                        f"Reintentando en {delay}s..."
+                    )
+                    time.sleep(delay)
+                else:
+                    self.logger.error(f"Todos los intentos fallaron: {e}")
+                    self.last_error = self._describe_error(e)
+                    return None
+        
+        return None
+    
+    @staticmethod
+    def _describe_error(error: requests.exceptions.RequestException) -> str:
+        """Extraer el mensaje de error devuelto por el servidor si existe"""
+        response = getattr(error, 'response', None)
+        if response is not None:
+            try:
+                body = response.json()
+            except ValueError:
+                body = None
+            
+            # Moonraker responde {"error": {"code": ..., "message": ...}}
+            if isinstance(body, dict) and isinstance(body.get('error'), dict):
+                message = body['error'].get('message')
+                if message:
+                    return str(message)
+        return str(error)
+    
+    def get(self, url: str, **kwargs) -> Optional[requests.Response]:
+        """GET request"""
+        return self.request('GET', url, **kwargs)
+    
+    def post(self, url: str, **kwargs) -> Optional[requests.Response]:
+        """POST request"""
+        return self.request('POST', url, **kwargs)
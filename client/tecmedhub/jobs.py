@@ -0,0 +1,310 @@
+"""
+TecMedHub - Registro de trabajos de impresión y estimación de tiempo restante
+"""
+
+import time
+import json
+import os
+import math
+import tempfile
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from .anomalies import Ewma
+
+
+class JobStore:
+    """Registro local de trabajos terminados, solo de agregado (JSON lines)
+    
+    Cada trabajo es una línea con un id creciente; el cursor de
+    sincronización (último id enviado) lo guarda el StateManager. Cuando el
+    archivo supera el doble de max_entries se reescribe de forma atómica
+    conservando los últimos y los que faltan sincronizar.
+    """
+    
+    def __init__(self, path: str, max_entries: int = 1000):
+        self.path = path
+        self.max_entries = max_entries
+        self.last_id = 0
+        self.count = 0
+        self.last_record = None
+        
+        for record in self._read():
+            self.last_id = max(self.last_id, record['id'])
+            self.count += 1
+            self.last_record = record
+    
+    def _read(self):
+        """Iterar registros válidos (las líneas dañadas se ignoran)"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(record, dict) and isinstance(record.get('id'), int):
+                        yield record
+        except FileNotFoundError:
+            return
+    
+    def append(self, record: Dict, synced_id: int = 0) -> Dict:
+        """Agregar un trabajo terminado (asigna el id)"""
+        record = dict(record, id=self.last_id + 1)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        
+        self.last_id = record['id']
+        self.last_record = record
+        self.count += 1
+        if self.count > 2 * self.max_entries:
+            self.compact(synced_id)
+        return record
+    
+    def read_after(self, cursor: int, limit: int) -> List[Dict]:
+        """Trabajos con id mayor al cursor (los pendientes de sincronizar)"""
+        if cursor >= self.last_id:
+            return []
+        pending = []
+        for record in self._read():
+            if record['id'] > cursor:
+                pending.append(record)
+                if len(pending) >= limit:
+                    break
+        return pending
+    
+    def compact(self, synced_id: int = 0):
+        """Reescribir conservando los últimos max_entries y los no sincronizados"""
+        records = list(self._read())
+        keep_from = len(records) - self.max_entries
+        records = [r for i, r in enumerate(records) if i >= keep_from or r['id'] > synced_id]
+        
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(prefix='.jobs-', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                for record in records:
+                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+            raise
+        self.count = len(records)
+
+
+class JobTracker:
+    """Sigue las transiciones de print_stats y arma las métricas de cada trabajo
+    
+    Se alimenta con el mismo estado que collect_printer_data(), así que no
+    agrega consultas a Moonraker salvo la de metadatos al empezar un trabajo.
+    """
+    
+    ACTIVE_STATES = ('printing', 'paused')
+    FINAL_STATES = ('complete', 'cancelled', 'error')
+    HEAT_BAND = 3.0  # °C respecto al objetivo para dar por terminado el precalentado
+    
+    def __init__(self, store: JobStore, metadata_lookup=None, on_start=None):
+        self.store = store
+        self.metadata_lookup = metadata_lookup  # filename -> metadatos de Moonraker
+        self.on_start = on_start  # filename -> None, solo para trabajos vistos desde el inicio
+        self.job = None
+        self.observed = False
+    
+    def observe(self, status: Dict, now: Optional[float] = None, synced_id: int = 0) -> Optional[Dict]:
+        """Procesar una muestra; devuelve el trabajo si acaba de terminar"""
+        print_stats = status.get('print_stats')
+        if not print_stats:
+            return None
+        
+        now = time.time() if now is None else now
+        state = print_stats.get('state')
+        filename = print_stats.get('filename', '')
+        first = not self.observed
+        self.observed = True
+        finished = None
+        
+        # Otro archivo sin pasar por un estado final
+        if self.job is not None and state in self.ACTIVE_STATES and filename != self.job['filename']:
+            finished = self._finish('interrupted', now, synced_id)
+        
+        if self.job is None and state in self.ACTIVE_STATES:
+            self._start(filename, print_stats, now, resumed=first)
+        
+        job = self.job
+        if job is None:
+            return finished
+        
+        job['print_duration'] = print_stats.get('print_duration', job['print_duration'])
+        job['filament_used'] = print_stats.get('filament_used', job['filament_used'])
+        
+        if state == 'paused' and job['_paused_at'] is None:
+            job['_paused_at'] = now
+            job['pauses'] += 1
+        elif state != 'paused' and job['_paused_at'] is not None:
+            job['paused_time'] += now - job['_paused_at']
+            job['_paused_at'] = None
+        
+        # Sin el inicio real (cliente arrancado a mitad de impresión) no se mide
+        if job['heat_up_time'] is None and job['tracked_from_start'] and state == 'printing' \
+                and self._heated(status):
+            job['heat_up_time'] = round(now - job['_started'], 1)
+        
+        if state in self.FINAL_STATES:
+            finished = self._finish(state, now, synced_id)
+        elif state not in self.ACTIVE_STATES:
+            # standby sin estado final: SDCARD_RESET_FILE o reinicio de Klippy
+            finished = self._finish('interrupted', now, synced_id)
+        
+        return finished
+    
+    def _start(self, filename: str, print_stats: Dict, now: float, resumed: bool):
+        """Abrir un trabajo (si el cliente arrancó a mitad de impresión se estima el inicio)"""
+        started = now - print_stats.get('total_duration', 0) if resumed else now
+        estimated = None
+        if self.metadata_lookup is not None and filename:
+            metadata = self.metadata_lookup(filename) or {}
+            estimated = metadata.get('estimated_time')
+        
+        self.job = {
+            'filename': filename,
+            'started': datetime.fromtimestamp(started).isoformat(),
+            'tracked_from_start': not resumed,
+            'heat_up_time': None,
+            'estimated_time': estimated,
+            'print_duration': 0,
+            'filament_used': 0,
+            'pauses': 0,
+            'paused_time': 0.0,
+            '_started': started,
+            '_paused_at': None
+        }
+        if self.on_start is not None and filename and not resumed:
+            self.on_start(filename)
+    
+    def _finish(self, state: str, now: float, synced_id: int) -> Dict:
+        """Cerrar el trabajo actual y guardarlo"""
+        job = self.job
+        self.job = None
+        if job['_paused_at'] is not None:
+            job['paused_time'] += now - job['_paused_at']
+        
+        record = {key: value for key, value in job.items() if not key.startswith('_')}
+        record.update({
+            'ended': datetime.fromtimestamp(now).isoformat(),
+            'state': state,
+            'duration': round(now - job['_started'], 1),
+            'print_duration': round(job['print_duration'], 1),
+            'filament_used': round(job['filament_used'], 1),
+            'paused_time': round(job['paused_time'], 1)
+        })
+        return self.store.append(record, synced_id)
+    
+    def _heated(self, status: Dict) -> bool:
+        """Todos los calentadores con objetivo llegaron a su temperatura"""
+        targets = 0
+        for name, values in status.items():
+            # El objetivo de un temperature_fan es de enfriamiento, no de calentado
+            if name.startswith('temperature_fan') or not isinstance(values, dict):
+                continue
+            target = values.get('target')
+            if not target or 'temperature' not in values:
+                continue
+            targets += 1
+            if abs(values['temperature'] - target) > self.HEAT_BAND:
+                return False
+        return targets > 0
+    
+    def last_completed(self) -> Optional[str]:
+        """Último trabajo terminado como "archivo (HH:MM)" """
+        record = self.store.last_record
+        if not record:
+            return None
+        ended = datetime.fromisoformat(record['ended'])
+        return f"{record['filename']} ({ended.strftime('%H:%M')})"
+
+
+# ==============================================================================
+# ESTIMACIÓN DE TIEMPO RESTANTE
+# ==============================================================================
+
+class EtaEstimator:
+    """Tiempo restante a partir del progreso por posición en el archivo
+    
+    Combina la estimación del slicer (estimated_time escalado por lo que
+    falta del archivo) con la velocidad de avance observada, suavizada con
+    una EWMA de constante de tiempo fija para que no dependa de cada cuánto
+    llegan las muestras. Al comienzo pesa el slicer y a medida que avanza la
+    impresión pesa la velocidad observada. Estado O(1) por impresión.
+    """
+    
+    def __init__(self, config: Dict, metadata_lookup=None):
+        self.metadata_lookup = metadata_lookup  # filename -> metadatos de Moonraker
+        self.rate = Ewma(1.0)
+        self.apply_config(config)
+        self.reset()
+    
+    def apply_config(self, config: Dict):
+        """Aplicar configuración"""
+        eta_config = config.get('eta', {})
+        self.time_constant = eta_config.get('rate_time_constant', 300)
+        self.blend_progress = eta_config.get('blend_progress', 0.3)
+    
+    def reset(self, filename: Optional[str] = None):
+        """Empezar con otro archivo (o ninguno)"""
+        self.filename = filename
+        self.estimated_time = None
+        self.last_progress = None
+        self.last_duration = None
+        self.remaining = None
+        self.rate.reset()
+        
+        if filename and self.metadata_lookup is not None:
+            metadata = self.metadata_lookup(filename) or {}
+            if isinstance(metadata.get('estimated_time'), (int, float)):
+                self.estimated_time = metadata['estimated_time']
+    
+    def observe(self, status: Dict) -> Optional[float]:
+        """Procesar una muestra; devuelve los segundos restantes (None si no imprime)"""
+        print_stats = status.get('print_stats', {})
+        state = print_stats.get('state')
+        if state not in ('printing', 'paused'):
+            if self.filename is not None:
+                self.reset()
+            return None
+        
+        filename = print_stats.get('filename', '')
+        if filename != self.filename:
+            self.reset(filename)
+        
+        progress = status.get('virtual_sdcard', {}).get('progress')
+        duration = print_stats.get('print_duration', 0)
+        if progress is None or state == 'paused':
+            return self.remaining
+        
+        # Velocidad de avance solo desde que el archivo empieza a avanzar (no durante el precalentado)
+        if progress > 0 and self.last_progress is not None:
+            elapsed = duration - self.last_duration
+            advanced = progress - self.last_progress
+            if elapsed > 0 and advanced >= 0:
+                self.rate.alpha = 1 - math.exp(-elapsed / self.time_constant)
+                self.rate.update(advanced / elapsed)
+        self.last_progress = progress
+        self.last_duration = duration
+        
+        left = max(1.0 - progress, 0.0)
+        slicer = self.estimated_time * left if self.estimated_time else None
+        observed = left / self.rate.value if self.rate.value else None
+        
+        if slicer is not None and observed is not None:
+            weight = min(progress / self.blend_progress, 1.0) if self.blend_progress > 0 else 1.0
+            self.remaining = weight * observed + (1 - weight) * slicer
+        else:
+            self.remaining = observed if observed is not None else slicer
+        return self.remaining
@@ -0,0 +1,219 @@
+"""
+TecMedHub - Sistema de logging (cola, límite de repeticiones, formato JSON)
+"""
+
+import json
+import sys
+import logging
+from typing import Dict
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
+from queue import Queue, Full
+
+from .config import LOG_FILE
+
+
+class ColoredFormatter(logging.Formatter):
+    """Formatter con colores para terminal"""
+    
+    COLORS = {
+        'DEBUG': '\033[36m',    # Cyan
+        'INFO': '\033[32m',     # Green
+        'WARNING': '\033[33m',  # Yellow
+        'ERROR': '\033[31m',    # Red
+        'CRITICAL': '\033[35m', # Magenta
+        'RESET': '\033[0m'
+    }
+    
+    def format(self, record):
+        if sys.stdout.isatty():
+            # Copia: el mismo registro lo formatean también los otros handlers
+            record = logging.makeLogRecord(record.__dict__)
+            levelname = record.levelname
+            record.levelname = f"{self.COLORS.get(levelname, '')}{levelname}{self.COLORS['RESET']}"
+        return super().format(record)
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Una línea JSON compacta por registro (para ingesta automática)"""
+    
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'src': f"{record.module}:{record.lineno}"
+        }
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            entry['suppressed'] = suppressed
+        dropped = getattr(record, 'dropped', 0)
+        if dropped:
+            entry['dropped'] = dropped
+        return json.dumps(entry, ensure_ascii=False, separators=(',', ':'))
+
+
+class RateLimitFilter(logging.Filter):
+    """Descarta repeticiones antes de encolarlas
+    
+    La clave de cada mensaje es el lugar desde donde se registra (módulo y
+    línea), que no cambia aunque el texto lleve números distintos. Por
+    clave pasan como mucho 'burst' registros por ventana y nunca el mismo
+    texto dos veces seguidas dentro de la ventana; el siguiente que pasa
+    informa cuántos se suprimieron. WARNING y superiores nunca se descartan,
+    ni los registros marcados como auditoría (extra=AUDIT, p.ej. cada
+    comando ejecutado).
+    """
+    
+    def __init__(self, window: float = 60, burst: int = 5):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self.keys = {}  # clave -> [inicio de ventana, emitidos, suprimidos, último texto]
+    
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or self.window <= 0 or getattr(record, 'audit', False):
+            return True
+        
+        now = record.created
+        key = (record.module, record.lineno)
+        state = self.keys.get(key)
+        if state is None:
+            if len(self.keys) > 1024:
+                self.keys.clear()
+            state = self.keys[key] = [now, 0, 0, None]
+        elif now - state[0] >= self.window:
+            state[0] = now
+            state[1] = 0
+        
+        message = record.getMessage()
+        if state[1] >= self.burst or (message == state[3] and state[1] > 0):
+            state[2] += 1
+            return False
+        
+        if state[2]:
+            record.msg = f"{message} (+{state[2]} similares suprimidos)"
+            record.args = None
+            record.suppressed = state[2]
+            state[2] = 0
+        state[1] += 1
+        state[3] = message
+        return True
+
+
+class BoundedQueueHandler(QueueHandler):
+    """QueueHandler para una cola con límite
+    
+    Con la cola llena, los DEBUG/INFO se descartan y se cuentan; el próximo
+    registro que entra indica cuántos se perdieron. WARNING y superiores y
+    los registros de auditoría esperan lugar en la cola.
+    """
+    
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+    
+    def enqueue(self, record):
+        if self.dropped:
+            record.msg = f"{record.msg} (+{self.dropped} registros descartados por cola llena)"
+            record.dropped = self.dropped
+        if record.levelno >= logging.WARNING or getattr(record, 'audit', False):
+            self.queue.put(record)
+        else:
+            try:
+                self.queue.put_nowait(record)
+            except Full:
+                self.dropped += 1
+                return
+        self.dropped = 0
+
+
+class BlockingQueueListener(QueueListener):
+    """QueueListener que al detenerse espera lugar para el centinela"""
+    
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+# Hilo que escribe los registros encolados y handler que los encola (ver setup_logging)
+_log_listener = None
+_log_handler = None
+
+# extra= de los registros de auditoría (comandos): RateLimitFilter no los toca
+AUDIT = {'audit': True}
+
+
+def setup_logging(config: Dict) -> logging.Logger:
+    """Configurar sistema de logging
+    
+    El loop principal solo encola los registros (QueueHandler); un hilo
+    (QueueListener) los escribe al archivo y a la consola. Si ya estaba
+    configurado, la configuración anterior se detiene y se reemplaza.
+    """
+    global _log_listener, _log_handler
+    stop_logging()
+    logger = logging.getLogger('TecMedHub')
+    
+    log_config = config.get('logging', {})
+    level = getattr(logging, log_config.get('level', 'INFO'))
+    logger.setLevel(level)
+    
+    # Handler para archivo con rotación
+    max_bytes = log_config.get('max_size_mb', 10) * 1024 * 1024
+    file_handler = RotatingFileHandler(
+        LOG_FILE,
+        maxBytes=max_bytes,
+        backupCount=log_config.get('backup_count', 5),
+        encoding='utf-8'
+    )
+    if log_config.get('format', 'text') == 'json':
+        file_formatter = JsonLinesFormatter()
+    else:
+        file_formatter = logging.Formatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+            datefmt='%Y-%m-%d %H:%M:%S'
+        )
+    file_handler.setFormatter(file_formatter)
+    
+    # Handler para consola con colores
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_formatter = ColoredFormatter(
+        '%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%H:%M:%S'
+    )
+    console_handler.setFormatter(console_formatter)
+    
+    # Cola con límite: si el disco no da abasto se pierden DEBUG/INFO en vez
+    # de acumular memoria; los WARNING+ y la auditoría esperan
+    log_queue = Queue(maxsize=log_config.get('queue_size', 10000))
+    queue_handler = BoundedQueueHandler(log_queue)
+    queue_handler.setLevel(level)
+    rate_limit = log_config.get('rate_limit', {})
+    queue_handler.addFilter(RateLimitFilter(rate_limit.get('window', 60), rate_limit.get('burst', 5)))
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+    
+    _log_handler = queue_handler
+    _log_listener = BlockingQueueListener(log_queue, file_handler, console_handler)
+    _log_listener.start()
+    
+    return logger
+
+
+def stop_logging():
+    """Escribir los registros pendientes y detener el hilo de logging
+    
+    El handler se quita del logger: nadie más vacía su cola, y con la cola
+    llena los WARNING quedarían esperando para siempre.
+    """
+    global _log_listener, _log_handler
+    if _log_handler is not None:
+        logging.getLogger('TecMedHub').removeHandler(_log_handler)
+        _log_handler = None
+    if _log_listener is not None:
+        _log_listener.stop()
+        for handler in _log_listener.handlers:
+            handler.close()
+        _log_listener = None
@@ -0,0 +1,147 @@
+"""
+TecMedHub - Índice de metadatos de G-code
+"""
+
+import time
+import logging
+from typing import Dict, List, Optional
+from urllib.parse import quote
+import threading
+from queue import Queue
+
+from .state import JsonStateBackend
+from .http_client import RobustHTTPClient
+from .moonraker import MoonrakerInterface
+
+
+class MetadataIndex:
+    """Metadatos del slicer por archivo, indexados por (ruta, mtime)
+    
+    schedule() se llama con la lista de archivos que ya se consulta en cada
+    actualización y solo encola los nuevos o modificados; unos pocos hilos
+    (workers) los consultan a Moonraker en segundo plano. El índice se
+    guarda con escritura diferida en un JSON atómico, así que tras reiniciar
+    no se vuelve a consultar nada.
+    """
+    
+    FIELDS = (
+        'estimated_time', 'filament_total', 'filament_weight_total', 'filament_type',
+        'layer_height', 'first_layer_height', 'object_height', 'slicer'
+    )
+    
+    def __init__(self, config: Dict, logger: logging.Logger):
+        index_config = config.get('metadata_index', {})
+        self.config = config
+        self.logger = logger
+        self.backend = JsonStateBackend(index_config.get('index_file', 'file_metadata.json'))
+        self.workers = max(1, int(index_config.get('workers', 2)))
+        self.flush_interval = index_config.get('flush_interval', 60)
+        self.lock = threading.Lock()
+        self.queue = Queue()
+        self.queued = set()
+        self.threads = []
+        self.dirty = False
+        self.last_flush = time.monotonic()
+        
+        try:
+            self.entries = self.backend.read() or {}
+        except Exception as e:
+            self.logger.warning(f"Índice de metadatos ilegible, se reconstruye: {e}")
+            self.entries = {}
+            try:
+                self.backend.quarantine()
+            except OSError:
+                pass
+    
+    def start(self, http_client: RobustHTTPClient):
+        """Iniciar los hilos de indexado (cada uno con su cliente sobre la sesión dada)"""
+        for i in range(self.workers):
+            moonraker = MoonrakerInterface(self.config, self.logger, http_client.fork())
+            thread = threading.Thread(target=self._run, args=(moonraker,), name=f'metadata-{i}', daemon=True)
+            thread.start()
+            self.threads.append(thread)
+    
+    def stop(self):
+        """Detener los hilos y guardar el índice"""
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join(timeout=5)
+        self.threads = []
+        self.flush()
+    
+    def schedule(self, files: List[Dict]):
+        """Encolar archivos nuevos o modificados y olvidar los borrados"""
+        if not files:
+            return  # Moonraker no respondió: no vaciar el índice
+        present = set()
+        with self.lock:
+            for f in files:
+                path = f.get('path') or f.get('filename')
+                if not path:
+                    continue
+                present.add(path)
+                entry = self.entries.get(path)
+                if entry is not None and entry.get('modified') == f.get('modified'):
+                    continue
+                if path not in self.queued:
+                    self.queued.add(path)
+                    self.queue.put((path, f.get('modified')))
+            
+            removed = [path for path in self.entries if path not in present]
+            for path in removed:
+                del self.entries[path]
+            if removed:
+                self.dirty = True
+    
+    def _run(self, moonraker: 'MoonrakerInterface'):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                return
+            path, modified = item
+            try:
+                result = moonraker.query(f"server/files/metadata?filename={quote(path)}", max_attempts=1)
+            except Exception:
+                result = None
+            
+            with self.lock:
+                self.queued.discard(path)
+                if result is not None:
+                    self.entries[path] = {'modified': modified, 'metadata': self._compact(result)}
+                    self.dirty = True
+    
+    def _compact(self, metadata: Dict) -> Dict:
+        """Quedarse con los campos útiles y la miniatura más grande"""
+        compact = {key: metadata[key] for key in self.FIELDS if metadata.get(key) is not None}
+        thumbnails = [t for t in metadata.get('thumbnails') or [] if t.get('relative_path')]
+        if thumbnails:
+            largest = max(thumbnails, key=lambda t: t.get('width', 0) * t.get('height', 0))
+            compact['thumbnail'] = largest['relative_path']
+        return compact
+    
+    def get(self, path: str) -> Optional[Dict]:
+        """Metadatos indexados de un archivo (None si todavía no están)"""
+        entry = self.entries.get(path)
+        return entry['metadata'] if entry else None
+    
+    def maybe_flush(self) -> bool:
+        """Escribir si hay cambios y pasó el intervalo"""
+        if self.dirty and time.monotonic() - self.last_flush >= self.flush_interval:
+            return self.flush()
+        return False
+    
+    def flush(self) -> bool:
+        """Guardar el índice inmediatamente"""
+        with self.lock:
+            snapshot = dict(self.entries)
+            self.dirty = False
+        try:
+            self.backend.write(snapshot)
+            return True
+        except Exception as e:
+            self.dirty = True  # Sigue pendiente: se reintenta en el próximo maybe_flush
+            self.logger.debug(f"Error guardando índice de metadatos: {e}")
+            return False
+        finally:
+            self.last_flush = time.monotonic()
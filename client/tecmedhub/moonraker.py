@@ -0,0 +1,318 @@
+"""
+TecMedHub - Interface con la API de Moonraker
+"""
+
+import time
+import logging
+import re
+from typing import Dict, List, Optional, Any
+from urllib.parse import quote
+
+from .http_client import RobustHTTPClient
+
+
+class MoonrakerInterface:
+    """Interface completa con Moonraker API"""
+    
+    # Atributos que consumen collect_printer_data() y el detector de anomalías
+    STATUS_FIELDS = {
+        'print_stats': ('state', 'filename', 'print_duration', 'total_duration', 'filament_used'),
+        'extruder': ('temperature', 'target'),
+        'heater_bed': ('temperature', 'target'),
+        'gcode_move': ('speed_factor',),
+        'fan': ('speed',),
+        'display_status': ('progress',),
+        'virtual_sdcard': ('progress',),
+        'system_stats': ('cpu_usage', 'memavail', 'cputemp'),
+        'webhooks': ('state',)
+    }
+    SENSOR_FIELDS = ('filament_detected', 'enabled')
+    METADATA_CACHE_SIZE = 32
+    
+    # Tabla de canales: patrón de objeto -> (tipo, atributos)
+    # Un objeto puede ser de varios tipos (temperature_fan es sensor y ventilador)
+    CHANNEL_PATTERNS = (
+        (re.compile(r'(extruder\d*|heater_bed|heater_generic .+)$'), 'heater', ('temperature', 'target', 'power')),
+        (re.compile(r'temperature_(sensor|fan) .+$'), 'sensor', ('temperature',)),
+        (re.compile(r'(fan|(fan_generic|heater_fan|controller_fan|temperature_fan) .+)$'), 'fan', ('speed',))
+    )
+    
+    def __init__(self, config: Dict, logger: logging.Logger, http_client: RobustHTTPClient):
+        self.config = config
+        self.logger = logger
+        self.http = http_client
+        self.base_url = config['moonraker_url']
+        self.connected = False
+        self.last_error = None
+        self.objects = None  # Objetos de Klipper descubiertos (None = sin descubrir)
+        self.klippy_state = None
+        self.metadata_cache = {}
+        self._build_status_query()
+    
+    def apply_config(self, config: Dict):
+        """Aplicar configuración recargada"""
+        self.config = config
+        self.base_url = config['moonraker_url']
+        self._build_status_query()
+    
+    def check_connection(self) -> bool:
+        """Verificar conexión con Moonraker"""
+        try:
+            response = self.http.get(
+                f"{self.base_url}/server/info",
+                timeout=self.config['timeouts']['moonraker']
+            )
+            
+            if response and response.status_code == 200:
+                self.connected = True
+                self.last_error = None
+                return True
+            
+            self.connected = False
+            return False
+            
+        except Exception as e:
+            self.connected = False
+            self.last_error = str(e)
+            return False
+    
+    def query(self, endpoint: str, **kwargs) -> Optional[Dict]:
+        """Realizar consulta a Moonraker"""
+        try:
+            url = f"{self.base_url}/{endpoint}"
+            response = self.http.get(
+                url,
+                timeout=self.config['timeouts']['moonraker'],
+                **kwargs
+            )
+            
+            if response and response.status_code == 200:
+                return response.json().get('result', {})
+            
+            return None
+            
+        except Exception as e:
+            self.logger.error(f"Error consultando {endpoint}: {e}")
+            return None
+    
+    def command(self, endpoint: str, **kwargs) -> bool:
+        """Enviar comando a Moonraker"""
+        try:
+            url = f"{self.base_url}/{endpoint}"
+            response = self.http.post(
+                url,
+                timeout=self.config['timeouts']['moonraker'],
+                **kwargs
+            )
+            
+            if response is not None and response.status_code == 200:
+                self.last_error = None
+                return True
+            
+            self.last_error = self.http.last_error
+            return False
+            
+        except Exception as e:
+            self.logger.error(f"Error ejecutando comando {endpoint}: {e}")
+            self.last_error = str(e)
+            return False
+    
+    def _build_status_query(self):
+        """Calcular una sola vez la consulta de estado con solo los atributos usados"""
+        fields = dict(self.STATUS_FIELDS)
+        
+        # Sensores de filamento opcionales (p.ej. "filament_switch_sensor runout")
+        for sensor in self.config.get('anomaly_detection', {}).get('filament_sensors', []):
+            fields[sensor] = self.SENSOR_FIELDS
+        
+        if self.objects is not None:
+            available = set(self.objects)
+            fields = {obj: attrs for obj, attrs in fields.items() if obj in available}
+        
+        # Calentadores, sensores y ventiladores (sin descubrir: los de siempre)
+        channels = []
+        for obj in (self.objects if self.objects is not None else list(fields)):
+            for pattern, kind, attrs in self.CHANNEL_PATTERNS:
+                if pattern.match(obj):
+                    channels.append((kind, obj.split(' ', 1)[-1], obj))
+                    fields[obj] = tuple(dict.fromkeys(fields.get(obj, ()) + attrs))
+        
+        self.channel_table = channels
+        self.status_fields = fields
+        self.status_query = 'printer/objects/query?' + '&'.join(
+            f"{quote(obj)}={','.join(attrs)}" for obj, attrs in fields.items()
+        )
+    
+    def discover_objects(self, **kwargs) -> bool:
+        """Descubrir los objetos de Klipper (extrusores, calentadores, ventiladores)"""
+        result = self.query('printer/objects/list', **kwargs)
+        if not result or not isinstance(result.get('objects'), list):
+            return False
+        
+        self.objects = result['objects']
+        self._build_status_query()
+        self.logger.debug(
+            f"Objetos de Klipper: {len(self.objects)}, consultados: {len(self.status_fields)}, "
+            f"canales: {len(self.channel_table)}"
+        )
+        return True
+    
+    def get_full_status(self) -> Dict:
+        """Obtener los atributos de estado que usa el cliente"""
+        if self.objects is None:
+            self.discover_objects(max_attempts=1)
+        
+        result = self.query(self.status_query)
+        
+        if not result:
+            self.klippy_state = 'unavailable'
+            return {}
+        
+        status = result.get('status', {})
+        
+        # Klippy reiniciado: la configuración (y sus objetos) pudo cambiar
+        state = status.get('webhooks', {}).get('state')
+        if state == 'ready' and self.klippy_state not in (None, 'ready'):
+            self.logger.info("🔄 Klippy reiniciado, redescubriendo objetos")
+            self.discover_objects(max_attempts=1)
+        self.klippy_state = state
+        
+        return status
+    
+    def collect_channels(self, status: Dict) -> Dict[str, List[Dict]]:
+        """Valores de la tabla de canales agrupados por tipo"""
+        channels = {'heaters': [], 'temperature_sensors': [], 'fans': []}
+        for kind, name, obj in self.channel_table:
+            values = status.get(obj)
+            if not values:
+                continue
+            if kind == 'heater':
+                channels['heaters'].append({
+                    'name': name,
+                    'temp': round(values.get('temperature', 0), 1),
+                    'target': round(values.get('target', 0), 1),
+                    'power': round(values.get('power', 0) * 100)
+                })
+            elif kind == 'sensor':
+                channels['temperature_sensors'].append({
+                    'name': name,
+                    'temp': round(values.get('temperature', 0), 1)
+                })
+            else:
+                channels['fans'].append({'name': name, 'speed': int(values.get('speed', 0) * 100)})
+        return channels
+    
+    def get_printer_info(self) -> Dict:
+        """Información del sistema"""
+        return self.query('printer/info') or {}
+    
+    def get_system_info(self) -> Dict:
+        """Información del sistema operativo"""
+        return self.query('machine/system_info') or {}
+    
+    def get_files(self, path: str = 'gcodes') -> List[Dict]:
+        """Listar archivos"""
+        result = self.query(f"server/files/list?root={path}")
+        if isinstance(result, list):
+            # Moonraker devuelve la lista directamente
+            return result
+        if result:
+            return result.get(path, [])
+        return []
+    
+    def get_file_metadata(self, filename: str) -> Optional[Dict]:
+        """Metadatos del slicer (estimated_time, filament_total, ...), en caché por archivo"""
+        if filename in self.metadata_cache:
+            return self.metadata_cache[filename]
+        
+        metadata = self.query(f"server/files/metadata?filename={quote(filename)}")
+        if metadata:
+            if len(self.metadata_cache) >= self.METADATA_CACHE_SIZE:
+                self.metadata_cache.pop(next(iter(self.metadata_cache)))
+            self.metadata_cache[filename] = metadata
+        return metadata
+    
+    def get_job_history(self, limit: int = 10) -> List[Dict]:
+        """Historial de trabajos"""
+        result = self.query(f"server/history/list?limit={limit}")
+        if result:
+            return result.get('jobs', [])
+        return []
+    
+    def execute_gcode(self, gcode: str) -> bool:
+        """Ejecutar G-code (un solo intento: reintentar repetiría líneas ya ejecutadas)"""
+        return self.command(
+            'printer/gcode/script',
+            json={'script': gcode},
+            max_attempts=1
+        )
+    
+    def execute_gcode_lines(self, lines: List[str]) -> bool:
+        """Ejecutar varias líneas G-code en una sola llamada"""
+        return self.execute_gcode('\n'.join(lines))
+    
+    def execute_macro(self, macro_name: str, **params) -> bool:
+        """Ejecutar macro de Klipper"""
+        return self.execute_gcode(self.format_macro(macro_name, **params))
+    
+    @staticmethod
+    def format_macro(macro_name: str, **params) -> str:
+        """Construir la línea G-code de una macro con sus parámetros"""
+        if params:
+            param_str = ' '.join([f'{k}={v}' for k, v in params.items()])
+            return f"{macro_name} {param_str}"
+        return f"{macro_name}"
+    
+    def gcode_batch(self, max_lines: int = 50, flush_deadline: float = 0.5) -> 'GcodeBatch':
+        """Crear un lote de G-codes que se envía como un único script"""
+        return GcodeBatch(self, max_lines=max_lines, flush_deadline=flush_deadline)
+
+
+class GcodeBatch:
+    """Agrupa líneas G-code de uno o más comandos en un solo printer/gcode/script
+    
+    Klipper ejecuta el script línea a línea y se detiene en la primera que
+    falla, pero su mensaje de error no identifica de forma fiable la línea:
+    si el script falla, todos los comandos del lote se reportan como fallidos.
+    """
+    
+    def __init__(self, moonraker: MoonrakerInterface, max_lines: int = 50, flush_deadline: float = 0.5):
+        self.moonraker = moonraker
+        self.max_lines = max_lines
+        self.flush_deadline = flush_deadline
+        self.pending = []  # [{'source': ..., 'lines': [...]}]
+        self.opened_at = None
+        self.last_error = None
+    
+    def line_count(self) -> int:
+        """Cantidad de líneas pendientes de envío"""
+        return sum(len(entry['lines']) for entry in self.pending)
+    
+    def is_due(self) -> bool:
+        """El lote superó su plazo máximo de espera"""
+        return bool(self.pending) and time.monotonic() - self.opened_at >= self.flush_deadline
+    
+    def accepts(self, lines: List[str]) -> bool:
+        """Determinar si las líneas caben en el lote actual"""
+        if not self.pending:
+            return True
+        if self.is_due():
+            return False
+        return self.line_count() + len(lines) <= self.max_lines
+    
+    def add(self, lines: List[str], source: Any = None):
+        """Agregar las líneas de un comando al lote"""
+        if not self.pending:
+            self.opened_at = time.monotonic()
+        self.pending.append({'source': source, 'lines': list(lines)})
+    
+    def flush(self) -> Dict[Any, bool]:
+        """Enviar el lote y devolver el resultado por origen"""
+        if not self.pending:
+            return {}
+        
+        entries, self.pending = self.pending, []
+        script_lines = [line for entry in entries for line in entry['lines']]
+        ok = self.moonraker.execute_gcode_lines(script_lines)
+        self.last_error = None if ok else self.moonraker.last_error
+        return {entry['source']: ok for entry in entries}
@@ -0,0 +1,254 @@
+"""
+TecMedHub - Caché compartida entre impresoras de la misma red
+"""
+
+import time
+import json
+import os
+import logging
+import struct
+import random
+from typing import Dict, List
+import threading
+
+from .files import FileManager, TokenBucket
+
+
+class PeerCache:
+    """Caché de G-code compartida entre las impresoras de la misma red local
+    
+    Cada cliente sirve por HTTP (/peer/gcode/<md5>) los archivos de su caché
+    cuyo MD5 conoce y anuncia esos MD5 por multicast UDP (y los publica en
+    /peer/hashes para los pares configurados a mano). Antes de pedirle un
+    archivo al servidor, download_file() prueba los pares que anunciaron ese
+    MD5; lo recibido siempre se verifica, y si nadie lo tiene (o falla) se
+    descarga del servidor como siempre. Así el enlace de subida carga
+    aproximadamente una copia por archivo y por laboratorio.
+    """
+    
+    STATIC_REFRESH = 1.0  # Segundos mínimos entre consultas a los pares fijos por un fallo
+    
+    def __init__(self, config: Dict, logger: logging.Logger, file_manager: FileManager):
+        peer_config = config.get('peer_cache', {})
+        self.logger = logger
+        self.file_manager = file_manager
+        self.node_id = os.urandom(6).hex()  # Para ignorar los anuncios propios
+        self.http = file_manager.http.fork()
+        self.lock = threading.Lock()
+        self.directory = {}  # url del par -> {'hashes': set, 'expires': monotonic}
+        self.uploads = threading.BoundedSemaphore(max(1, peer_config.get('max_uploads', 2)))
+        self.stop_event = threading.Event()
+        self.announce_event = threading.Event()
+        self.threads = []
+        self.httpd = None
+        self.sock = None
+        self.last_static_poll = 0
+        self.stats = {'hits': 0, 'misses': 0, 'served': 0, 'served_bytes': 0}
+        self.apply_config(config)
+    
+    def apply_config(self, config: Dict):
+        """Aplicar configuración (puerto, dirección y multicast se aplican al reiniciar)"""
+        peer_config = config.get('peer_cache', {})
+        self.config = config
+        self.port = peer_config.get('port', 7130)
+        self.bind = peer_config.get('bind', '0.0.0.0')
+        self.static_peers = [url.rstrip('/') for url in peer_config.get('peers', [])]
+        self.discovery = peer_config.get('discovery', True)
+        self.group = peer_config.get('multicast_group', '239.255.71.30')
+        self.discovery_port = peer_config.get('discovery_port', 7131)
+        self.announce_interval = max(peer_config.get('announce_interval', 60), 5)
+        self.timeout = peer_config.get('timeout', 5)
+        self.http.apply_config(config)
+    
+    def start(self):
+        """Levantar el endpoint HTTP, el receptor de anuncios y el hilo que anuncia"""
+        try:
+            self._start_server()
+        except OSError as e:
+            self.logger.error(f"❌ Caché entre pares: no se pudo abrir el puerto {self.port}: {e}")
+            return
+        
+        if self.discovery:
+            try:
+                self._open_discovery_socket()
+                self._spawn(self._listen, 'peer-listen')
+            except OSError as e:
+                self.logger.warning(f"Caché entre pares sin multicast ({e}); solo pares configurados")
+                self.sock = None
+        
+        self._spawn(self._announce_loop, 'peer-announce')
+        self.logger.info(f"🤝 Caché entre pares en el puerto {self.port}")
+    
+    def stop(self):
+        """Detener servidor e hilos"""
+        self.stop_event.set()
+        self.announce_event.set()
+        if self.httpd is not None:
+            self.httpd.shutdown()
+            self.httpd.server_close()
+        if self.sock is not None:
+            self.sock.close()
+        for thread in self.threads:
+            thread.join(timeout=5)
+        self.threads = []
+    
+    def _spawn(self, target, name: str):
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        self.threads.append(thread)
+    
+    def lookup(self, md5: str) -> List[str]:
+        """Pares que anunciaron ese MD5 (en orden aleatorio para repartir la carga)"""
+        md5 = md5.lower()
+        urls = self._holders(md5)
+        # Los pares fijos se consultan al momento si no se sabe de nadie que lo tenga
+        if not urls and self.static_peers and time.monotonic() - self.last_static_poll >= self.STATIC_REFRESH:
+            self._poll_static_peers()
+            urls = self._holders(md5)
+        random.shuffle(urls)
+        return urls
+    
+    def _holders(self, md5: str) -> List[str]:
+        now = time.monotonic()
+        with self.lock:
+            return [url for url, peer in self.directory.items() if md5 in peer['hashes'] and peer['expires'] > now]
+    
+    def announce_soon(self):
+        """Anunciar ya (p.ej. después de descargar un archivo nuevo)"""
+        self.announce_event.set()
+    
+    def _remember(self, url: str, hashes):
+        with self.lock:
+            self.directory[url] = {
+                'hashes': set(hashes),
+                'expires': time.monotonic() + 3 * self.announce_interval
+            }
+    
+    def _announce_loop(self):
+        while not self.stop_event.is_set():
+            try:
+                self.announce()
+                self._poll_static_peers()
+                now = time.monotonic()
+                with self.lock:
+                    for url in [url for url, peer in self.directory.items() if peer['expires'] <= now]:
+                        del self.directory[url]
+            except Exception as e:
+                self.logger.debug(f"Error anunciando a los pares: {e}")
+            self.announce_event.wait(self.announce_interval)
+            self.announce_event.clear()
+    
+    def _payload(self) -> Dict:
+        return {'id': self.node_id, 'port': self.port, 'hashes': sorted(self.file_manager.cache.hashes())}
+    
+    def announce(self):
+        """Enviar por multicast los MD5 que tenemos"""
+        if self.sock is None:
+            return
+        payload = self._payload()
+        data = json.dumps(payload, separators=(',', ':')).encode()
+        if len(data) > 60000:
+            # Un datagrama UDP no da para más: el resto se consulta en /peer/hashes
+            payload['hashes'] = payload['hashes'][:1500]
+            data = json.dumps(payload, separators=(',', ':')).encode()
+        self.sock.sendto(data, (self.group, self.discovery_port))
+    
+    def _poll_static_peers(self):
+        """Consultar /peer/hashes de los pares configurados a mano"""
+        self.last_static_poll = time.monotonic()
+        for url in self.static_peers:
+            response = self.http.get(f"{url}/peer/hashes", timeout=self.timeout, max_attempts=1)
+            if response is None:
+                continue
+            try:
+                payload = response.json()
+            except ValueError:
+                continue
+            if payload.get('id') != self.node_id:
+                self._remember(url, payload.get('hashes', []))
+    
+    def _open_discovery_socket(self):
+        import socket
+        
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, 'SO_REUSEPORT'):
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        sock.bind(('', self.discovery_port))
+        membership = struct.pack('4s4s', socket.inet_aton(self.group), socket.inet_aton('0.0.0.0'))
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)   # Solo la red local
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)  # Otras instancias en el mismo equipo
+        sock.settimeout(1.0)
+        self.sock = sock
+    
+    def _listen(self):
+        while not self.stop_event.is_set():
+            try:
+                data, (address, _) = self.sock.recvfrom(65535)
+                payload = json.loads(data)
+            except (OSError, ValueError):
+                continue
+            if not isinstance(payload, dict) or payload.get('id') == self.node_id:
+                continue
+            port = payload.get('port')
+            if isinstance(port, int) and isinstance(payload.get('hashes'), list):
+                self._remember(f"http://{address}:{port}", payload['hashes'])
+    
+    def _start_server(self):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        
+        peers = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                peers.logger.debug(f"Par {self.client_address[0]}: {format % args}")
+            
+            def do_GET(self):
+                if self.path == '/peer/hashes':
+                    body = json.dumps(peers._payload()).encode()
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'application/json')
+                    self.send_header('Content-Length', str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                elif self.path.startswith('/peer/gcode/'):
+                    peers._serve_file(self, self.path.rsplit('/', 1)[-1].lower())
+                else:
+                    self.send_error(404)
+        
+        self.httpd = ThreadingHTTPServer((self.bind, self.port), Handler)
+        self.httpd.daemon_threads = True
+        self._spawn(self.httpd.serve_forever, 'peer-server')
+    
+    def _serve_file(self, handler, md5: str):
+        """Entregar un archivo por su MD5, con el mismo límite de velocidad que las descargas"""
+        name = self.file_manager.cache.hashes().get(md5)
+        if name is None:
+            handler.send_error(404)
+            return
+        if not self.uploads.acquire(blocking=False):
+            handler.send_error(503, 'Demasiadas transferencias')
+            return
+        try:
+            path = self.file_manager.gcode_dir / name
+            with open(path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                handler.send_response(200)
+                handler.send_header('Content-Type', 'application/octet-stream')
+                handler.send_header('Content-Length', str(size))
+                handler.end_headers()
+                bucket = TokenBucket(burst=self.file_manager.throttle_config.get('burst_kb', 256) * 1024)
+                for chunk in iter(lambda: f.read(65536), b''):
+                    bucket.rate = self.file_manager._download_rate({'max_rate': 0})
+                    bucket.consume(len(chunk))
+                    handler.wfile.write(chunk)
+            self.stats['served'] += 1
+            self.stats['served_bytes'] += size
+            self.file_manager.cache.touch(name)
+        except FileNotFoundError:
+            handler.send_error(404)
+        except OSError as e:
+            self.logger.debug(f"Transferencia a par cortada: {e}")
+        finally:
+            self.uploads.release()
@@ -0,0 +1,171 @@
+"""
+TecMedHub - Diagnóstico (profiling) bajo demanda
+"""
+
+import time
+import sys
+import os
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+import traceback
+import threading
+
+from .config import VERSION
+
+
+class Profiler:
+    """Profiling acotado en el tiempo sin detener el cliente
+    
+    Un hilo toma muestras de la pila de todos los hilos con
+    sys._current_frames() (no hace falta instrumentar el loop principal) y
+    compara dos snapshots de tracemalloc, al inicio y al final. Deja un
+    resumen legible y las pilas en formato "folded" (para flamegraph.pl o
+    speedscope) en output_dir y, si se configura, las sube al servidor.
+    """
+    
+    def __init__(self, config: Dict, logger: logging.Logger, uploader=None):
+        self.logger = logger
+        self.uploader = uploader  # report -> bool
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.apply_config(config)
+    
+    def apply_config(self, config: Dict):
+        """Aplicar configuración"""
+        self.profiling_config = config.get('profiling', {})
+    
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+    
+    def start(self, duration: Optional[float] = None, reason: str = '') -> bool:
+        """Iniciar una sesión en segundo plano (False si ya hay una)"""
+        if self.running:
+            self.logger.warning("🔬 Ya hay un profiling en curso")
+            return False
+        
+        max_duration = self.profiling_config.get('max_duration', 600)
+        duration = min(duration or self.profiling_config.get('default_duration', 30), max_duration)
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._run, args=(duration, reason), name='profiler', daemon=True)
+        self.thread.start()
+        self.logger.info(f"🔬 Profiling iniciado ({duration:.0f}s, {reason or 'manual'})")
+        return True
+    
+    def stop(self):
+        """Cortar la sesión en curso (igual se escribe el reporte)"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=10)
+    
+    def _run(self, duration: float, reason: str):
+        import tracemalloc
+        
+        interval = self.profiling_config.get('sample_interval', 0.01)
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        
+        stacks = {}
+        samples = 0
+        started = time.monotonic()
+        deadline = started + duration
+        while not self.stop_event.is_set() and time.monotonic() < deadline:
+            self._sample(stacks)
+            samples += 1
+            self.stop_event.wait(interval)
+        elapsed = time.monotonic() - started
+        
+        after = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        if started_tracing:
+            tracemalloc.stop()
+        
+        try:
+            report = self._report(stacks, samples, elapsed, before, after, current, peak, reason)
+            self._write(report)
+            if self.profiling_config.get('upload') and self.uploader is not None:
+                self.uploader(report)
+        except Exception as e:
+            self.logger.error(f"🔬 Error generando reporte de profiling: {e}")
+            self.logger.debug(traceback.format_exc())
+    
+    @staticmethod
+    def _sample(stacks: Dict):
+        """Una muestra de la pila de cada hilo (menos este)"""
+        me = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            stack.append(names.get(ident, str(ident)))
+            key = ';'.join(reversed(stack))
+            stacks[key] = stacks.get(key, 0) + 1
+    
+    def _report(self, stacks: Dict, samples: int, elapsed: float, before, after,
+                current: int, peak: int, reason: str) -> Dict:
+        """Armar el reporte: funciones más vistas y diferencia de memoria"""
+        import tracemalloc
+        
+        own = {}    # Función en la cima de la pila
+        total = {}  # Función en cualquier nivel de la pila
+        for key, count in stacks.items():
+            frames = key.split(';')
+            thread, functions = frames[0], frames[1:]
+            if functions:
+                leaf = f"[{thread}] {functions[-1]}"
+                own[leaf] = own.get(leaf, 0) + count
+            for function in set(functions):
+                name = f"[{thread}] {function}"
+                total[name] = total.get(name, 0) + count
+        
+        client_filter = [tracemalloc.Filter(True, os.path.join(os.path.dirname(__file__), '*'))]  # Todo el paquete
+        memory_diff = after.compare_to(before, 'lineno')
+        client_diff = after.filter_traces(client_filter).compare_to(before.filter_traces(client_filter), 'lineno')
+        
+        lines = [
+            f"Profiling TecMedHub {VERSION} - {datetime.now().isoformat(timespec='seconds')}",
+            f"Motivo: {reason or 'manual'}  Duración: {elapsed:.1f}s  Muestras: {samples}",
+            f"Memoria trazada: actual {current / 1024:.0f} KB, pico {peak / 1024:.0f} KB",
+            "",
+            "== Dónde está cada hilo (cima de la pila) =="
+        ]
+        lines += [f"{count / max(samples, 1) * 100:6.1f}%  {name}"
+                  for name, count in sorted(own.items(), key=lambda item: -item[1])[:30]]
+        lines += ["", "== Funciones en la pila de cada hilo (acumulado) =="]
+        lines += [f"{count / max(samples, 1) * 100:6.1f}%  {name}"
+                  for name, count in sorted(total.items(), key=lambda item: -item[1])[:30]]
+        lines += ["", "== Crecimiento de memoria del cliente =="]
+        lines += [str(stat) for stat in client_diff[:25]]
+        lines += ["", "== Crecimiento de memoria (todo el proceso) =="]
+        lines += [str(stat) for stat in memory_diff[:25]]
+        
+        return {
+            'created': datetime.now().strftime('%Y%m%d-%H%M%S'),
+            'summary': '\n'.join(lines) + '\n',
+            'stacks': ''.join(f"{key} {count}\n" for key, count in sorted(stacks.items()))
+        }
+    
+    def _write(self, report: Dict):
+        """Guardar el reporte y borrar los más viejos"""
+        output_dir = Path(self.profiling_config.get('output_dir', 'profiles'))
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        summary_path = output_dir / f"profile-{report['created']}.txt"
+        summary_path.write_text(report['summary'], encoding='utf-8')
+        (output_dir / f"profile-{report['created']}.folded").write_text(report['stacks'], encoding='utf-8')
+        self.logger.info(f"🔬 Profiling terminado: {summary_path}")
+        
+        max_reports = self.profiling_config.get('max_reports', 10)
+        summaries = sorted(output_dir.glob('profile-*.txt'))
+        for old in summaries[:-max_reports] if max_reports > 0 else []:
+            old.unlink(missing_ok=True)
+            old.with_suffix('.folded').unlink(missing_ok=True)
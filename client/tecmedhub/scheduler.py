@@ -0,0 +1,168 @@
+"""
+TecMedHub - Planificador de tareas
+"""
+
+import time
+import logging
+import heapq
+import itertools
+import random
+from typing import Dict, Optional
+import threading
+
+
+class Scheduler:
+    """Tareas periódicas sobre el reloj monotónico
+    
+    Las tareas están en un heap ordenado por su próxima ejecución y el loop
+    duerme exactamente hasta la primera (o hasta que wake() lo despierte).
+    Las ejecuciones siguen una grilla fija (due + intervalo): lo que tarda
+    una tarea no se acumula como deriva y los saltos del reloj de pared
+    (NTP, RTC sin batería al arrancar) no adelantan ni congelan nada.
+    
+    jitter: fracción del intervalo que se suma al azar a cada ejecución, sin
+    mover la grilla, para que las impresoras de un laboratorio no consulten
+    al servidor en el mismo instante.
+    misfire, si una ejecución se atrasó más de un intervalo completo:
+    - skip: se omiten las perdidas y se sigue en la grilla
+    - catch_up: se ejecutan las perdidas una tras otra
+    - reschedule: la grilla vuelve a empezar desde que terminó
+    """
+    
+    MISFIRE_POLICIES = ('skip', 'catch_up', 'reschedule')
+    
+    def __init__(self, config: Dict, logger: logging.Logger):
+        self.logger = logger
+        self.jobs = {}
+        self.heap = []  # (ejecución, desempate, generación, nombre)
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.apply_config(config)
+    
+    def apply_config(self, config: Dict):
+        """Aplicar configuración recargada (vale desde la próxima ejecución)"""
+        scheduler_config = config.get('scheduler', {})
+        self.jitter = scheduler_config.get('jitter', 0.1)
+        self.misfire = scheduler_config.get('misfire', 'skip')
+        self.late_warning = scheduler_config.get('late_warning', 5)
+        self.overrides = scheduler_config.get('jobs', {})
+    
+    def add(self, name: str, func, interval, delay: float = 0.0):
+        """Registrar una tarea; interval en segundos o función que los devuelve"""
+        job = {
+            'name': name, 'func': func, 'interval': interval, 'due': 0.0, 'generation': 0,
+            'runs': 0, 'skipped': 0, 'late_total': 0.0, 'late_max': 0.0,
+            'duration_total': 0.0, 'duration_max': 0.0
+        }
+        with self.lock:
+            self.jobs[name] = job
+            self._push(job, time.monotonic() + delay)
+        self.wakeup.set()
+    
+    def run_soon(self, name: str):
+        """Adelantar una tarea a ahora (sin jitter); la grilla sigue desde aquí"""
+        with self.lock:
+            job = self.jobs.get(name)
+            if job is None:
+                return
+            self._push(job, time.monotonic(), jitter=False)
+        self.wakeup.set()
+    
+    def wake(self):
+        """Despertar el loop (p.ej. para que note una detención)"""
+        self.wakeup.set()
+    
+    def _option(self, job: Dict, key: str):
+        return self.overrides.get(job['name'], {}).get(key, getattr(self, key))
+    
+    def _interval(self, job: Dict) -> float:
+        interval = job['interval']() if callable(job['interval']) else job['interval']
+        return max(float(interval), 0.01)
+    
+    def _push(self, job: Dict, due: float, jitter: bool = True):
+        """Encolar la próxima ejecución; las anteriores de la tarea quedan invalidadas"""
+        job['due'] = due
+        job['generation'] += 1
+        fire = due
+        fraction = self._option(job, 'jitter') if jitter else 0
+        if fraction:
+            fire += random.uniform(0, fraction * self._interval(job))
+        heapq.heappush(self.heap, (fire, next(self.counter), job['generation'], job['name']))
+    
+    def _reschedule(self, job: Dict, now: float):
+        interval = self._interval(job)
+        due = job['due'] + interval
+        if due <= now:
+            misfire = self._option(job, 'misfire')
+            if misfire == 'reschedule':
+                due = now + interval
+            elif misfire != 'catch_up':
+                missed = int((now - due) // interval) + 1
+                job['skipped'] += missed
+                due += missed * interval
+        self._push(job, due)
+    
+    def run_pending(self, running=lambda: True) -> Optional[float]:
+        """Ejecutar las tareas vencidas; devuelve los segundos hasta la próxima
+        
+        running() se revisa antes de cada tarea: si el equipo no da abasto
+        siempre hay algo vencido y, sin esto, una detención no se notaría.
+        """
+        while running():
+            with self.lock:
+                if not self.heap:
+                    return None
+                fire, _, generation, name = self.heap[0]
+                job = self.jobs[name]
+                if generation != job['generation']:
+                    heapq.heappop(self.heap)
+                    continue
+                now = time.monotonic()
+                if fire > now:
+                    return fire - now
+                heapq.heappop(self.heap)
+            
+            lateness = now - fire
+            job['runs'] += 1
+            job['late_total'] += lateness
+            job['late_max'] = max(job['late_max'], lateness)
+            if lateness > self.late_warning:
+                self.logger.warning(f"⏰ Tarea '{name}' ejecutada {lateness:.1f}s tarde")
+            
+            try:
+                job['func']()
+            finally:
+                finished = time.monotonic()
+                duration = finished - now
+                job['duration_total'] += duration
+                job['duration_max'] = max(job['duration_max'], duration)
+                with self.lock:
+                    if job['generation'] == generation:  # run_soon() durante la tarea ya la reprogramó
+                        self._reschedule(job, finished)
+    
+    def _wait(self, timeout: Optional[float]):
+        self.wakeup.wait(timeout)
+    
+    def run(self, running):
+        """Loop: ejecutar lo vencido y dormir hasta la próxima tarea"""
+        while running():
+            self.wakeup.clear()
+            delay = self.run_pending(running)
+            if running():
+                self._wait(delay)
+    
+    def stats(self) -> Dict[str, Dict]:
+        """Ejecuciones, omitidas, retraso y duración (ms) por tarea"""
+        result = {}
+        for name, job in self.jobs.items():
+            runs = job['runs'] or 1
+            result[name] = {
+                'runs': job['runs'],
+                'skipped': job['skipped'],
+                'late_avg_ms': round(job['late_total'] / runs * 1000, 1),
+                'late_max_ms': round(job['late_max'] * 1000, 1),
+                'duration_avg_ms': round(job['duration_total'] / runs * 1000, 1),
+                'duration_max_ms': round(job['duration_max'] * 1000, 1)
+            }
+        return result
@@ -0,0 +1,201 @@
+"""
+TecMedHub - Estado persistente con escritura diferida
+"""
+
+import time
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import Dict, List, Optional
+import threading
+from collections import deque
+
+
+class JsonStateBackend:
+    """Persistencia en JSON compacto con escritura atómica (temporal + fsync + rename)"""
+    
+    def __init__(self, path: str):
+        self.path = path
+    
+    def read(self) -> Optional[Dict]:
+        """Leer estado guardado"""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    def write(self, data: Dict):
+        """Escribir estado sin dejar nunca un archivo a medio escribir"""
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=f".{os.path.basename(self.path)}.", suffix='.tmp', dir=directory
+        )
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, separators=(',', ':'), ensure_ascii=False)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        
+        # Persistir también la entrada del directorio (el rename)
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+    
+    def quarantine(self):
+        """Apartar un archivo ilegible para no perder la evidencia"""
+        if os.path.exists(self.path):
+            os.replace(self.path, f"{self.path}.corrupt")
+    
+    def close(self):
+        pass
+
+
+class SqliteStateBackend:
+    """Persistencia en SQLite (WAL) como alternativa al archivo JSON"""
+    
+    def __init__(self, path: str):
+        import sqlite3
+        
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS client_state (key TEXT PRIMARY KEY, value TEXT NOT NULL)'
+        )
+        self.conn.commit()
+    
+    def read(self) -> Optional[Dict]:
+        """Leer estado guardado"""
+        row = self.conn.execute(
+            "SELECT value FROM client_state WHERE key = 'state'"
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def write(self, data: Dict):
+        """Escribir estado en una transacción"""
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO client_state (key, value) VALUES ('state', ?)",
+                (json.dumps(data, separators=(',', ':'), ensure_ascii=False),)
+            )
+    
+    def quarantine(self):
+        """Descartar el estado ilegible"""
+        with self.conn:
+            self.conn.execute("DELETE FROM client_state WHERE key = 'state'")
+    
+    def close(self):
+        self.conn.close()
+
+
+class StateManager:
+    """Gestión de estado persistente para sobrevivir a reinicios
+    
+    Escritura diferida: los cambios solo marcan el estado como sucio y se
+    escriben cada flush_interval segundos (o con save() al apagar).
+    """
+    
+    def __init__(self, state_file: str, flush_interval: float = 300, backend: str = 'json'):
+        self.state_file = state_file
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.pending_updates = deque(maxlen=100)  # Buffer de actualizaciones fallidas
+        self.load_error = None
+        self.backend = self._create_backend(backend, state_file)
+        self.state = self.load()
+        self.dirty = False
+        self.last_flush = time.monotonic()
+        self.writes = 0
+    
+    @staticmethod
+    def _create_backend(backend: str, state_file: str):
+        """Crear backend de persistencia"""
+        if backend == 'sqlite':
+            return SqliteStateBackend(os.path.splitext(state_file)[0] + '.db')
+        return JsonStateBackend(state_file)
+    
+    def load(self) -> Dict:
+        """Cargar estado guardado"""
+        try:
+            saved = self.backend.read()
+            if saved is not None:
+                for update in saved.pop('pending_updates', []):
+                    self.pending_updates.append(update)
+                return saved
+        except Exception as e:
+            self.load_error = str(e)
+            try:
+                self.backend.quarantine()
+            except Exception:
+                pass
+        
+        return {
+            'last_update': None,
+            'total_updates': 0,
+            'failed_updates': 0,
+            'uptime_start': datetime.now().isoformat(),
+            'last_commands': [],
+            'statistics': {
+                'commands_executed': 0,
+                'files_downloaded': 0,
+                'errors': 0
+            }
+        }
+    
+    def mark_dirty(self):
+        """Marcar el estado para la próxima escritura diferida"""
+        self.dirty = True
+    
+    def maybe_flush(self) -> bool:
+        """Escribir si hay cambios y pasó el intervalo"""
+        if self.dirty and time.monotonic() - self.last_flush >= self.flush_interval:
+            return self.save()
+        return False
+    
+    def save(self) -> bool:
+        """Guardar estado inmediatamente"""
+        with self.lock:
+            try:
+                snapshot = dict(self.state)
+                snapshot['pending_updates'] = list(self.pending_updates)
+                self.backend.write(snapshot)
+                self.dirty = False
+                self.writes += 1
+                return True
+            except Exception:
+                # No queremos que falle el cliente si no puede guardar estado
+                return False
+            finally:
+                self.last_flush = time.monotonic()
+    
+    def close(self):
+        """Escritura final y cierre del backend"""
+        self.save()
+        self.backend.close()
+    
+    def add_pending_update(self, data: Dict):
+        """Agregar actualización pendiente"""
+        self.pending_updates.append({
+            'timestamp': datetime.now().isoformat(),
+            'data': data
+        })
+        self.mark_dirty()
+    
+    def get_pending_updates(self) -> List[Dict]:
+        """Obtener actualizaciones pendientes"""
+        updates = list(self.pending_updates)
+        self.pending_updates.clear()
+        self.mark_dirty()
+        return updates
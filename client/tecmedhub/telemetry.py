@@ -0,0 +1,200 @@
+"""
+TecMedHub - Telemetría de alta frecuencia
+"""
+
+import time
+import logging
+import math
+from typing import Dict, List, Tuple
+import threading
+from array import array
+
+from .moonraker import MoonrakerInterface
+
+
+def lttb_downsample(times: List[float], values: List[float], threshold: int) -> List[Tuple[float, float]]:
+    """Reducir una serie con Largest-Triangle-Three-Buckets conservando picos"""
+    n = len(values)
+    if threshold >= n or threshold < 3:
+        return list(zip(times, values))
+    
+    sampled = [(times[0], values[0])]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+    
+    for i in range(threshold - 2):
+        # Promedio del bucket siguiente
+        next_start = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, n)
+        span = next_end - next_start
+        avg_t = sum(times[next_start:next_end]) / span
+        avg_v = sum(values[next_start:next_end]) / span
+        
+        # Punto del bucket actual que forma el triángulo más grande
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        ta, va = times[a], values[a]
+        best_area = -1.0
+        best = start
+        for j in range(start, end):
+            area = abs((ta - avg_t) * (values[j] - va) - (ta - times[j]) * (avg_v - va))
+            if area > best_area:
+                best_area = area
+                best = j
+        
+        sampled.append((times[best], values[best]))
+        a = best
+    
+    sampled.append((times[-1], values[-1]))
+    return sampled
+
+
+class TelemetryBuffer:
+    """Buffer circular de tamaño fijo por canal (array('f') + marcas de tiempo compartidas)"""
+    
+    def __init__(self, channels: List[str], capacity: int):
+        self.channels = list(channels)
+        self.capacity = max(capacity, 1)
+        self.times = array('d', [0.0]) * self.capacity
+        self.values = {name: array('f', [0.0]) * self.capacity for name in self.channels}
+        self.head = 0   # Próxima posición a escribir
+        self.count = 0
+        self.lock = threading.Lock()
+    
+    def append(self, timestamp: float, sample: Dict[str, float]):
+        """Agregar una muestra (canales ausentes se guardan como NaN)"""
+        with self.lock:
+            index = self.head
+            self.times[index] = timestamp
+            for name, column in self.values.items():
+                column[index] = sample.get(name, math.nan)
+            self.head = (index + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+    
+    def window(self, since: float) -> Tuple[List[float], Dict[str, List[float]]]:
+        """Muestras posteriores a 'since' en orden cronológico"""
+        with self.lock:
+            start = (self.head - self.count) % self.capacity
+            order = [(start + k) % self.capacity for k in range(self.count)]
+            order = [i for i in order if self.times[i] > since]
+            times = [self.times[i] for i in order]
+            values = {name: [column[i] for i in order] for name, column in self.values.items()}
+        return times, values
+    
+    def memory_bytes(self) -> int:
+        """Memoria fija ocupada por los arrays"""
+        return self.times.itemsize * self.capacity + sum(
+            column.itemsize * self.capacity for column in self.values.values()
+        )
+
+
+class TelemetrySampler:
+    """Muestreo de Moonraker en segundo plano y agregación por intervalo de reporte"""
+    
+    def __init__(self, config: Dict, logger: logging.Logger, moonraker: MoonrakerInterface):
+        self.logger = logger
+        self.moonraker = moonraker
+        self.thread = None
+        self.stop_event = threading.Event()
+        self.last_report = time.monotonic()
+        self.buffer = None
+        self.apply_config(config)
+    
+    def apply_config(self, config: Dict):
+        """Aplicar configuración (el buffer se recrea si cambian los canales o su tamaño)"""
+        telemetry_config = config.get('telemetry', {})
+        channels = telemetry_config.get('channels', [])
+        sample_interval = max(telemetry_config.get('sample_interval', 1.0), 0.05)
+        capacity = int(telemetry_config.get('buffer_seconds', 300) / sample_interval) + 1
+        
+        # Consulta compacta: solo los atributos que se muestrean
+        fields = {}
+        for channel in channels:
+            obj, _, attr = channel.rpartition('.')
+            fields.setdefault(obj, []).append(attr)
+        query = '&'.join(f"{obj}={','.join(attrs)}" for obj, attrs in fields.items())
+        
+        if self.buffer is None or self.buffer.channels != channels or self.buffer.capacity != capacity:
+            self.buffer = TelemetryBuffer(channels, capacity)
+        
+        self.config = config
+        self.telemetry_config = telemetry_config
+        self.sample_interval = sample_interval
+        self.series_points = telemetry_config.get('series_points', 0)
+        self.query = f"printer/objects/query?{query}"
+    
+    def start(self):
+        """Iniciar hilo de muestreo"""
+        if self.thread is not None or not self.buffer.channels:
+            return
+        self.thread = threading.Thread(target=self._run, name='telemetry', daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Detener hilo de muestreo"""
+        self.stop_event.set()
+        if self.thread is not None:
+            self.thread.join(timeout=5)
+            self.thread = None
+    
+    def _run(self):
+        delay = 0
+        while not self.stop_event.wait(delay):
+            started = time.monotonic()
+            if self.sample():
+                delay = max(self.sample_interval - (time.monotonic() - started), 0)
+            else:
+                # Moonraker no responde: no insistir cada segundo
+                delay = self.config['intervals'].get('reconnect_attempt', 10)
+    
+    def sample(self) -> bool:
+        """Tomar una muestra de todos los canales"""
+        result = self.moonraker.query(self.query, max_attempts=1)
+        if not result:
+            return False
+        
+        status = result.get('status', {})
+        sample = {}
+        for channel in self.buffer.channels:
+            obj, _, attr = channel.rpartition('.')
+            value = status.get(obj, {}).get(attr)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                sample[channel] = value
+        
+        self.buffer.append(time.monotonic(), sample)
+        return True
+    
+    def report(self) -> Dict:
+        """Resumen min/max/mean/last por canal desde el último reporte"""
+        now = time.monotonic()
+        times, values = self.buffer.window(self.last_report)
+        window = now - self.last_report
+        self.last_report = now
+        
+        channels = {}
+        series = {}
+        for name, column in values.items():
+            points = [(t, v) for t, v in zip(times, column) if not math.isnan(v)]
+            if not points:
+                continue
+            
+            channel_values = [v for _, v in points]
+            channels[name] = {
+                'min': round(min(channel_values), 2),
+                'max': round(max(channel_values), 2),
+                'mean': round(sum(channel_values) / len(channel_values), 2),
+                'last': round(channel_values[-1], 2)
+            }
+            
+            if self.series_points:
+                reduced = lttb_downsample([t for t, _ in points], channel_values, self.series_points)
+                series[name] = [[round(t - now, 1), round(v, 2)] for t, v in reduced]
+        
+        report = {
+            'window': round(window, 1),
+            'samples': len(times),
+            'channels': channels
+        }
+        if series:
+            report['series'] = series
+        return report
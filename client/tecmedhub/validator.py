@@ -0,0 +1,148 @@
+"""
+TecMedHub - Validación de G-code
+"""
+
+import re
+import fnmatch
+import itertools
+from typing import Dict, List, Optional, Tuple
+
+
+class GcodeValidator:
+    """Whitelist de G-codes y límites de parámetros compilados una sola vez
+    
+    Patrones: glob ("M10*") o expresión regular con prefijo "re:" ("re:M10[4-9]").
+    Límites: {"M104": {"S": [0, 300]}, "SET_HEATER_TEMPERATURE": {"TARGET": [0, 300]}}
+    """
+    
+    CACHE_SIZE = 1024
+    
+    # Igual que gcode.py de Klipper: letras (o '*') y lo que sigue hasta la próxima letra
+    WORD_RE = re.compile(r'([A-Z_]+|\*)([^A-Z_*;\n]*)')
+    # Código de cada línea (saltando el número de línea, N10 G1 ...) y el resto hasta ';'
+    COMMAND_RE = re.compile(
+        r'^[^A-Z_*;\n]*(?:N(?![A-Z_])[^A-Z_*;\n]*)?(?!N(?![A-Z_]))((?:[A-Z_]+|\*)[^A-Z_*;\n]*)([^;\n]*)',
+        re.MULTILINE
+    )
+    
+    def __init__(self, patterns: Optional[List[str]], limits: Optional[Dict] = None):
+        self.matcher = self.compile_patterns(patterns)
+        self.limits = {
+            code.upper(): tuple(
+                (param.upper(), bounds[0], bounds[1])
+                for param, bounds in params.items()
+            )
+            for code, params in (limits or {}).items()
+        }
+        self._allowed_cache = {}
+        self._token_cache = ({}, {})  # Por whitelist: código tal cual aparece -> True o (código, límites, extendido)
+    
+    @staticmethod
+    def compile_patterns(patterns: Optional[List[str]]):
+        """Compilar patrones glob/regex a una sola expresión regular"""
+        if not patterns:
+            return None
+        
+        parts = []
+        for pattern in patterns:
+            if pattern.startswith('re:'):
+                parts.append(f'(?i:{pattern[3:]})')
+            else:
+                parts.append(f'(?:{fnmatch.translate(pattern.upper())})')
+        return re.compile('|'.join(parts))
+    
+    def is_allowed(self, code: str) -> bool:
+        """Verificar un código contra la whitelist (con caché)"""
+        if self.matcher is None:
+            return True
+        
+        allowed = self._allowed_cache.get(code)
+        if allowed is None:
+            if len(self._allowed_cache) >= self.CACHE_SIZE:
+                self._allowed_cache.clear()
+            allowed = self.matcher.fullmatch(code) is not None
+            self._allowed_cache[code] = allowed
+        return allowed
+    
+    def validate(self, lines: List[str], whitelist: bool = True) -> Optional[str]:
+        """Validar un script en una sola pasada; devuelve el error o None
+        
+        El código se separa como lo hace Klipper: letras y lo que sigue hasta
+        la próxima letra ("M104S999" es M104 con S=999, "M109 S 999" es S=999).
+        En G-code tradicional solo ';' es comentario; un '#' no oculta nada.
+        """
+        text = '\n'.join(lines).upper()
+        cache = self._token_cache[whitelist]
+        for index, (token, rest) in enumerate(self.COMMAND_RE.findall(text)):
+            entry = cache.get(token)
+            if entry is None:
+                entry = self._classify(token, whitelist)
+            if entry is True:
+                continue
+            
+            code, bounds, extended = entry
+            if bounds is None:
+                return f"línea {self._line_number(text, index)}: G-code no permitido: {code}"
+            error = self._check_bounds(code, self._parameters(rest, extended), bounds)
+            if error:
+                return f"línea {self._line_number(text, index)}: {error}"
+        
+        return None
+    
+    def _classify(self, token: str, whitelist: bool):
+        """True si el código no requiere más revisión; si no (código, límites, extendido)
+        
+        Límites None = código fuera de la whitelist.
+        """
+        cache = self._token_cache[whitelist]
+        if len(cache) >= self.CACHE_SIZE:
+            cache.clear()
+        
+        letters, number = self.WORD_RE.match(token).groups()
+        code = letters + number.strip()
+        if whitelist and not self.is_allowed(code):
+            entry = (code, None, False)
+        elif code in self.limits:
+            entry = (code, self.limits[code], len(letters) > 1)
+        else:
+            entry = True
+        cache[token] = entry
+        return entry
+    
+    def _line_number(self, text: str, index: int) -> int:
+        """Número de línea del código 'index' (solo al reportar un error)"""
+        match = next(itertools.islice(self.COMMAND_RE.finditer(text), index, None))
+        return text.count('\n', 0, match.start()) + 1
+    
+    def _parameters(self, rest: str, extended: bool) -> Optional[Dict[str, str]]:
+        """Parámetros del resto de la línea (None si no se pueden leer)"""
+        if not extended:
+            # G1 X10 / M104S200: cada letra toma lo que sigue hasta la próxima
+            return {key: value.strip() for key, value in self.WORD_RE.findall(rest)}
+        
+        # Comandos extendidos (SET_HEATER_TEMPERATURE TARGET=200): CLAVE=valor hasta '#' o '*'
+        import shlex
+        
+        try:
+            words = shlex.split(re.split(r'[#*]', rest, 1)[0])
+        except ValueError:
+            return None
+        return dict(word.split('=', 1) for word in words if '=' in word)
+    
+    @staticmethod
+    def _check_bounds(code: str, values: Optional[Dict[str, str]], bounds: Tuple) -> Optional[str]:
+        """Verificar parámetros de un código contra sus límites"""
+        if values is None:
+            return f"{code}: parámetros ilegibles"
+        
+        for param, minimum, maximum in bounds:
+            if param not in values:
+                continue
+            try:
+                value = float(values[param])
+            except ValueError:
+                return f"{code} {param} no numérico: {values[param]!r}"
+            if not minimum <= value <= maximum:
+                return f"{code} {param}={values[param]} fuera de rango [{minimum}, {maximum}]"
+        
+        return None
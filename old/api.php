@@ -47,13 +47,21 @@ function handleGet() {
 
 // Manejar peticiones POST
 function handlePost() {
-    $data = json_decode(file_get_contents('php://input'), true);
+    $body = file_get_contents('php://input');
+    // El agregador de laboratorio envía los lotes comprimidos
+    if (($_SERVER['HTTP_CONTENT_ENCODING'] ?? '') === 'gzip') {
+        $body = gzdecode($body);
+    }
+    $data = json_decode($body, true);
     $action = $data['action'] ?? '';
 
     switch ($action) {
         case 'update_printer':
             updatePrinter($data);
             break;
+        case 'batch':
+            handleBatch($data);
+            break;
         case 'home':
         case 'heat':
         case 'pause':
@@ -134,8 +142,9 @@ function getPrinterByToken() {
 // Obtener comandos pendientes para una impresora
 function getCommands() {
     $token = $_GET['token'] ?? '';
+    $tokens = array_values(array_filter(explode(',', $_GET['tokens'] ?? '')));
 
-    if (empty($token)) {
+    if (empty($token) && empty($tokens)) {
         response(false, 'Token requerido');
         return;
     }
@@ -144,6 +153,21 @@ function getCommands() {
     $pending = [];
     $remaining = [];
 
+    // Varias impresoras a la vez (agregador): comandos agrupados por token.
+    // 'wait' (long-poll) no se implementa: se responde de inmediato.
+    if (!empty($tokens)) {
+        foreach ($commands as $cmd) {
+            if (in_array($cmd['token'], $tokens, true)) {
+                $pending[$cmd['token']][] = $cmd;
+            } else {
+                $remaining[] = $cmd;
+            }
+        }
+        saveJson(COMMANDS_FILE, $remaining);
+        response(true, 'OK', ['commands' => (object)$pending]);
+        return;
+    }
+
     // Separar comandos para esta impresora
     foreach ($commands as $cmd) {
         if ($cmd['token'] === $token) {
@@ -161,7 +185,44 @@ function getCommands() {
 
 // Actualizar datos de impresora
 function updatePrinter($data) {
-    $token = $data['token'] ?? '';
+    if (empty($data['token'] ?? '')) {
+        response(false, 'Token requerido');
+        return;
+    }
+
+    $printers = loadJson(PRINTERS_FILE);
+    $printerId = applyPrinterUpdate($printers, $data);
+    saveJson(PRINTERS_FILE, $printers);
+    response(true, 'Impresora actualizada', ['printer_id' => $printerId]);
+}
+
+// Varias actualizaciones en una sola petición (agregador de laboratorio):
+// se lee y se guarda printers.json una sola vez para todo el lote
+function handleBatch($data) {
+    $items = $data['items'] ?? null;
+    if (!is_array($items)) {
+        response(false, 'Items inválidos');
+        return;
+    }
+
+    $printers = loadJson(PRINTERS_FILE);
+    $results = [];
+    $ignored = 0;
+    foreach ($items as $item) {
+        if (!is_array($item) || ($item['action'] ?? '') !== 'update_printer' || empty($item['token'] ?? '')) {
+            $ignored++;
+            continue;
+        }
+        $results[$item['token']] = ['printer_id' => applyPrinterUpdate($printers, $item)];
+    }
+
+    saveJson(PRINTERS_FILE, $printers);
+    response(true, 'OK', ['results' => (object)$results, 'ignored' => $ignored]);
+}
+
+// Aplicar una actualización a la lista de impresoras (sin guardar); devuelve el id
+function applyPrinterUpdate(&$printers, $data) {
+    $token = $data['token'];
     $name = $data['name'] ?? 'Impresora Sin Nombre';
     $status = $data['status'] ?? 'idle';
     $progress = $data['progress'] ?? 0;
@@ -178,12 +239,6 @@ function updatePrinter($data) {
     $tags = $data['tags'] ?? [];
     $files = $data['files'] ?? []; // NUEVO: Lista de archivos locales
 
-    if (empty($token)) {
-        response(false, 'Token requerido');
-        return;
-    }
-
-    $printers = loadJson(PRINTERS_FILE);
     $found = false;
     $printerId = null;
 
@@ -221,6 +276,7 @@ function updatePrinter($data) {
             break;
         }
     }
+    unset($printer);
 
     // Si no existe, crear nueva
     if (!$found) {
@@ -248,8 +304,7 @@ function updatePrinter($data) {
         ];
     }
 
-    saveJson(PRINTERS_FILE, $printers);
-    response(true, 'Impresora actualizada', ['printer_id' => $printerId]);
+    return $printerId;
 }
 
 // Enviar comando a impresora
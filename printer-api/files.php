@@ -83,7 +83,8 @@ function listFiles() {
                 size_bytes,
                 checksum_md5,
                 uploaded_at,
-                downloaded
+                downloaded,
+                printer_id
             FROM files
             WHERE printer_id = ? OR printer_id IS NULL
             ORDER BY uploaded_at DESC
@@ -105,6 +106,7 @@ function listFiles() {
                 'md5' => $file['checksum_md5'],
                 'uploaded' => date('Y-m-d H:i:s', $file['uploaded_at']),
                 'downloaded' => (bool)$file['downloaded'],
+                'assigned' => $file['printer_id'] !== null, // false = global (para todas)
                 'exists' => $exists
             ];
         }
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Benchmark del agregador de laboratorio del cliente TecMedHub
+Lanza N clientes (procesos) contra un servidor falso, directo o a través de
+klipper_client.py --aggregator, y cuenta las peticiones que llegan al
+servidor por minuto. Con --outage corta el servidor unos segundos y verifica
+que las actualizaciones y los eventos lleguen al volver.
+
+Uso:
+    python3 test/bench_aggregator.py --printers 10 --seconds 30
+    python3 test/bench_aggregator.py --printers 10 --outage 10
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from fake_services import FakeMoonraker, FakeServer
+from klipper_client import DEFAULT_CONFIG
+
+CLIENT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'client', 'klipper_client.py'))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def build_config(server_url, files_url, moonraker, token, workdir):
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    config['server_url'] = server_url
+    config['files_url'] = files_url
+    config['printer_token'] = token
+    config['moonraker_url'] = moonraker.url
+    config['camera']['enabled'] = False
+    config['telemetry']['enabled'] = False
+    config['profiling']['enabled'] = False
+    config['intervals'].update({'status_update': 2, 'command_check': 2})
+    config['timeouts'].update({'moonraker': 1, 'server': 2})
+    config['retries'] = {'max_attempts': 1, 'base_delay': 0.1, 'exponential_backoff': False}
+    config['logging']['level'] = 'WARNING'
+    config['file_management']['gcode_directory'] = os.path.join(workdir, 'gcodes')
+    return config
+
+
+def launch(workdir, config, *args):
+    os.makedirs(workdir, exist_ok=True)
+    with open(os.path.join(workdir, 'printer_config.json'), 'w') as f:
+        json.dump(config, f)
+    return subprocess.Popen([sys.executable, CLIENT, *args], cwd=workdir,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def stop(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def run_scenario(args, aggregated):
+    server = FakeServer().start()
+    server.batch_enabled = not args.legacy_server
+    moonraker = FakeMoonraker().start()
+    processes = []
+    result = {}
+
+    with tempfile.TemporaryDirectory() as root:
+        server_url, files_url = server.api_url, server.files_url
+        if aggregated:
+            port = free_port()
+            config = build_config(server.api_url, server.files_url, moonraker, 'agregador', os.path.join(root, 'agg'))
+            config['aggregator'].update({'port': port, 'bind': '127.0.0.1', 'batch_interval': 2,
+                                         'command_interval': 2, 'long_poll': 0})
+            processes.append(launch(os.path.join(root, 'agg'), config, '--aggregator'))
+            server_url = server.api_url.replace(server.url, f"http://127.0.0.1:{port}")
+            files_url = server.files_url.replace(server.url, f"http://127.0.0.1:{port}")
+            time.sleep(1)
+
+        for i in range(args.printers):
+            workdir = os.path.join(root, f'p{i}')
+            processes.append(launch(workdir, build_config(server_url, files_url, moonraker, f'token-{i}', workdir)))
+
+        try:
+            time.sleep(args.warmup)
+            requests_before, updates_before = server.requests, len(server.updates)
+            time.sleep(args.seconds)
+            result['per_minute'] = (server.requests - requests_before) * 60 / args.seconds
+            result['updates'] = len(server.updates) - updates_before
+
+            if args.outage:
+                server.faults.down = True
+                time.sleep(args.outage)
+                server.faults.down = False
+                down_updates = len(server.updates)
+                time.sleep(args.warmup + 2)
+                result['after_outage'] = len(server.updates) - down_updates
+        finally:
+            stop(processes)
+            server.stop()
+            moonraker.stop()
+
+    result['batches'] = server.batches
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--printers', type=int, default=10)
+    parser.add_argument('--seconds', type=float, default=30, help="Ventana de medición")
+    parser.add_argument('--warmup', type=float, default=8)
+    parser.add_argument('--outage', type=float, default=0, help="Segundos de corte del servidor")
+    parser.add_argument('--legacy-server', action='store_true', help="Servidor sin batch ni tokens=")
+    args = parser.parse_args()
+
+    print(f"{args.printers} impresoras, status_update=2s, command_check=2s")
+    print(f"{'Modo':<12} {'Peticiones/min':>15} {'Actualizaciones':>16} {'Lotes':>6} {'Tras el corte':>14}")
+    for aggregated in (False, True):
+        result = run_scenario(args, aggregated)
+        after = result.get('after_outage', '')
+        print(f"{'agregador' if aggregated else 'directo':<12} {result['per_minute']:>15.0f} "
+              f"{result['updates']:>16} {result['batches']:>6} {after:>14}")
+
+
+if __name__ == "__main__":
+    main()
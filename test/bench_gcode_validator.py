@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Benchmark del validador de G-code del cliente TecMedHub
+Mide cuánto tarda en validar scripts personalizados largos
+"""
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from klipper_client import DEFAULT_CONFIG, GcodeValidator
+
+# Tamaños de script a medir (líneas)
+SCRIPT_SIZES = [10, 100, 1000, 5000]
+REPETITIONS = 200
+
+
+def generate_script(lines):
+    """Generar un script G-code típico de calibración/purga"""
+    script = ["G28", "M104 S210", "M140 S60", "M190 S60", "M109 S210", "G90", "G92 E0"]
+    while len(script) < lines:
+        x = random.uniform(0, 220)
+        y = random.uniform(0, 220)
+        e = random.uniform(0, 5)
+        script.append(random.choice([
+            f"G1 X{x:.2f} Y{y:.2f} E{e:.4f} F1800",
+            f"G0 X{x:.2f} Y{y:.2f} F6000 ; travel",
+            f"M106 S{random.randint(0, 255)}",
+            "M400",
+        ]))
+    return script[:lines]
+
+
+def main():
+    security = DEFAULT_CONFIG['security']
+
+    start = time.perf_counter()
+    validator = GcodeValidator(security['allowed_gcode_patterns'], security['gcode_limits'])
+    compile_ms = (time.perf_counter() - start) * 1000
+
+    print(f"Compilación de patrones: {compile_ms:.3f} ms")
+    print(f"{'Líneas':>8} {'Media (ms)':>12} {'Máx (ms)':>10} {'µs/línea':>10}")
+
+    for size in SCRIPT_SIZES:
+        script = generate_script(size)
+        timings = []
+        for _ in range(REPETITIONS):
+            start = time.perf_counter()
+            error = validator.validate(script)
+            timings.append(time.perf_counter() - start)
+            assert error is None, error
+
+        mean_ms = sum(timings) / len(timings) * 1000
+        max_ms = max(timings) * 1000
+        print(f"{size:>8} {mean_ms:>12.4f} {max_ms:>10.4f} {mean_ms * 1000 / size:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Benchmark de la caché entre pares del cliente TecMedHub
+Levanta varias instancias locales (cada una con su directorio de G-code y su
+puerto), les pide a todas el mismo archivo y cuenta cuántas veces lo entregó
+el servidor. Con la caché entre pares debería ser una sola vez.
+
+Uso:
+    python3 test/bench_peer_cache.py --printers 5 --size-mb 20
+    python3 test/bench_peer_cache.py --static   # sin multicast, pares fijos
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from fake_services import FakeServer
+from klipper_client import DEFAULT_CONFIG, FileManager, PeerCache, RobustHTTPClient
+
+BASE_PORT = 17130
+
+
+def build_instance(index, args, workdir, logger):
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    config['file_management']['gcode_directory'] = os.path.join(workdir, f'printer{index}', 'gcodes')
+    config['gcode_cache']['index_file'] = os.path.join(workdir, f'printer{index}', 'gcode_cache.json')
+    config['download_throttle']['lower_priority'] = False
+    config['peer_cache'].update({
+        'enabled': True,
+        'port': BASE_PORT + index,
+        'bind': '127.0.0.1' if args.static else '0.0.0.0',  # Los anuncios llegan desde la IP de la interfaz
+        'discovery': not args.static,
+        'discovery_port': BASE_PORT + 100,
+        'peers': [f"http://127.0.0.1:{BASE_PORT + i}" for i in range(args.printers) if i != index] if args.static else [],
+        'announce_interval': 5
+    })
+    file_manager = FileManager(config, logger, RobustHTTPClient(config, logger))
+    file_manager.peers = PeerCache(config, logger, file_manager)
+    file_manager.peers.start()
+    return file_manager
+
+
+def wait_for_holder(file_manager, md5, timeout=3.0):
+    """Esperar a que llegue un anuncio con el MD5 (multicast es asíncrono)"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if file_manager.peers.lookup(md5):
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--printers', type=int, default=5)
+    parser.add_argument('--size-mb', type=float, default=20)
+    parser.add_argument('--static', action='store_true', help="Pares fijos en lugar de multicast")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logger = logging.getLogger('bench_peer_cache')
+
+    server = FakeServer().start()
+    data = os.urandom(int(args.size_mb * 1024 * 1024))
+    md5 = hashlib.md5(data).hexdigest()
+    server.downloads['pieza.gcode'] = data
+    url = f"{server.files_url}?action=download_file&file=pieza.gcode"
+
+    with tempfile.TemporaryDirectory() as workdir:
+        instances = [build_instance(i, args, workdir, logger) for i in range(args.printers)]
+        print(f"{args.printers} impresoras, archivo de {args.size_mb} MB, "
+              f"descubrimiento: {'pares fijos' if args.static else 'multicast'}")
+        print(f"{'Impresora':>10} {'Origen':>10} {'Tiempo (s)':>12}")
+        try:
+            for index, file_manager in enumerate(instances):
+                if index > 0 and not wait_for_holder(file_manager, md5):
+                    print(f"{index:>10} (sin anuncio de pares)")
+                before = server.served.get('pieza.gcode', 0)
+                started = time.monotonic()
+                success, error = file_manager.download_file('pieza.gcode', url, md5)
+                elapsed = time.monotonic() - started
+                source = 'servidor' if server.served.get('pieza.gcode', 0) > before else 'par'
+                print(f"{index:>10} {source if success else 'ERROR ' + str(error):>10} {elapsed:>12.3f}")
+        finally:
+            for file_manager in instances:
+                file_manager.peers.stop_event.set()
+            for file_manager in instances:
+                file_manager.peers.stop()
+            server.stop()
+
+    served = server.served.get('pieza.gcode', 0)
+    print(f"\nEl servidor entregó el archivo {served} vez/veces para {args.printers} impresoras")
+    return 0 if served == 1 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
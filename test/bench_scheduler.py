@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark del planificador del loop principal del cliente TecMedHub
+Compara el loop anterior (deltas de time.time() y sleep de 0.5 s) con el
+Scheduler monotónico: despertares, ejecuciones frente a las esperadas
+(deriva) y retraso de cada ejecución respecto de su hora.
+"""
+
+import logging
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from klipper_client import Scheduler
+
+DURATION = 30.0
+# Tarea: (nombre, intervalo, duración típica)
+JOBS = [('status_update', 1.0, 0.15), ('command_check', 0.7, 0.05), ('health_check', 5.0, 0.4)]
+
+
+def make_job(name, interval, cost, record):
+    def job():
+        record[name].append(time.monotonic())
+        time.sleep(random.uniform(0.5, 1.5) * cost)
+    return job
+
+
+def lateness(times, start, interval):
+    """Retraso de cada ejecución respecto de la grilla start + k*intervalo"""
+    return [(t - start) % interval for t in times]
+
+
+def legacy_loop(record):
+    wakeups = 0
+    last = {name: 0 for name, _, _ in JOBS}
+    funcs = {name: make_job(name, interval, cost, record) for name, interval, cost in JOBS}
+    end = time.time() + DURATION
+    while time.time() < end:
+        wakeups += 1
+        current_time = time.time()
+        for name, interval, _ in JOBS:
+            if current_time - last[name] >= interval:
+                funcs[name]()
+                last[name] = current_time
+        time.sleep(0.5)
+    return wakeups
+
+
+def scheduler_loop(record):
+    logger = logging.getLogger('bench')
+    scheduler = Scheduler({'scheduler': {'jitter': 0.0, 'misfire': 'skip'}}, logger)
+    for name, interval, cost in JOBS:
+        scheduler.add(name, make_job(name, interval, cost, record), interval)
+    wakeups = 0
+    wait = scheduler._wait
+
+    def counted_wait(timeout):
+        nonlocal wakeups
+        wakeups += 1
+        wait(timeout)
+
+    scheduler._wait = counted_wait
+    end = time.monotonic() + DURATION
+    scheduler.run(lambda: time.monotonic() < end)
+    return wakeups, scheduler.stats()
+
+
+def report(label, wakeups, record, start):
+    print(f"\n{label}: {wakeups} despertares en {DURATION:.0f}s")
+    print(f"{'Tarea':<15} {'Esperadas':>10} {'Ejecutadas':>11} {'Retraso mediana (ms)':>21} {'Máx (ms)':>9}")
+    for name, interval, _ in JOBS:
+        late = lateness(record[name], start, interval)
+        print(f"{name:<15} {int(DURATION / interval):>10} {len(record[name]):>11} "
+              f"{statistics.median(late) * 1000:>21.0f} {max(late) * 1000:>9.0f}")
+
+
+def main():
+    random.seed(1)
+    record = {name: [] for name, _, _ in JOBS}
+    start = time.monotonic()
+    report("Loop anterior (sleep 0.5 s)", legacy_loop(record), record, start)
+
+    record = {name: [] for name, _, _ in JOBS}
+    start = time.monotonic()
+    wakeups, stats = scheduler_loop(record)
+    report("Scheduler", wakeups, record, start)
+    skipped = sum(job['skipped'] for job in stats.values())
+    print(f"Ejecuciones omitidas (misfire=skip): {skipped}")
+
+
+if __name__ == "__main__":
+    main()
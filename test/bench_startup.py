@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark de arranque del cliente TecMedHub
+Mide el tiempo desde que se lanza el proceso hasta que el servidor recibe
+la primera actualización, con y sin fast_start, con Moonraker arriba o caído
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from fake_services import FakeMoonraker, FakeServer
+from klipper_client import DEFAULT_CONFIG
+
+CLIENT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'client', 'klipper_client.py'))
+TIMEOUT = 60  # segundos máximos por escenario
+
+
+def build_config(server, moonraker, fast_start, gcode_dir):
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    config['server_url'] = server.api_url
+    config['moonraker_url'] = moonraker.url
+    config['camera']['enabled'] = False
+    config['telemetry']['enabled'] = False
+    config['startup']['fast_start'] = fast_start
+    config['file_management']['gcode_directory'] = gcode_dir
+    return config
+
+
+def run_scenario(fast_start, moonraker_down):
+    server = FakeServer().start()
+    moonraker = FakeMoonraker().start()
+    moonraker.faults.down = moonraker_down
+
+    with tempfile.TemporaryDirectory() as workdir:
+        config = build_config(server, moonraker, fast_start, os.path.join(workdir, 'gcodes'))
+        with open(os.path.join(workdir, 'printer_config.json'), 'w') as f:
+            json.dump(config, f)
+
+        launched = time.monotonic()
+        process = subprocess.Popen(
+            [sys.executable, CLIENT], cwd=workdir,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        try:
+            while server.first_update_at is None and process.poll() is None:
+                if time.monotonic() - launched > TIMEOUT:
+                    break
+                time.sleep(0.01)
+        finally:
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+    server.stop()
+    moonraker.stop()
+
+    if server.first_update_at is None:
+        return None
+    return server.first_update_at - launched
+
+
+def import_time():
+    """Tiempo de importar el módulo del cliente (sin crear componentes)"""
+    launched = time.monotonic()
+    subprocess.run(
+        [sys.executable, '-c', f"import sys; sys.path.insert(0, {os.path.dirname(CLIENT)!r}); import klipper_client"],
+        check=True
+    )
+    return time.monotonic() - launched
+
+
+def main():
+    print(f"Importar klipper_client (proceso nuevo): {import_time():.3f} s")
+    print(f"{'fast_start':>10} {'Moonraker':>10} {'Primera actualización':>24}")
+    for fast_start in (True, False):
+        for moonraker_down in (False, True):
+            elapsed = run_scenario(fast_start, moonraker_down)
+            result = f"{elapsed:.3f} s" if elapsed is not None else f"nunca (>{TIMEOUT}s o salió)"
+            print(f"{str(fast_start):>10} {'caído' if moonraker_down else 'arriba':>10} {result:>24}")
+
+
+if __name__ == "__main__":
+    main()
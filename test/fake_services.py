@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Servicios falsos de Moonraker y del servidor PHP para probar el cliente
+TecMedHub en local (benchmarks y pruebas de resistencia)
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class Faults:
+    """Fallas inyectables: demora, errores 500 y cortes de conexión"""
+
+    def __init__(self):
+        self.down = False           # Cortar toda conexión
+        self.delay = 0.0            # Segundos de demora por respuesta
+        self.error_rate = 0.0       # Probabilidad de responder 500
+        self.disconnect_rate = 0.0  # Probabilidad de cortar sin responder
+
+    def apply(self, handler) -> bool:
+        """Aplicar fallas; False si la petición no debe responderse"""
+        if self.down or random.random() < self.disconnect_rate:
+            handler.close_connection = True
+            try:
+                handler.connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            return False
+
+        if self.delay:
+            time.sleep(self.delay)
+
+        if random.random() < self.error_rate:
+            handler.send_json({'error': {'code': 500, 'message': 'Falla inyectada'}}, status=500)
+            return False
+
+        return True
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    service = None
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def read_body(self) -> bytes:
+        if self.headers.get('Transfer-Encoding') == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b''.join(chunks)
+        return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+    def do_GET(self):
+        if self.service.faults.apply(self):
+            self.service.handle(self, 'GET', None)
+
+    def do_POST(self):
+        body = self.read_body()
+        if self.service.faults.apply(self):
+            self.service.handle(self, 'POST', body)
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    """Sin trazas por clientes que cortan la conexión (esperable con fallas)"""
+
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class _Service:
+    """Servidor HTTP en un hilo con fallas inyectables"""
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.faults = Faults()
+        self.requests = 0
+        handler = type('Handler', (_Handler,), {'service': self})
+        self.httpd = _QuietHTTPServer((host, port), handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def handle(self, handler, method, body):
+        raise NotImplementedError
+
+
+class FakeMoonraker(_Service):
+    """Moonraker simulado con una impresión en curso"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.started = time.time()
+        self.gcode_scripts = []
+        self.script_times = []      # time.monotonic() de cada script, en el mismo orden
+        self.print_starts = []      # (time.monotonic(), archivo) de cada printer/print/start
+        self.gcode_error = None     # Mensaje de error de Klipper para printer/gcode/script
+        self.klippy_state = 'ready'
+        self.print_state = 'printing'
+        self.files = [
+            {'path': f'pieza_{i}.gcode', 'filename': f'pieza_{i}.gcode',
+             'size': 1024 * (i + 1), 'modified': self.started - i * 3600}
+            for i in range(20)
+        ]
+
+    def status(self) -> dict:
+        elapsed = time.time() - self.started
+        progress = (elapsed % 3600) / 3600
+        return {
+            'extruder': {'temperature': 210 + random.uniform(-1, 1), 'target': 210, 'power': 0.5},
+            'extruder1': {'temperature': 25.0, 'target': 0, 'power': 0.0},
+            'heater_generic chamber': {'temperature': 38.0, 'target': 40, 'power': 0.2},
+            'temperature_sensor raspberry_pi': {'temperature': 52.0},
+            'fan_generic exhaust': {'speed': 0.4},
+            'heater_bed': {'temperature': 60 + random.uniform(-0.5, 0.5), 'target': 60, 'power': 0.3},
+            'print_stats': {'state': self.print_state, 'filename': 'pieza_0.gcode',
+                            'print_duration': elapsed, 'total_duration': elapsed + 10,
+                            'filament_used': elapsed * 5.0},
+            'display_status': {'progress': progress, 'message': None},
+            'virtual_sdcard': {'progress': progress, 'file_position': int(progress * 1e6), 'is_active': True},
+            'gcode_move': {'speed_factor': 1.0, 'extrude_factor': 1.0},
+            'fan': {'speed': 0.8},
+            'toolhead': {'position': [0, 0, 0, 0], 'homed_axes': 'xyz'},
+            'motion_report': {'live_velocity': random.uniform(0, 100), 'live_extruder_velocity': 1.0},
+            'system_stats': {'sysload': 0.5, 'cputime': elapsed, 'memavail': 400000},
+            'webhooks': {'state': self.klippy_state, 'state_message': 'Printer is ready'}
+        }
+
+    def handle(self, handler, method, body):
+        self.requests += 1
+        url = urlparse(handler.path)
+        path = url.path.strip('/')
+        query = parse_qs(url.query, keep_blank_values=True)
+
+        if path == 'server/info':
+            return handler.send_json({'result': {'klippy_state': 'ready'}})
+        if path == 'printer/info':
+            return handler.send_json({'result': {'state': 'ready', 'hostname': 'fake'}})
+        if path == 'printer/objects/list':
+            return handler.send_json({'result': {'objects': list(self.status())}})
+        if path == 'printer/objects/query':
+            status = self.status()
+            result = {}
+            for name, values in query.items():
+                obj = status.get(name, {})
+                attrs = [a for a in values[0].split(',') if a] if values and values[0] else None
+                result[name] = {k: v for k, v in obj.items() if attrs is None or k in attrs}
+            return handler.send_json({'result': {'eventtime': time.time(), 'status': result}})
+        if path == 'server/files/list':
+            return handler.send_json({'result': self.files})
+        if path == 'server/files/metadata':
+            return handler.send_json({'result': {'filename': query.get('filename', [''])[0],
+                                                 'estimated_time': 3600, 'filament_total': 5000.0,
+                                                 'layer_height': 0.2, 'modified': self.started,
+                                                 'thumbnails': [
+                                                     {'width': 32, 'height': 32, 'relative_path': '.thumbs/p-32x32.png'},
+                                                     {'width': 300, 'height': 300, 'relative_path': '.thumbs/p-300x300.png'}
+                                                 ]}})
+        if path == 'server/history/list':
+            return handler.send_json({'result': {'count': 1, 'jobs': [
+                {'filename': 'pieza_1.gcode', 'end_time': self.started, 'status': 'completed'}
+            ]}})
+        if path == 'printer/gcode/script':
+            self.gcode_scripts.append(json.loads(body or b'{}').get('script', ''))
+            self.script_times.append(time.monotonic())
+            if self.gcode_error:
+                return handler.send_json({'error': {'code': 400, 'message': self.gcode_error}}, status=400)
+            return handler.send_json({'result': 'ok'})
+        if path == 'printer/print/start':
+            self.print_starts.append((time.monotonic(), query.get('filename', [''])[0]))
+            return handler.send_json({'result': 'ok'})
+        if method == 'POST':
+            return handler.send_json({'result': 'ok'})
+
+        handler.send_json({'error': {'code': 404, 'message': f'No existe {path}'}}, status=404)
+
+
+class FakeServer(_Service):
+    """Servidor PHP simulado (api.php, files.php, upload_image.php, descargas y una cámara)"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.updates = []       # (hora, payload) de cada update_printer
+        self.events = []
+        self.jobs = []          # Trabajos recibidos con sync_jobs
+        self.commands = []      # Comandos a entregar en el próximo get_commands
+        self.batches = 0        # Lotes recibidos (action=batch)
+        self.batch_enabled = True  # False = como un api.php anterior (sin batch ni tokens=)
+        self.downloads = {}     # nombre -> bytes
+        self.owners = {}        # nombre -> token de su impresora (sin entrada = global)
+        self.downloaded = set() # Marcados con mark_downloaded
+        self.served = {}        # nombre -> veces que se entregó
+        self.snapshot = b'\xff\xd8\xff\xe0' + os.urandom(30000) + b'\xff\xd9'
+        self.uploads = []       # (Content-Type, cuerpo) de cada upload_image
+        self.first_update_at = None
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.url}/api.php"
+    
+    @property
+    def files_url(self) -> str:
+        return f"{self.url}/printer-api/files.php"
+
+    def handle(self, handler, method, body):
+        self.requests += 1
+        url = urlparse(handler.path)
+        query = parse_qs(url.query)
+        action = query.get('action', [''])[0]
+
+        if url.path.endswith('/snapshot'):
+            handler.send_response(200)
+            handler.send_header('Content-Type', 'image/jpeg')
+            handler.send_header('Content-Length', str(len(self.snapshot)))
+            handler.end_headers()
+            handler.wfile.write(self.snapshot)
+            return
+
+        if url.path.endswith('upload_image.php'):
+            self.uploads.append((handler.headers.get('Content-Type'), body))
+            del self.uploads[:-10]
+            return handler.send_json({'success': True, 'image_url': f'printer_images/{time.time()}.jpg'})
+
+        if url.path.endswith('files.php'):
+            if method == 'POST':
+                payload = json.loads(body or b'{}')
+                if payload.get('action') == 'mark_downloaded':
+                    self.downloaded.add(payload.get('file'))
+                return handler.send_json({'success': True, 'message': 'Archivo marcado como descargado'})
+            if action == 'list_files':
+                token = query.get('printer_token', [''])[0]
+                return handler.send_json({'success': True, 'message': 'OK', 'files': [
+                    {'name': name, 'size_bytes': len(data), 'md5': hashlib.md5(data).hexdigest(),
+                     'downloaded': name in self.downloaded, 'assigned': name in self.owners, 'exists': True}
+                    for name, data in self.downloads.items() if self.owners.get(name, token) == token
+                ]})
+        
+        if method == 'POST' and url.path.endswith('api.php'):
+            try:
+                if handler.headers.get('Content-Encoding') == 'gzip':
+                    body = gzip.decompress(body)
+                payload = json.loads(body or b'{}')
+            except (ValueError, OSError):
+                payload = {}
+            if payload.get('action') == 'batch' and self.batch_enabled:
+                self.batches += 1
+                for item in payload.get('items', []):
+                    self.api_action(item)
+                return handler.send_json({'success': True, 'results': {}})
+            if not self.api_action(payload):
+                return handler.send_json({'success': False, 'message': 'Acción no válida'})
+            return handler.send_json({'success': True})
+
+        if action == 'get_commands':
+            commands, self.commands = self.commands, []
+            if query.get('tokens') and self.batch_enabled:
+                tokens = query['tokens'][0].split(',')
+                return handler.send_json({'success': True, 'commands': {tokens[0]: commands} if commands else {}})
+            if query.get('tokens'):
+                return handler.send_json({'success': False, 'message': 'Token requerido'})
+            return handler.send_json({'success': True, 'commands': commands})
+        if action == 'download_file':
+            name = query.get('file', [''])[0]
+            data = self.downloads.get(name)
+            if data is None:
+                return handler.send_json({'success': False, 'message': 'Archivo no encontrado'})
+            token = query.get('printer_token', [''])[0]
+            if self.owners.get(name, token) != token:
+                return handler.send_json({'success': False, 'message': 'No autorizado para descargar este archivo'})
+            self.served[name] = self.served.get(name, 0) + 1
+            handler.send_response(200)
+            handler.send_header('Content-Type', 'application/octet-stream')
+            handler.send_header('Content-Length', str(len(data)))
+            handler.end_headers()
+            handler.wfile.write(data)
+            return
+
+        handler.send_json({'success': True, 'printers': []})
+
+    def api_action(self, payload) -> bool:
+        """Registrar una acción POST de api.php; False si no se reconoce"""
+        action = payload.get('action', '')
+        if action == 'update_printer':
+            if self.first_update_at is None:
+                self.first_update_at = time.monotonic()
+            self.updates.append((time.monotonic(), payload))
+            del self.updates[:-1000]
+        elif action == 'printer_event':
+            self.events.append(payload.get('event'))
+        elif action == 'sync_jobs':
+            self.jobs.extend(payload.get('jobs', []))
+        elif action != 'profile_report':
+            return False
+        return True
@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+"""
+Prueba de resistencia (soak test) del cliente TecMedHub
+Corre PrinterClient contra Moonraker y servidor falsos con el reloj acelerado
+durante días simulados, inyecta fallas (timeouts, errores 500, cortes) y
+registra RSS, descriptores abiertos, hilos y latencia de cada actualización.
+Termina con código 1 si el crecimiento o la latencia superan los umbrales.
+
+Uso:
+    python3 test/soak_test.py --days 1 --speed 200
+    python3 test/soak_test.py --days 0.1 --speed 100 --csv soak.csv
+
+Requiere Linux (lee /proc/<pid>).
+"""
+
+import argparse
+import csv
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime
+
+TEST_DIR = os.path.dirname(os.path.abspath(__file__))
+CLIENT_DIR = os.path.join(TEST_DIR, '..', 'client')
+sys.path.insert(0, TEST_DIR)
+sys.path.insert(0, CLIENT_DIR)
+
+# Ciclo de fallas en horas simuladas: (inicio, fin, falla)
+FAULT_CYCLE_HOURS = 2
+FAULT_SCHEDULE = [
+    (0.80, 0.85, 'moonraker_lento'),
+    (0.85, 0.90, 'servidor_500'),
+    (0.90, 0.95, 'cortes'),
+    (0.95, 1.00, 'moonraker_caido'),
+]
+COMMANDS = [
+    {'action': 'home'},
+    {'action': 'set_speed', 'speed': 120},
+    {'action': 'pause'},
+    {'action': 'resume'},
+    {'action': 'gcode', 'gcode': 'G1 X10 Y10\nM106 S128'},
+    {'action': 'macro', 'macro_name': 'PURGE'},
+]
+
+
+# ==============================================================================
+# PROCESO HIJO: el cliente con el reloj acelerado
+# ==============================================================================
+
+def accelerated_clock(speed):
+    """Reemplazos de time y datetime que avanzan 'speed' veces más rápido"""
+    real_monotonic = time.monotonic
+    start_monotonic = real_monotonic()
+    start_wall = time.time()
+
+    def monotonic():
+        return start_monotonic + (real_monotonic() - start_monotonic) * speed
+
+    def wall():
+        return start_wall + (real_monotonic() - start_monotonic) * speed
+
+    def sleep(seconds):
+        time.sleep(max(seconds, 0) / speed)
+
+    class AcceleratedDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return cls.fromtimestamp(wall(), tz)
+
+    clock = types.SimpleNamespace(time=wall, monotonic=monotonic, sleep=sleep)
+    return clock, AcceleratedDatetime
+
+
+def run_child(workdir, speed, latency_path):
+    os.chdir(workdir)
+    import klipper_client
+
+    # Cada módulo del paquete importa time/datetime por su cuenta
+    clock, accelerated_datetime = accelerated_clock(speed)
+    for name, module in list(sys.modules.items()):
+        if name.startswith('tecmedhub.'):
+            if hasattr(module, 'time'):
+                module.time = clock
+            if hasattr(module, 'datetime'):
+                module.datetime = accelerated_datetime
+
+    # El loop duerme en un Event (no en time.sleep): acelerar también esa espera
+    scheduler_wait = klipper_client.Scheduler._wait
+    klipper_client.Scheduler._wait = lambda self, timeout: scheduler_wait(
+        self, None if timeout is None else max(timeout, 0) / speed)
+
+    # Latencia real de cada actualización de estado
+    latency_file = open(latency_path, 'a', buffering=1)
+    send_status_update = klipper_client.PrinterClient.send_status_update
+
+    def timed_send_status_update(self):
+        started = time.perf_counter()
+        result = send_status_update(self)
+        latency_file.write(f"{clock.time():.1f} {time.perf_counter() - started:.4f} {int(result)}\n")
+        return result
+
+    klipper_client.PrinterClient.send_status_update = timed_send_status_update
+
+    client = klipper_client.PrinterClient(klipper_client.CONFIG_FILE)
+    client.run()
+
+
+# ==============================================================================
+# PROCESO PADRE: servicios falsos, fallas y mediciones
+# ==============================================================================
+
+def build_config(server, moonraker):
+    from klipper_client import DEFAULT_CONFIG
+
+    config = json.loads(json.dumps(DEFAULT_CONFIG))
+    config['server_url'] = server.api_url
+    config['moonraker_url'] = moonraker.url
+    config['camera']['urls'] = [f"{server.url}/snapshot"]
+    config['file_management']['gcode_directory'] = 'gcodes'
+    config['timeouts'].update({'moonraker': 1, 'server': 2, 'camera': 1})
+    config['logging']['level'] = 'WARNING'
+    config['profiling']['enabled'] = False
+    return config
+
+
+def read_proc(pid):
+    """RSS (KB), descriptores abiertos e hilos del proceso"""
+    rss = threads = 0
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                rss = int(line.split()[1])
+            elif line.startswith('Threads:'):
+                threads = int(line.split()[1])
+    fds = len(os.listdir(f"/proc/{pid}/fd"))
+    return rss, fds, threads
+
+
+def apply_fault(fault, moonraker, server):
+    """Dejar los servicios en el estado de la falla indicada (None = normales)"""
+    for service in (moonraker, server):
+        service.faults.down = False
+        service.faults.delay = 0.0
+        service.faults.error_rate = 0.0
+        service.faults.disconnect_rate = 0.0
+
+    if fault == 'moonraker_lento':
+        moonraker.faults.delay = 1.5  # Más que timeouts.moonraker
+    elif fault == 'servidor_500':
+        server.faults.error_rate = 0.5
+    elif fault == 'cortes':
+        moonraker.faults.disconnect_rate = 0.3
+        server.faults.disconnect_rate = 0.3
+    elif fault == 'moonraker_caido':
+        moonraker.faults.down = True
+
+
+def current_fault(simulated_seconds):
+    position = (simulated_seconds / 3600 % FAULT_CYCLE_HOURS) / FAULT_CYCLE_HOURS
+    for start, end, fault in FAULT_SCHEDULE:
+        if start <= position < end:
+            return fault
+    return None
+
+
+def window_median(samples, start, end, column):
+    values = [s[column] for s in samples[int(len(samples) * start):int(len(samples) * end)]]
+    return statistics.median(values) if values else 0
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def read_latencies(path):
+    latencies = []
+    try:
+        with open(path) as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3:
+                    latencies.append((float(parts[0]), float(parts[1]), parts[2] == '1'))
+    except FileNotFoundError:
+        pass
+    return latencies
+
+
+def run_soak(args):
+    from fake_services import FakeMoonraker, FakeServer
+
+    server = FakeServer().start()
+    moonraker = FakeMoonraker().start()
+    real_duration = args.days * 86400 / args.speed
+    workdir = tempfile.mkdtemp(prefix='soak-')
+    latency_path = os.path.join(workdir, 'latency.txt')
+
+    with open(os.path.join(workdir, 'printer_config.json'), 'w') as f:
+        json.dump(build_config(server, moonraker), f)
+
+    print(f"Soak: {args.days} día(s) simulados a x{args.speed} = {real_duration:.0f}s reales (en {workdir})")
+    process = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), '--child', workdir, str(args.speed), latency_path],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+    samples = []
+    started = time.monotonic()
+    next_command = next_job_change = 0.0
+    fault = None
+    try:
+        while process.poll() is None:
+            elapsed = time.monotonic() - started
+            if elapsed >= real_duration:
+                break
+            simulated = elapsed * args.speed
+
+            new_fault = current_fault(simulated) if args.faults else None
+            if new_fault != fault:
+                fault = new_fault
+                apply_fault(fault, moonraker, server)
+
+            # Comandos cada 10 minutos simulados; trabajos de ~3 horas
+            if simulated >= next_command:
+                server.commands.append(dict(random.choice(COMMANDS), id=int(simulated)))
+                next_command = simulated + 600
+            if simulated >= next_job_change:
+                moonraker.print_state = 'printing' if moonraker.print_state != 'printing' else 'complete'
+                next_job_change = simulated + random.uniform(1, 5) * 3600
+
+            rss, fds, threads = read_proc(process.pid)
+            samples.append({
+                'simulated_hours': round(simulated / 3600, 2),
+                'rss_kb': rss,
+                'fds': fds,
+                'threads': threads,
+                'fault': fault or ''
+            })
+            time.sleep(args.sample_interval)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        server.stop()
+        moonraker.stop()
+
+    if args.csv:
+        with open(args.csv, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=list(samples[0]) if samples else ['simulated_hours'])
+            writer.writeheader()
+            writer.writerows(samples)
+
+    result = evaluate(args, samples, read_latencies(latency_path), process.returncode)
+    if args.keep:
+        print(f"Archivos del cliente en {workdir}")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return result
+
+
+def evaluate(args, samples, latencies, returncode):
+    """Comparar el inicio (después del calentamiento) con el final"""
+    failures = []
+    if len(samples) < 10:
+        failures.append(f"Muy pocas muestras ({len(samples)}); ¿el cliente terminó antes? (código {returncode})")
+        return report(failures, {})
+
+    # Línea base entre el 10% y el 20% de la corrida (ya cargadas cachés y módulos)
+    metrics = {}
+    for column, limit in (('rss_kb', args.max_rss_growth_mb * 1024),
+                          ('fds', args.max_fd_growth),
+                          ('threads', args.max_thread_growth)):
+        baseline = window_median(samples, 0.10, 0.20, column)
+        final = window_median(samples, 0.90, 1.00, column)
+        metrics[column] = (baseline, final, max(s[column] for s in samples))
+        if final - baseline > limit:
+            failures.append(f"{column}: creció {final - baseline} (de {baseline} a {final}, límite {limit})")
+
+    # Latencia de las actualizaciones exitosas: al inicio y al final
+    ok = [latency for _, latency, success in latencies if success]
+    if ok:
+        first = ok[int(len(ok) * 0.1):int(len(ok) * 0.3)] or ok
+        last = ok[int(len(ok) * 0.8):] or ok
+        p95_first, p95_last = percentile(first, 0.95), percentile(last, 0.95)
+        metrics['latency_p95_s'] = (p95_first, p95_last, max(ok))
+        if p95_last > args.max_latency:
+            failures.append(f"Latencia p95 final {p95_last:.3f}s supera {args.max_latency}s")
+        if p95_last > p95_first * args.max_latency_ratio + 0.05:
+            failures.append(f"Latencia p95 empeoró de {p95_first:.3f}s a {p95_last:.3f}s")
+    else:
+        failures.append("Ninguna actualización de estado exitosa")
+
+    metrics['updates'] = (len(latencies), len(ok), None)
+    return report(failures, metrics)
+
+
+def report(failures, metrics):
+    print(f"{'Métrica':<16} {'Inicio':>12} {'Final':>12} {'Máximo':>12}")
+    for name, (start, end, peak) in metrics.items():
+        print(f"{name:<16} {start:>12} {end:>12} {'' if peak is None else peak:>12}")
+    if failures:
+        print("\n❌ Soak test falló:")
+        for failure in failures:
+            print(f"   - {failure}")
+        return 1
+    print("\n✅ Soak test OK")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--days', type=float, default=1.0, help="Días simulados")
+    parser.add_argument('--speed', type=float, default=200, help="Aceleración del reloj")
+    parser.add_argument('--sample-interval', type=float, default=1.0, help="Segundos reales entre mediciones")
+    parser.add_argument('--no-faults', dest='faults', action='store_false', help="Sin inyección de fallas")
+    parser.add_argument('--max-rss-growth-mb', type=float, default=10)
+    parser.add_argument('--max-fd-growth', type=int, default=5)
+    parser.add_argument('--max-thread-growth', type=int, default=2)
+    parser.add_argument('--max-latency', type=float, default=2.0, help="p95 máximo (s) de una actualización")
+    parser.add_argument('--max-latency-ratio', type=float, default=2.0, help="Empeoramiento máximo del p95")
+    parser.add_argument('--csv', help="Guardar las mediciones en CSV")
+    parser.add_argument('--keep', action='store_true', help="Conservar el directorio del cliente (logs, estado)")
+    return parser.parse_args(argv)
+
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == '--child':
+        run_child(sys.argv[2], float(sys.argv[3]), sys.argv[4])
+        return 0
+    return run_soak(parse_args())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Pruebas del registro de acciones del cliente TecMedHub
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import logging
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from klipper_client import ActionRegistry, CommandAction, register_builtin_actions
+
+PLUGIN = '''
+CALLS = []
+
+def register_actions(registry):
+    CALLS.append(1)
+    registry.register('purge', gcode=lambda p: [f"G1 E{p['length']} F300"],
+                      params={'length': {'type': 'number', 'default': 20, 'min': 0, 'max': 100}})
+'''
+
+
+class CommandActionTest(unittest.TestCase):
+
+    def action(self, **params):
+        return CommandAction('prueba', gcode=lambda p: [], params=params)
+
+    def test_numbers_keep_integers(self):
+        validate = self.action(temp={'type': 'number'}).validate
+        self.assertEqual(validate({'temp': '200'})['temp'], 200)
+        self.assertEqual(validate({'temp': 200.0})['temp'], 200)
+        self.assertEqual(validate({'temp': '0.5'})['temp'], 0.5)
+
+    def test_invalid_values_are_rejected(self):
+        validate = self.action(temp={'type': 'number', 'min': 0, 'max': 300}).validate
+        for value in (True, 'abc', 'nan', 'inf', -1, 301):
+            with self.assertRaises(ValueError, msg=repr(value)):
+                validate({'temp': value})
+
+    def test_defaults_and_required(self):
+        validate = self.action(speed={'type': 'number', 'default': 100},
+                               name={'type': 'str', 'required': True}).validate
+        self.assertEqual(validate({'name': 'x', 'speed': ''}), {'name': 'x', 'speed': 100})
+        with self.assertRaisesRegex(ValueError, 'requerido: name'):
+            validate({})
+
+    def test_unknown_type_and_double_definition_fail_at_registration(self):
+        with self.assertRaises(ValueError):
+            self.action(x={'type': 'float'})
+        with self.assertRaises(ValueError):
+            CommandAction('doble', handler=lambda processor, params: True, gcode=lambda p: [])
+
+
+class ActionRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.registry = ActionRegistry()
+        self.logger = logging.getLogger('test')
+        self.workdir = tempfile.TemporaryDirectory()
+        self.plugin = os.path.join(self.workdir.name, 'purge_plugin.py')
+        with open(self.plugin, 'w') as f:
+            f.write(PLUGIN)
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_builtin_actions(self):
+        register_builtin_actions(self.registry)
+        home = self.registry.get('home')
+        self.assertEqual(home.gcode(home.validate({})), ['G28'])
+        self.assertIsNone(self.registry.get('no_existe'))
+        self.assertIn('set_speed', self.registry.names())
+
+    def test_plugin_adds_actions(self):
+        self.registry.load_plugins([self.plugin], self.logger)
+        purge = self.registry.get('purge')
+        self.assertEqual(purge.gcode(purge.validate({'length': 5})), ['G1 E5 F300'])
+
+    def test_plugin_runs_again_only_when_its_file_changes(self):
+        loaded = {}
+        self.registry.load_plugins([self.plugin], self.logger, loaded)
+        module = loaded[self.plugin][1]
+        self.registry.load_plugins([self.plugin], self.logger, loaded)
+        self.assertIs(loaded[self.plugin][1], module)
+
+        with open(self.plugin, 'a') as f:
+            f.write('\n# cambio\n')
+        self.registry.load_plugins([self.plugin], self.logger, loaded)
+        self.assertIsNot(loaded[self.plugin][1], module)
+
+    def test_broken_plugin_is_skipped(self):
+        broken = os.path.join(self.workdir.name, 'roto.py')
+        with open(broken, 'w') as f:
+            f.write('raise RuntimeError("roto")\n')
+        with self.assertLogs(self.logger, 'WARNING'):
+            self.registry.load_plugins([broken, self.plugin], self.logger)
+        self.assertIsNotNone(self.registry.get('purge'))
+
+
+if __name__ == "__main__":
+    unittest.main()
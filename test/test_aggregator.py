@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Pruebas del agregador de laboratorio del cliente TecMedHub (en proceso,
+contra el servidor falso)
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import copy
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+import requests
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from bench_aggregator import free_port
+from fake_services import FakeServer
+from klipper_client import DEFAULT_CONFIG, EdgeAggregator, stop_logging
+
+
+class AggregatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.TemporaryDirectory()
+        os.chdir(self.workdir.name)
+        self.server = FakeServer().start()
+        self.server.downloads['global.gcode'] = b'G28\n' * 100
+        self.server.downloads['propio.gcode'] = b'G1 X1\n' * 100
+        self.server.owners['propio.gcode'] = 'token-a'
+        self.aggregator = None
+        self.start(max_outbox=3)
+
+    def tearDown(self):
+        self.stop()
+        self.server.stop()
+        os.chdir(self.cwd)
+        self.workdir.cleanup()
+
+    def start(self, **options):
+        config = copy.deepcopy(DEFAULT_CONFIG)
+        config.update(server_url=self.server.api_url, files_url=self.server.files_url)
+        config['retries'] = {'max_attempts': 1, 'base_delay': 0.01, 'exponential_backoff': False}
+        config['logging']['level'] = 'WARNING'
+        config['aggregator'].update(port=free_port(), bind='127.0.0.1', **options)
+        with open('printer_config.json', 'w') as f:
+            json.dump(config, f)
+        self.aggregator = EdgeAggregator('printer_config.json')
+        self.aggregator._start_server()
+        base = f"http://127.0.0.1:{self.aggregator.port}"
+        self.api = self.server.api_url.replace(self.server.url, base)
+        self.files = self.server.files_url.replace(self.server.url, base)
+
+    def stop(self):
+        if self.aggregator is not None:
+            self.aggregator.httpd.shutdown()
+            self.aggregator.httpd.server_close()
+            self.aggregator = None
+        stop_logging()
+
+    def download(self, name, token):
+        params = {'action': 'download_file', 'file': name}
+        if token:
+            params['printer_token'] = token
+        return requests.get(self.files, params=params, timeout=5)
+
+    def test_updates_and_actions_reach_the_server_in_one_batch(self):
+        for token in ('token-a', 'token-b'):
+            requests.post(self.api, json={'action': 'update_printer', 'token': token, 'status': 'idle'}, timeout=5)
+        reply = requests.post(self.api, json={'action': 'printer_event', 'token': 'token-a',
+                                              'event': {'type': 'x'}}, timeout=5)
+        self.assertEqual(reply.status_code, 200)
+        self.assertEqual(reply.json(), {'success': True, 'queued': True, 'message': 'Encolado'})
+
+        requests_before = self.server.requests
+        self.aggregator.flush()
+        self.assertEqual(self.server.requests - requests_before, 1)
+        self.assertEqual(self.server.batches, 1)
+        self.assertEqual(len(self.server.updates), 2)
+        self.assertEqual(self.server.events, [{'type': 'x'}])
+        self.assertEqual(self.aggregator.outbox, [])
+
+    def test_full_outbox_rejects_instead_of_dropping(self):
+        self.server.faults.down = True
+        statuses = [requests.post(self.api, json={'action': 'printer_event', 'token': 't', 'event': {'i': i}},
+                                  timeout=5).status_code for i in range(4)]
+        self.assertEqual(statuses, [200, 200, 200, 503])
+        self.aggregator.flush()
+        self.assertEqual(len(self.aggregator.outbox), 3)
+
+        self.server.faults.down = False
+        self.aggregator.flush()
+        self.assertEqual(self.server.events, [{'i': 0}, {'i': 1}, {'i': 2}])
+
+    def test_sync_jobs_passes_through(self):
+        self.server.faults.down = True
+        reply = requests.post(self.api, json={'action': 'sync_jobs', 'token': 't', 'jobs': []}, timeout=5)
+        self.assertEqual(reply.status_code, 502)
+        self.assertEqual(self.aggregator.outbox, [])
+
+    def test_cached_copy_only_for_authorized_tokens(self):
+        self.assertEqual(self.download('global.gcode', 'token-a').content, b'G28\n' * 100)
+        self.assertEqual(self.download('global.gcode', 'token-b').content, b'G28\n' * 100)
+        self.assertEqual(self.server.served, {'global.gcode': 1})
+
+        self.assertEqual(self.download('propio.gcode', 'token-a').content, b'G1 X1\n' * 100)
+        denied = self.download('propio.gcode', 'token-b').json()
+        self.assertEqual(denied['message'], 'No autorizado para descargar este archivo')
+        self.assertEqual(self.server.served['propio.gcode'], 1)
+        self.assertEqual(self.aggregator.file_locks, {})
+
+    def test_request_without_token_never_uses_the_cache(self):
+        self.download('global.gcode', 'token-a')
+        self.download('global.gcode', None)
+        self.assertEqual(self.server.served, {'global.gcode': 2})
+
+    def test_known_tokens_still_served_during_outage(self):
+        self.download('global.gcode', 'token-a')
+        self.aggregator.grants.clear()
+        self.aggregator._grant(('token-a', '/printer-api/files.php', 'global.gcode'))
+        self.aggregator.grant_ttl = 0
+        self.server.faults.down = True
+        self.assertEqual(self.download('global.gcode', 'token-a').status_code, 200)
+        self.assertIn('No autorizado', self.download('global.gcode', 'token-b').text)
+
+    def test_cache_entry_removed_under_the_lock_is_fetched_again(self):
+        self.download('global.gcode', 'token-a')
+        for path in self.aggregator.cache_dir.iterdir():
+            path.unlink()
+        self.assertEqual(self.download('global.gcode', 'token-a').content, b'G28\n' * 100)
+        self.assertEqual(self.server.served, {'global.gcode': 2})
+
+    def test_fetched_commands_survive_a_restart(self):
+        self.server.commands = [{'action': 'home'}]
+        self.aggregator._fetch_commands(['token-a'])
+        self.stop()
+        self.start()
+        reply = requests.get(self.api, params={'action': 'get_commands', 'token': 'token-a'}, timeout=5).json()
+        self.assertEqual(reply['commands'], [{'action': 'home'}])
+        self.stop()
+        self.start()
+        reply = requests.get(self.api, params={'action': 'get_commands', 'token': 'token-a'}, timeout=5).json()
+        self.assertEqual(reply['commands'], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
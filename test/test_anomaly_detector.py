@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Pruebas del detector de anomalías del cliente TecMedHub
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from klipper_client import DEFAULT_CONFIG, AnomalyDetector
+
+
+class AnomalyDetectorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.detector = AnomalyDetector(DEFAULT_CONFIG)
+        self.now = 0.0
+
+    def feed(self, temperature, target, heater='extruder', samples=1, step=0.0):
+        """Enviar muestras cada 1 s; devuelve los tipos de los eventos nuevos"""
+        events = []
+        for _ in range(samples):
+            self.now += 1
+            status = {heater: {'temperature': temperature, 'target': target}}
+            events += self.detector.observe(status, now=self.now)
+            temperature += step
+        return [event['type'] for event in events]
+
+    def active(self):
+        return sorted(f"{a['type']}:{a['source']}" for a in self.detector.active_anomalies())
+
+    def test_runaway_raises_clears_and_raises_again(self):
+        self.feed(200, 200, samples=5)
+        self.assertEqual(self.feed(215, 200, samples=5), ['thermal_runaway'])
+        self.assertEqual(self.active(), ['thermal_runaway:extruder'])
+
+        # De vuelta en el objetivo: el CUSUM baja del umbral y la anomalía sale
+        self.assertEqual(self.feed(200, 200, samples=20), [])
+        self.assertEqual(self.active(), [])
+
+        # Un segundo desvío se vuelve a informar
+        self.assertEqual(self.feed(215, 200, samples=5), ['thermal_runaway'])
+        self.assertEqual(self.active(), ['thermal_runaway:extruder'])
+
+    def test_target_change_clears_heater_anomalies(self):
+        heat_timeout = DEFAULT_CONFIG['anomaly_detection']['heat_timeout']['extruder']
+        self.assertEqual(self.feed(25, 200, samples=heat_timeout + 5), ['heater_not_reaching_target'])
+        self.assertEqual(self.active(), ['heater_not_reaching_target:extruder'])
+
+        self.feed(25, 0)
+        self.assertEqual(self.active(), [])
+
+    def test_reaching_target_clears_not_reaching(self):
+        heat_timeout = DEFAULT_CONFIG['anomaly_detection']['heat_timeout']['extruder']
+        self.feed(25, 200, samples=heat_timeout + 5)
+        self.feed(199, 200)
+        self.assertEqual(self.active(), [])
+
+    def test_heating_while_off_raises_clears_and_raises_again(self):
+        self.assertEqual(self.feed(60, 0, samples=10, step=1.0), ['thermal_runaway'])
+        self.assertEqual(self.active(), ['thermal_runaway:extruder'])
+
+        self.assertEqual(self.feed(70, 0, samples=10, step=-0.5), [])
+        self.assertEqual(self.active(), [])
+
+        self.assertEqual(self.feed(65, 0, samples=10, step=1.0), ['thermal_runaway'])
+
+    def test_heaters_are_independent(self):
+        self.feed(200, 200, samples=5)
+        self.feed(215, 200, samples=5)
+        self.feed(60, 60, heater='heater_bed', samples=5)
+        self.assertEqual(self.active(), ['thermal_runaway:extruder'])
+
+    def test_filament_out_clears_when_detected(self):
+        sensor = 'filament_switch_sensor runout'
+        status = {'print_stats': {'state': 'printing'}, sensor: {'filament_detected': False}}
+        self.assertEqual([e['type'] for e in self.detector.observe(status, now=1)], ['filament_out'])
+        status[sensor]['filament_detected'] = True
+        self.detector.observe(status, now=2)
+        self.assertEqual(self.active(), [])
+
+    def test_progress_stall_raises_and_clears_when_progress_moves(self):
+        stall = DEFAULT_CONFIG['anomaly_detection']['progress_stall_seconds']
+        status = {'print_stats': {'state': 'printing'}, 'display_status': {'progress': 0.25}}
+        self.assertEqual(self.detector.observe(status, now=0), [])
+        self.assertEqual(self.detector.observe(status, now=stall), [])
+        self.assertEqual([e['type'] for e in self.detector.observe(status, now=stall + 1)], ['progress_stall'])
+        self.assertEqual(self.detector.observe(status, now=stall + 2), [])  # Una sola vez
+
+        status['display_status']['progress'] = 0.26
+        self.detector.observe(status, now=stall + 3)
+        self.assertEqual(self.active(), [])
+
+    def test_paused_print_is_not_a_stall(self):
+        status = {'print_stats': {'state': 'paused'}, 'display_status': {'progress': 0.25}}
+        for now in (0, 5000, 10000):
+            self.assertEqual(self.detector.observe(status, now=now), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la elección de perfil de cámara del cliente TecMedHub
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import copy
+import logging
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from klipper_client import DEFAULT_CONFIG, CameraManager
+
+
+class CameraProfileTest(unittest.TestCase):
+
+    def setUp(self):
+        self.config = copy.deepcopy(DEFAULT_CONFIG)
+        self.camera = CameraManager(self.config, logging.getLogger('test'), None)
+
+    def test_without_hint_streams_the_original(self):
+        self.assertEqual(self.camera.current_profile(), ('high', None))
+
+    def test_hint_for_another_profile_transcodes(self):
+        self.camera.apply_hint({'profile': 'low', 'ttl': 30})
+        self.assertEqual(self.camera.current_profile(), ('low', self.config['camera']['profiles']['low']))
+
+    def test_hint_for_the_configured_profile_streams(self):
+        self.camera.apply_hint({'profile': 'high', 'ttl': 30})
+        self.assertEqual(self.camera.current_profile(), ('high', None))
+
+    def test_no_viewers_uses_the_idle_profile(self):
+        self.camera.apply_hint({'viewers': 0, 'ttl': 30})
+        self.assertEqual(self.camera.current_profile()[0], 'thumbnail')
+        self.assertIsNotNone(self.camera.current_profile()[1])
+
+    def test_viewers_without_profile_streams(self):
+        self.camera.apply_hint({'viewers': 2, 'ttl': 30})
+        self.assertEqual(self.camera.current_profile(), ('high', None))
+
+    def test_expired_hint_streams(self):
+        self.camera.apply_hint({'profile': 'low', 'ttl': -1})
+        self.assertEqual(self.camera.current_profile(), ('high', None))
+
+
+if __name__ == "__main__":
+    unittest.main()
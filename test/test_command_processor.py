@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Pruebas del procesador de comandos del cliente TecMedHub (contra un
+Moonraker falso)
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import copy
+import logging
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from fake_services import FakeMoonraker
+from klipper_client import (DEFAULT_CONFIG, CommandProcessor, FileManager,
+                            MoonrakerInterface, RobustHTTPClient)
+
+
+class CommandProcessorTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.moonraker = FakeMoonraker().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.moonraker.stop()
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.moonraker.gcode_scripts.clear()
+        self.processor = self.build()
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def build(self, **overrides):
+        config = copy.deepcopy(DEFAULT_CONFIG)
+        config['moonraker_url'] = self.moonraker.url
+        config['retries'] = {'max_attempts': 1, 'base_delay': 0.01, 'exponential_backoff': False}
+        config['file_management']['gcode_directory'] = self.workdir.name
+        for section, values in overrides.items():
+            config[section].update(values)
+        logger = logging.getLogger('test')
+        http = RobustHTTPClient(config, logger)
+        return CommandProcessor(config, logger, MoonrakerInterface(config, logger, http),
+                                FileManager(config, logger, http))
+
+    def test_commands_of_one_poll_go_in_one_script(self):
+        results = self.processor.process_commands([
+            {'action': 'home'},
+            {'action': 'heat', 'hotend_temp': 210, 'bed_temp': 60},
+            {'action': 'set_speed', 'speed': 120}
+        ])
+        self.assertEqual(results, [True, True, True])
+        self.assertEqual(self.moonraker.gcode_scripts, ["G28\nM104 S210\nM140 S60\nM220 S120"])
+
+    def test_rate_limit_applies_once_per_poll(self):
+        self.processor.process_commands([{'action': 'home'}, {'action': 'cool_down'}])
+        self.assertEqual(self.processor.process_commands([{'action': 'home'}]), [False])
+        self.assertEqual(len(self.moonraker.gcode_scripts), 1)
+
+    def test_failed_script_fails_every_command_once(self):
+        self.moonraker.gcode_error = "Must home axis first"
+        try:
+            results = self.processor.process_commands([{'action': 'home'}, {'action': 'fan_off'}])
+        finally:
+            self.moonraker.gcode_error = None
+        self.assertEqual(results, [False, False])
+        self.assertEqual(self.moonraker.gcode_scripts, ["G28\nM107"])  # Sin reintentos ni reenvío por comando
+
+    def test_urgent_commands_run_first_and_keep_server_order(self):
+        self.moonraker.print_state = 'printing'
+        self.processor.process_commands([
+            {'action': 'heat', 'hotend_temp': 200, 'bed_temp': 50},
+            {'action': 'pause'},
+            {'action': 'cool_down'}
+        ])
+        self.assertEqual(self.moonraker.gcode_scripts, ["M104 S200\nM140 S50\nM104 S0\nM140 S0"])
+
+    def test_speed_and_flow_ranges(self):
+        processor = self.build(gcode_batch={'enabled': False}, security={'rate_limit_seconds': 0})
+        results = processor.process_commands([
+            {'action': 'set_speed', 'speed': 10},
+            {'action': 'set_speed', 'speed': 200},
+            {'action': 'set_speed', 'speed': 9},
+            {'action': 'set_flow', 'flow': 60}
+        ])
+        self.assertEqual(results, [True, True, False, True])
+        self.assertEqual(self.moonraker.gcode_scripts, ["M220 S10", "M220 S200", "M221 S60"])
+
+    def test_invalid_command_does_not_block_the_rest(self):
+        results = self.processor.process_commands([
+            {'action': 'heat', 'hotend_temp': 999},
+            {'action': 'home'}
+        ])
+        self.assertEqual(results, [False, True])
+        self.assertEqual(self.moonraker.gcode_scripts, ["G28"])
+
+    def test_batching_disabled_still_limits_per_poll(self):
+        processor = self.build(gcode_batch={'enabled': False})
+        self.assertEqual(processor.process_commands([{'action': 'home'}, {'action': 'fan_off'}]), [True, True])
+        self.assertEqual(self.moonraker.gcode_scripts, ["G28", "M107"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la recarga de configuración en caliente del cliente TecMedHub
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import copy
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from klipper_client import DEFAULT_CONFIG, ConfigManager, ConfigWatcher, PrinterClient, stop_logging
+
+
+def write_config(path, config):
+    """Escribir como lo hace un editor: archivo nuevo y rename"""
+    with open(path + '.tmp', 'w') as f:
+        json.dump(config, f)
+    os.replace(path + '.tmp', path)
+
+
+class ConfigManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.workdir.name, 'printer_config.json')
+        self.config = {'server_url': 'http://s', 'printer_token': 't', 'printer_name': 'p',
+                       'moonraker_url': 'http://m'}
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def read(self):
+        write_config(self.path, self.config)
+        return ConfigManager(self.path).config
+
+    def test_missing_sections_come_from_defaults(self):
+        self.config['intervals'] = {'status_update': 7}
+        config = self.read()
+        self.assertEqual(config['intervals']['status_update'], 7)
+        self.assertEqual(config['intervals']['command_check'], DEFAULT_CONFIG['intervals']['command_check'])
+
+    def test_invalid_values_are_rejected(self):
+        manager = ConfigManager.__new__(ConfigManager)
+        manager.config_path = self.path
+        for section, values in [('intervals', {'status_update': 0}),
+                                ('logging', {'level': 'VERBOSE'}),
+                                ('security', {'allowed_gcode_patterns': ['re:G1 (']}),
+                                ('scheduler', {'jitter': 2})]:
+            config = copy.deepcopy(self.config)
+            config[section] = values
+            write_config(self.path, config)
+            with self.assertRaises(Exception, msg=section):
+                manager.read_config()
+
+
+class ConfigWatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.workdir.name, 'printer_config.json')
+        write_config(self.path, {'v': 1})
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def check(self, watcher):
+        self.assertFalse(watcher.has_changed())
+        write_config(self.path, {'v': 2, 'mas': 'largo'})
+        self.assertTrue(watcher.has_changed())
+        self.assertFalse(watcher.has_changed())
+
+        # Otros archivos del directorio no cuentan
+        write_config(os.path.join(self.workdir.name, 'otro.json'), {})
+        self.assertFalse(watcher.has_changed())
+        watcher.close()
+
+    def test_inotify(self):
+        watcher = ConfigWatcher(self.path)
+        if watcher.mode != 'inotify':
+            self.skipTest("inotify no disponible")
+        self.check(watcher)
+
+    def test_polling(self):
+        watcher = ConfigWatcher(self.path, poll_interval=0)
+        watcher.close()  # Sin inotify: compara la firma en cada consulta
+        self.check(watcher)
+
+
+class PrinterClientReloadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.TemporaryDirectory()
+        os.chdir(self.workdir.name)
+        self.config = copy.deepcopy(DEFAULT_CONFIG)
+        self.config['logging']['level'] = 'WARNING'
+        self.config['camera']['enabled'] = False
+        self.config['telemetry']['enabled'] = False
+        self.config['config_reload']['poll_interval'] = 0
+        write_config('printer_config.json', self.config)
+        self.client = PrinterClient('printer_config.json')
+        self.client.config_watcher.close()  # Polling: no depende de cuándo llegan los eventos
+
+    def tearDown(self):
+        self.client.shutdown()
+        stop_logging()
+        os.chdir(self.cwd)
+        self.workdir.cleanup()
+
+    def reload(self, config):
+        time.sleep(0.01)  # mtime distinto aunque el tamaño coincida
+        write_config('printer_config.json', config)
+        self.client.check_config_reload()
+
+    def test_new_values_reach_the_components(self):
+        self.config['intervals']['status_update'] = 11
+        self.config['security']['rate_limit_seconds'] = 9
+        self.config['logging']['level'] = 'ERROR'
+        self.reload(self.config)
+        self.assertEqual(self.client.config['intervals']['status_update'], 11)
+        self.assertEqual(self.client.command_processor.config['security']['rate_limit_seconds'], 9)
+        self.assertEqual(self.client.logger.level, 40)
+
+    def test_invalid_file_keeps_the_current_config(self):
+        previous = self.client.config
+        with self.assertLogs(self.client.logger, 'ERROR'):
+            self.reload({'server_url': 'x'})
+        self.assertIs(self.client.config, previous)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Pruebas del límite de velocidad y prioridad de las descargas del cliente
+TecMedHub (contra el servidor falso)
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import copy
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from fake_services import FakeServer
+from klipper_client import DEFAULT_CONFIG, FileManager, RobustHTTPClient, TokenBucket
+
+DATA = os.urandom(512 * 1024)
+
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_unlimited_never_sleeps(self):
+        bucket = TokenBucket(0)
+        self.assertEqual(sum(bucket.consume(1024 * 1024) for _ in range(10)), 0)
+
+    def test_rate_after_the_burst(self):
+        bucket = TokenBucket(rate=10 * 1024 * 1024, burst=64 * 1024)
+        started = time.monotonic()
+        slept = sum(bucket.consume(64 * 1024) for _ in range(16))  # 1 MB a 10 MB/s, el primer bloque es ráfaga
+        elapsed = time.monotonic() - started
+        self.assertAlmostEqual(slept, 15 / 160, delta=0.01)
+        self.assertGreaterEqual(elapsed, slept)
+        self.assertLess(elapsed, 0.5)
+
+
+class ThrottledDownloadTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = FakeServer().start()
+        cls.server.downloads['pieza.gcode'] = DATA
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.config = copy.deepcopy(DEFAULT_CONFIG)
+        self.config['retries'] = {'max_attempts': 1, 'base_delay': 0.01, 'exponential_backoff': False}
+        self.config['file_management']['gcode_directory'] = self.workdir.name
+        self.config['gcode_cache']['index_file'] = os.path.join(self.workdir.name, 'gcode_cache.json')
+        self.config['download_throttle'].update(printing_rate_kb=1024, burst_kb=64)
+        logger = logging.getLogger('test')
+        self.file_manager = FileManager(self.config, logger, RobustHTTPClient(self.config, logger))
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def download(self):
+        started = time.monotonic()
+        success, error = self.file_manager.download_file(
+            'pieza.gcode', f"{self.server.files_url}?action=download_file&file=pieza.gcode",
+            hashlib.md5(DATA).hexdigest()
+        )
+        self.assertTrue(success, error)
+        return time.monotonic() - started
+
+    def test_printing_limits_the_rate_and_idle_does_not(self):
+        self.file_manager.is_printing = lambda: True
+        printing = self.download()
+        os.remove(os.path.join(self.workdir.name, 'pieza.gcode'))
+        self.file_manager.is_printing = lambda: False
+        idle = self.download()
+
+        self.assertGreaterEqual(printing, 0.4)  # 512 KB a 1 MB/s, menos la ráfaga
+        self.assertLess(idle, printing / 2)
+
+    def test_rate_is_rechecked_during_the_download(self):
+        checks = []
+        self.file_manager.is_printing = lambda: checks.append(1) or len(checks) <= 2  # La impresión termina
+        self.assertLess(self.download(), 0.3)
+        self.assertGreater(len(checks), 2)
+
+    def test_periodic_datasync(self):
+        self.config['download_throttle']['sync_every_mb'] = 0.125
+        self.file_manager.apply_config(self.config)
+        with mock.patch('os.fdatasync', wraps=os.fdatasync) as datasync:
+            self.download()
+        self.assertEqual(datasync.call_count, 4 + 1)  # Cada 128 KB y al final
+
+    def test_download_thread_runs_with_lower_priority(self):
+        seen = {}
+
+        def is_printing():
+            seen['thread'] = threading.current_thread().name
+            seen['nice'] = os.getpriority(os.PRIO_PROCESS, threading.get_native_id())
+            return False
+
+        self.file_manager.is_printing = is_printing
+        self.download()
+        self.assertEqual(seen['thread'], 'download')
+        self.assertEqual(seen['nice'], min(os.getpriority(os.PRIO_PROCESS, 0) + 10, 19))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la estimación de tiempo restante del cliente TecMedHub
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from klipper_client import DEFAULT_CONFIG, EtaEstimator
+
+
+def status(progress, duration, state='printing', filename='pieza.gcode'):
+    return {'print_stats': {'state': state, 'filename': filename, 'print_duration': duration},
+            'virtual_sdcard': {'progress': progress}}
+
+
+class EtaEstimatorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.metadata = {}
+        self.eta = EtaEstimator(DEFAULT_CONFIG, lambda name: self.metadata.get(name))
+
+    def test_constant_rate_without_slicer_estimate(self):
+        for second in range(0, 501, 10):
+            remaining = self.eta.observe(status(second / 1000, second))
+        self.assertAlmostEqual(remaining, 500, delta=1)
+
+    def test_heat_up_does_not_slow_the_rate(self):
+        # 300 s de precalentado con el archivo quieto; después 0.1%/s
+        for second in range(0, 300, 10):
+            self.eta.observe(status(0.0, second))
+        for second in range(300, 801, 10):
+            remaining = self.eta.observe(status((second - 300) / 1000, second))
+        self.assertAlmostEqual(remaining, 500, delta=1)
+        # Restar la duración total daría (800 / 0.5) - 800 = 800 s
+
+    def test_slicer_estimate_first_then_observed_rate(self):
+        self.metadata['pieza.gcode'] = {'estimated_time': 3600}
+        self.assertEqual(self.eta.observe(status(0.0, 0)), 3600)
+
+        # El slicer se equivocó: la pieza avanza el doble de rápido
+        for second in range(0, 1001, 10):
+            remaining = self.eta.observe(status(second / 1800, second))
+        progress = 1000 / 1800
+        self.assertAlmostEqual(remaining, (1 - progress) * 1800, delta=5)
+
+    def test_pause_keeps_the_estimate_and_stop_resets(self):
+        for second in range(0, 101, 10):
+            remaining = self.eta.observe(status(second / 1000, second))
+        self.assertEqual(self.eta.observe(status(0.1, 100, state='paused')), remaining)
+        self.assertIsNone(self.eta.observe(status(0.1, 100, state='standby')))
+        self.assertIsNone(self.eta.filename)
+
+    def test_new_file_starts_from_scratch(self):
+        for second in range(0, 101, 10):
+            self.eta.observe(status(second / 1000, second))
+        self.metadata['otra.gcode'] = {'estimated_time': 120}
+        self.assertEqual(self.eta.observe(status(0.0, 0, filename='otra.gcode')), 120)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la caché de G-code con cuota de disco del cliente TecMedHub
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import copy
+import logging
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from klipper_client import DEFAULT_CONFIG, GcodeCache
+
+FILE_SIZE = 2000
+QUOTA = 5 * FILE_SIZE  # Cinco archivos; low_water 0.8 = cuatro
+
+
+class GcodeCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.gcode_dir = Path(self.workdir.name, 'gcodes')
+        self.gcode_dir.mkdir()
+        self.config = copy.deepcopy(DEFAULT_CONFIG)
+        self.config['gcode_cache'].update(quota_mb=QUOTA / 1024 / 1024,
+                                          index_file=os.path.join(self.workdir.name, 'gcode_cache.json'))
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def write(self, name, size=FILE_SIZE):
+        (self.gcode_dir / name).write_bytes(b'G1\n' * (size // 3) + b'\n' * (size % 3))
+
+    def build(self, names=(), **cache_config):
+        """Caché con 'names' ya en disco; last_used 1, 2, 3... en ese orden"""
+        for name in names:
+            self.write(name)
+        self.config['gcode_cache'].update(cache_config)
+        cache = GcodeCache(self.config, logging.getLogger('test'), self.gcode_dir)
+        for i, name in enumerate(names):
+            cache.entries[name]['last_used'] = i + 1
+        return cache
+
+    def on_disk(self):
+        return sorted(path.name for path in self.gcode_dir.iterdir())
+
+    def test_lru_evicts_the_least_recently_used_down_to_low_water(self):
+        cache = self.build(['a.gcode', 'b.gcode', 'c.gcode', 'd.gcode', 'e.gcode'])
+        cache.touch('a.gcode')  # Recién usado: pasa a ser el más reciente
+        self.write('f.gcode')
+        cache.add('f.gcode')
+
+        self.assertEqual(self.on_disk(), ['a.gcode', 'd.gcode', 'e.gcode', 'f.gcode'])
+        self.assertEqual(cache.total, 4 * FILE_SIZE)
+        self.assertEqual(sorted(cache.entries), self.on_disk())
+
+    def test_lfu_keeps_the_most_printed(self):
+        cache = self.build(['a.gcode', 'b.gcode', 'c.gcode', 'd.gcode', 'e.gcode'], policy='lfu')
+        for name, prints in (('a.gcode', 5), ('b.gcode', 1), ('c.gcode', 3), ('e.gcode', 2)):
+            for _ in range(prints):
+                cache.touch(name, count=True)
+        self.write('f.gcode')
+        cache.add('f.gcode')
+        self.assertEqual(self.on_disk(), ['a.gcode', 'c.gcode', 'e.gcode', 'f.gcode'])
+
+    def test_active_assigned_and_pinned_files_are_never_evicted(self):
+        cache = self.build(['calibracion_cubo.gcode', 'activo.gcode', 'asignado.gcode', 'd.gcode', 'e.gcode'],
+                           pinned=['calibracion_*.gcode'])
+        cache.set_active('/home/pi/printer_data/gcodes/activo.gcode')
+        cache.set_assigned(['asignado.gcode'])
+        self.write('f.gcode')
+        cache.add('f.gcode')
+        self.assertEqual(self.on_disk(), ['activo.gcode', 'asignado.gcode', 'calibracion_cubo.gcode', 'f.gcode'])
+
+    def test_make_room_refuses_what_cannot_fit(self):
+        cache = self.build(['a.gcode', 'b.gcode', 'c.gcode'])
+        self.assertTrue(cache.make_room(FILE_SIZE))
+        self.assertEqual(len(self.on_disk()), 3)  # Cabe sin borrar nada
+
+        self.assertTrue(cache.make_room(3 * FILE_SIZE))  # Borra hasta dejar lugar bajo low_water
+        self.assertEqual(self.on_disk(), ['c.gcode'])
+
+        cache.set_assigned(['c.gcode'])
+        self.assertFalse(cache.make_room(5 * FILE_SIZE))
+        self.assertEqual(self.on_disk(), ['c.gcode'])
+
+    def test_index_does_not_rescan_the_disk(self):
+        cache = self.build(['a.gcode'])
+        self.write('subido_por_mainsail.gcode')
+        self.assertNotIn('subido_por_mainsail.gcode', cache.entries)
+        cache.maybe_rescan()  # Aún no pasó rescan_interval
+        self.assertNotIn('subido_por_mainsail.gcode', cache.entries)
+
+        cache.rescan_interval = 0
+        cache.maybe_rescan()
+        self.assertIn('subido_por_mainsail.gcode', cache.entries)
+        self.assertEqual(cache.total, 2 * FILE_SIZE)
+
+    def test_usage_and_checksums_survive_a_restart(self):
+        cache = self.build(['a.gcode', 'b.gcode'])
+        cache.touch('a.gcode', count=True)
+        cache.set_md5('a.gcode', 'aaaa', cache.entries['a.gcode']['mtime'])
+        cache.set_md5('b.gcode', 'bbbb', cache.entries['b.gcode']['mtime'])
+        self.assertTrue(cache.flush())
+
+        self.write('b.gcode', size=FILE_SIZE + 1)  # Cambió en disco mientras el cliente no corría
+        cache = GcodeCache(self.config, logging.getLogger('test'), self.gcode_dir)
+        self.assertEqual(cache.entries['a.gcode']['uses'], 1)
+        self.assertEqual(cache.hashes(), {'aaaa': 'a.gcode'})
+
+
+if __name__ == "__main__":
+    unittest.main()
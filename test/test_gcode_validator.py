@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Pruebas del validador de G-code del cliente TecMedHub
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from klipper_client import DEFAULT_CONFIG, GcodeValidator
+
+
+class GcodeValidatorTest(unittest.TestCase):
+
+    def setUp(self):
+        security = DEFAULT_CONFIG['security']
+        self.validator = GcodeValidator(security['allowed_gcode_patterns'], security['gcode_limits'])
+
+    def assertRejected(self, lines, fragment, whitelist=True):
+        error = self.validator.validate(lines, whitelist=whitelist)
+        self.assertIsNotNone(error, f"{lines!r} debería rechazarse")
+        self.assertIn(fragment, error)
+
+    def assertAccepted(self, lines, whitelist=True):
+        self.assertIsNone(self.validator.validate(lines, whitelist=whitelist))
+
+    def test_accepts_allowed_codes_within_limits(self):
+        self.assertAccepted(["G28", "G1 X10 Y10 F3000", "M104 S210", "M140 S60", "M106 S255", "T0"])
+
+    def test_rejects_codes_outside_whitelist(self):
+        self.assertRejected(["G28", "FIRMWARE_RESTART"], "línea 2: G-code no permitido: FIRMWARE_RESTART")
+
+    def test_limits_with_space(self):
+        self.assertRejected(["M104 S999"], "M104 S=999 fuera de rango")
+
+    def test_limits_without_space(self):
+        # Klipper interpreta M104S999 como M104 con S=999
+        self.assertRejected(["M104S999"], "M104 S=999 fuera de rango")
+        self.assertRejected(["m140s150"], "M140 S=150 fuera de rango")
+
+    def test_space_between_parameter_and_value(self):
+        self.assertRejected(["M109 S 999"], "M109 S=999 fuera de rango")
+        self.assertAccepted(["M109 S 200"])
+
+    def test_line_number_prefix(self):
+        self.assertRejected(["N10 M104 S999"], "M104 S=999")
+        self.assertAccepted(["N10 M104 S200", "N10"])
+
+    def test_last_repeated_parameter_wins(self):
+        self.assertRejected(["M104 S100 S999"], "S=999")
+
+    def test_hash_is_not_a_comment_for_traditional_gcode(self):
+        self.assertRejected(["M104 S100 # S999"], "S=999")
+        self.assertRejected(["# M104 S999"], "S=999")
+
+    def test_semicolon_comments_are_ignored(self):
+        self.assertAccepted(["M104 S100 ; S999", "; M104 S999", "", "   "])
+
+    def test_non_numeric_value(self):
+        self.assertRejected(["M104 S=999"], "no numérico")
+
+    def test_extended_command_limits(self):
+        self.assertRejected(["SET_HEATER_TEMPERATURE HEATER=extruder TARGET=999"],
+                            "TARGET=999 fuera de rango", whitelist=False)
+        self.assertRejected(["SET_HEATER_TEMPERATURE HEATER=extruder TARGET='999'"],
+                            "TARGET=999 fuera de rango", whitelist=False)
+        self.assertAccepted(["SET_HEATER_TEMPERATURE HEATER=extruder TARGET=200 # TARGET=999"], whitelist=False)
+        self.assertRejected(["SET_HEATER_TEMPERATURE HEATER='extruder"], "ilegibles", whitelist=False)
+
+    def test_error_reports_line_number(self):
+        self.assertRejected(["G28", "", "; purga", "G1 X1", "M104S999"], "línea 5:")
+
+    def test_whitelist_disabled_still_checks_limits(self):
+        self.assertAccepted(["PURGE_LINE"], whitelist=False)
+        self.assertRejected(["PURGE_LINE", "M140 S200"], "línea 2: M140 S=200", whitelist=False)
+
+    def test_regex_patterns(self):
+        validator = GcodeValidator(["re:G[01]", "M10[4-6]"])
+        self.assertIsNone(validator.validate(["G1 X1", "M106 S1"]))
+        self.assertIn("G28", validator.validate(["G28"]))
+
+    def test_cached_decisions_are_stable(self):
+        for _ in range(3):
+            self.assertAccepted(["M104 S200"])
+            self.assertRejected(["M104 S400"], "S=400")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Pruebas del registro de trabajos de impresión del cliente TecMedHub
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import copy
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from fake_services import FakeServer
+from klipper_client import DEFAULT_CONFIG, JobStore, JobTracker, PrinterClient, stop_logging
+
+
+def status(state, filename='pieza.gcode', temperature=25.0, target=0, print_duration=0, total_duration=0,
+           filament_used=0):
+    return {
+        'print_stats': {'state': state, 'filename': filename, 'print_duration': print_duration,
+                        'total_duration': total_duration, 'filament_used': filament_used},
+        'extruder': {'temperature': temperature, 'target': target},
+        'temperature_fan chamber': {'temperature': 40.0, 'target': 30}  # Objetivo de enfriamiento
+    }
+
+
+class JobTrackerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.store = JobStore(os.path.join(self.workdir.name, 'print_jobs.jsonl'))
+        self.started = []
+        self.tracker = JobTracker(self.store, lambda name: {'estimated_time': 3600}, self.started.append)
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_full_lifecycle(self):
+        t = 1_700_000_000
+        self.assertIsNone(self.tracker.observe(status('standby'), now=t))
+        self.tracker.observe(status('printing', temperature=25, target=210), now=t + 1)
+        self.assertEqual(self.started, ['pieza.gcode'])
+        self.tracker.observe(status('printing', temperature=208, target=210, print_duration=60), now=t + 61)
+        self.tracker.observe(status('paused', temperature=208, target=210, print_duration=100), now=t + 100)
+        self.tracker.observe(status('paused', temperature=208, target=210, print_duration=100), now=t + 130)
+        self.tracker.observe(status('printing', temperature=208, target=210, print_duration=100), now=t + 150)
+        record = self.tracker.observe(status('complete', print_duration=500, filament_used=1234.56), now=t + 601)
+
+        self.assertEqual(record['state'], 'complete')
+        self.assertEqual(record['id'], 1)
+        self.assertTrue(record['tracked_from_start'])
+        self.assertEqual(record['heat_up_time'], 60)
+        self.assertEqual(record['pauses'], 1)
+        self.assertEqual(record['paused_time'], 50)
+        self.assertEqual(record['duration'], 600)
+        self.assertEqual(record['print_duration'], 500)
+        self.assertEqual(record['filament_used'], 1234.6)
+        self.assertEqual(record['estimated_time'], 3600)
+        self.assertNotIn('_started', record)
+        self.assertEqual(self.tracker.last_completed()[:12], 'pieza.gcode ')
+
+    def test_client_started_mid_print(self):
+        t = 1_700_000_000
+        self.tracker.observe(status('printing', temperature=210, target=210, total_duration=1000), now=t)
+        record = self.tracker.observe(status('complete'), now=t + 100)
+        self.assertFalse(record['tracked_from_start'])
+        self.assertIsNone(record['heat_up_time'])
+        self.assertEqual(record['duration'], 1100)
+        self.assertEqual(self.started, [])  # No se avisa un inicio que no se vio
+
+    def test_other_file_or_standby_interrupts(self):
+        t = 1_700_000_000
+        self.tracker.observe(status('standby'), now=t)
+        self.tracker.observe(status('printing'), now=t + 1)
+        record = self.tracker.observe(status('printing', filename='otra.gcode'), now=t + 2)
+        self.assertEqual((record['filename'], record['state']), ('pieza.gcode', 'interrupted'))
+
+        record = self.tracker.observe(status('standby', filename='otra.gcode'), now=t + 3)
+        self.assertEqual((record['filename'], record['state']), ('otra.gcode', 'interrupted'))
+
+
+class JobStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.workdir.name, 'print_jobs.jsonl')
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_ids_and_cursor_survive_a_restart(self):
+        store = JobStore(self.path)
+        for i in range(3):
+            store.append({'filename': f'{i}.gcode'})
+        with open(self.path, 'a') as f:
+            f.write('{"id": 4, "filename": "cort')  # Línea cortada por un corte de luz
+
+        store = JobStore(self.path)
+        self.assertEqual(store.last_id, 3)
+        self.assertEqual([r['id'] for r in store.read_after(1, 10)], [2, 3])
+        self.assertEqual(store.read_after(3, 10), [])
+
+    def test_compaction_keeps_recent_and_unsynced(self):
+        store = JobStore(self.path, max_entries=2)
+        for i in range(4):
+            store.append({'filename': f'{i}.gcode'}, synced_id=0)
+        store.append({'filename': '4.gcode'}, synced_id=1)  # Supera 2 * max_entries: compacta
+
+        self.assertEqual([r['id'] for r in store.read_after(0, 10)], [2, 3, 4, 5])
+        self.assertEqual(store.count, 4)
+        self.assertEqual(os.listdir(self.workdir.name), ['print_jobs.jsonl'])
+
+
+class JobSyncTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.TemporaryDirectory()
+        os.chdir(self.workdir.name)
+        self.server = FakeServer().start()
+        config = copy.deepcopy(DEFAULT_CONFIG)
+        config['server_url'] = self.server.api_url
+        config['retries'] = {'max_attempts': 1, 'base_delay': 0.01, 'exponential_backoff': False}
+        config['logging']['level'] = 'WARNING'
+        config['telemetry']['enabled'] = False
+        config['jobs']['sync_batch'] = 2
+        with open('printer_config.json', 'w') as f:
+            json.dump(config, f)
+        self.client = PrinterClient('printer_config.json')
+        for i in range(3):
+            self.client.job_tracker.store.append({'filename': f'{i}.gcode'})
+
+    def tearDown(self):
+        self.client.shutdown()
+        stop_logging()
+        self.server.stop()
+        os.chdir(self.cwd)
+        self.workdir.cleanup()
+
+    def test_jobs_are_sent_in_batches_from_the_cursor(self):
+        self.assertTrue(self.client.sync_jobs())
+        self.assertTrue(self.client.sync_jobs())
+        self.assertTrue(self.client.sync_jobs())
+        self.assertEqual([job['id'] for job in self.server.jobs], [1, 2, 3])
+        self.assertEqual(self.client.state_manager.state['jobs_synced'], 3)
+
+    def test_cursor_stays_while_the_server_is_down(self):
+        self.server.faults.down = True
+        self.assertFalse(self.client.sync_jobs())
+        self.server.faults.down = False
+        self.assertEqual(self.client.state_manager.state.get('jobs_synced', 0), 0)
+        self.client.sync_jobs()
+        self.assertEqual([job['id'] for job in self.server.jobs], [1, 2])
+
+
+if __name__ == "__main__":
+    unittest.main()
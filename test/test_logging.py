@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la cola de logging del cliente TecMedHub
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import copy
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from queue import Queue
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from klipper_client import (AUDIT, DEFAULT_CONFIG, BoundedQueueHandler, JsonLinesFormatter, RateLimitFilter,
+                            setup_logging, stop_logging)
+
+
+def record(msg, created, level=logging.INFO, lineno=10, **extra):
+    entry = logging.LogRecord('TecMedHub', level, '/client/tecmedhub/client.py', lineno, msg, None, None)
+    entry.created = created
+    entry.__dict__.update(extra)
+    return entry
+
+
+class RateLimitFilterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.filter = RateLimitFilter(window=60, burst=5)
+
+    def passed(self, records):
+        return [r.getMessage() for r in records if self.filter.filter(r)]
+
+    def test_burst_per_call_site_then_summary(self):
+        self.assertEqual(self.passed([record(f"reintento {i}", 100 + i) for i in range(20)]),
+                         [f"reintento {i}" for i in range(5)])
+        self.assertEqual(self.passed([record("otra línea", 130, lineno=20)]), ["otra línea"])
+
+        summary = record("reintento 20", 161)  # Ventana nueva
+        self.assertEqual(self.passed([summary]), ["reintento 20 (+15 similares suprimidos)"])
+        self.assertEqual(summary.suppressed, 15)
+
+    def test_identical_repeats_are_dropped_within_the_burst(self):
+        self.assertEqual(self.passed([record("Moonraker caído", 100 + i) for i in range(3)]), ["Moonraker caído"])
+
+    def test_warnings_and_audit_always_pass(self):
+        warnings = [record("Error de conexión", 100 + i, level=logging.WARNING) for i in range(10)]
+        audit = [record("Comando home", 100 + i, lineno=30, **AUDIT) for i in range(10)]
+        self.assertEqual(len(self.passed(warnings + audit)), 20)
+
+    def test_json_lines_carry_the_counters(self):
+        entry = record("reintento", 1700000000.12345, suppressed=15, dropped=2)
+        self.assertEqual(json.loads(JsonLinesFormatter().format(entry)), {
+            'ts': 1700000000.123, 'level': 'INFO', 'logger': 'TecMedHub', 'msg': 'reintento',
+            'src': 'client:10', 'suppressed': 15, 'dropped': 2
+        })
+
+
+class BoundedQueueHandlerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.queue = Queue(maxsize=2)
+        self.handler = BoundedQueueHandler(self.queue)
+        self.logger = logging.getLogger('test.bounded_queue')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+
+    def drain(self):
+        messages = []
+        while not self.queue.empty():
+            messages.append(self.queue.get_nowait().getMessage())
+        return messages
+
+    def test_info_overflow_is_dropped_and_reported(self):
+        for i in range(5):
+            self.logger.info("registro %d", i)
+        self.assertEqual(self.drain(), ["registro 0", "registro 1"])
+        self.assertEqual(self.handler.dropped, 3)
+
+        self.logger.info("siguiente")
+        record = self.queue.get_nowait()
+        self.assertEqual(record.getMessage(), "siguiente (+3 registros descartados por cola llena)")
+        self.assertEqual(record.dropped, 3)
+        self.assertEqual(self.handler.dropped, 0)
+
+    def test_warnings_and_audit_wait_for_room(self):
+        self.logger.info("a")
+        self.logger.info("b")
+        consumed = []
+
+        def consume():
+            while len(consumed) < 4:
+                consumed.append(self.queue.get(timeout=5).getMessage())
+
+        reader = threading.Thread(target=consume)
+        reader.start()
+        self.logger.warning("aviso")
+        self.logger.info("comando", extra=AUDIT)
+        reader.join(timeout=5)
+        self.assertEqual(consumed, ["a", "b", "aviso", "comando"])
+        self.assertEqual(self.handler.dropped, 0)
+
+
+class SetupLoggingTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.TemporaryDirectory()
+        os.chdir(self.workdir.name)
+        self.config = copy.deepcopy(DEFAULT_CONFIG)
+        self.config['logging']['level'] = 'WARNING'
+
+    def tearDown(self):
+        stop_logging()
+        os.chdir(self.cwd)
+        self.workdir.cleanup()
+
+    def queue_handlers(self, logger):
+        return [h for h in logger.handlers if isinstance(h, BoundedQueueHandler)]
+
+    def test_setting_up_again_replaces_the_handler(self):
+        logger = setup_logging(self.config)
+        setup_logging(self.config)
+        self.assertEqual(len(self.queue_handlers(logger)), 1)
+
+        stop_logging()
+        self.assertEqual(self.queue_handlers(logger), [])
+
+    def test_records_reach_the_file_after_stop(self):
+        logger = setup_logging(self.config)
+        logger.warning("aviso de prueba")
+        stop_logging()
+        with open('printer_client.log', encoding='utf-8') as f:
+            self.assertIn("aviso de prueba", f.read())
+
+    def test_json_format_writes_one_object_per_line(self):
+        self.config['logging']['format'] = 'json'
+        logger = setup_logging(self.config)
+        logger.warning("aviso %d", 1)
+        logger.error("error de prueba")
+        stop_logging()
+        with open('printer_client.log', encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f]
+        self.assertEqual([(e['level'], e['msg']) for e in entries],
+                         [('WARNING', 'aviso 1'), ('ERROR', 'error de prueba')])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Pruebas del índice de metadatos de G-code del cliente TecMedHub (contra un
+Moonraker falso)
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import copy
+import logging
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from fake_services import FakeMoonraker
+from klipper_client import DEFAULT_CONFIG, MetadataIndex, RobustHTTPClient
+
+
+class MetadataIndexTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.moonraker = FakeMoonraker().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.moonraker.stop()
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.config = copy.deepcopy(DEFAULT_CONFIG)
+        self.config['moonraker_url'] = self.moonraker.url
+        self.config['retries'] = {'max_attempts': 1, 'base_delay': 0.01, 'exponential_backoff': False}
+        self.config['metadata_index']['index_file'] = os.path.join(self.workdir.name, 'file_metadata.json')
+        self.logger = logging.getLogger('test')
+        self.http = RobustHTTPClient(self.config, self.logger, RobustHTTPClient.new_session())
+        self.indexes = []
+
+    def tearDown(self):
+        for index in self.indexes:
+            index.stop()
+        self.http.session.close()
+        self.workdir.cleanup()
+
+    def build(self) -> MetadataIndex:
+        index = MetadataIndex(self.config, self.logger)
+        index.start(self.http)
+        self.indexes.append(index)
+        return index
+
+    def schedule_and_wait(self, index, files) -> int:
+        """Encolar y esperar a los workers; devuelve cuántas consultas hicieron"""
+        before = self.moonraker.requests
+        index.schedule(files)
+        deadline = time.monotonic() + 10
+        while index.queued and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(index.queued)
+        return self.moonraker.requests - before
+
+    def test_new_files_are_indexed_in_the_background(self):
+        index = self.build()
+        self.assertEqual(self.schedule_and_wait(index, self.moonraker.files[:5]), 5)
+        self.assertEqual(index.get('pieza_0.gcode'), {
+            'estimated_time': 3600, 'filament_total': 5000.0, 'layer_height': 0.2,
+            'thumbnail': '.thumbs/p-300x300.png'  # Solo la miniatura más grande
+        })
+        self.assertIsNone(index.get('pieza_9.gcode'))
+
+    def test_known_files_are_not_queried_again(self):
+        index = self.build()
+        self.schedule_and_wait(index, self.moonraker.files)
+        self.assertEqual(self.schedule_and_wait(index, self.moonraker.files), 0)
+
+        changed = [dict(f) for f in self.moonraker.files]
+        changed[3]['modified'] += 60  # Archivo sobrescrito con el mismo nombre
+        self.assertEqual(self.schedule_and_wait(index, changed), 1)
+
+    def test_index_survives_a_restart(self):
+        index = self.build()
+        self.schedule_and_wait(index, self.moonraker.files)
+        index.stop()
+
+        index = self.build()
+        self.assertEqual(len(index.entries), len(self.moonraker.files))
+        self.assertEqual(self.schedule_and_wait(index, self.moonraker.files), 0)
+
+    def test_deleted_files_are_forgotten_but_an_empty_list_is_ignored(self):
+        index = self.build()
+        self.schedule_and_wait(index, self.moonraker.files[:3])
+        index.schedule([])  # Moonraker no respondió
+        self.assertEqual(len(index.entries), 3)
+
+        self.schedule_and_wait(index, self.moonraker.files[:1])
+        self.assertEqual(list(index.entries), ['pieza_0.gcode'])
+        self.assertTrue(index.dirty)
+
+    def test_corrupt_index_is_rebuilt(self):
+        with open(self.config['metadata_index']['index_file'], 'w') as f:
+            f.write('{"pieza_0.gcode": ')
+        index = self.build()
+        self.assertEqual(index.entries, {})
+        self.assertEqual(self.schedule_and_wait(index, self.moonraker.files[:2]), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la interface con Moonraker del cliente TecMedHub (contra un
+Moonraker falso)
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import copy
+import logging
+import os
+import sys
+import unittest
+from urllib.parse import parse_qs, urlparse
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from fake_services import FakeMoonraker
+from klipper_client import DEFAULT_CONFIG, MoonrakerInterface, RobustHTTPClient
+
+
+class MoonrakerTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.fake = FakeMoonraker().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.fake.stop()
+
+    def build(self, **anomaly_detection):
+        config = copy.deepcopy(DEFAULT_CONFIG)
+        config['moonraker_url'] = self.fake.url
+        config['retries'] = {'max_attempts': 1, 'base_delay': 0.01, 'exponential_backoff': False}
+        config['anomaly_detection'].update(anomaly_detection)
+        logger = logging.getLogger('test')
+        return MoonrakerInterface(config, logger, RobustHTTPClient(config, logger))
+
+    @staticmethod
+    def queried(moonraker):
+        """Objeto -> atributos de la consulta de estado"""
+        query = parse_qs(urlparse(moonraker.status_query).query)
+        return {obj: values[0].split(',') for obj, values in query.items()}
+
+
+class StatusProjectionTest(MoonrakerTestCase):
+
+    def test_query_lists_only_the_used_attributes(self):
+        queried = self.queried(self.build())
+        self.assertEqual(queried['print_stats'], list(MoonrakerInterface.STATUS_FIELDS['print_stats']))
+        self.assertNotIn('toolhead', queried)
+        self.assertNotIn('motion_report', queried)
+        self.assertTrue(all(attrs for attrs in queried.values()))  # Nunca un objeto completo
+
+    def test_status_contains_only_the_projection(self):
+        moonraker = self.build()
+        status = moonraker.get_full_status()
+        self.assertEqual(set(status['print_stats']), set(MoonrakerInterface.STATUS_FIELDS['print_stats']))
+        self.assertNotIn('toolhead', status)
+        self.assertEqual(moonraker.klippy_state, 'ready')
+
+    def test_filament_sensors_are_added_with_their_fields(self):
+        moonraker = self.build(filament_sensors=['filament_switch_sensor runout'])
+        self.assertEqual(self.queried(moonraker)['filament_switch_sensor runout'],
+                         list(MoonrakerInterface.SENSOR_FIELDS))
+        self.assertIn('filament_switch_sensor%20runout=', moonraker.status_query)
+
+    def test_objects_missing_from_klipper_are_not_queried(self):
+        moonraker = self.build(filament_sensors=['filament_switch_sensor runout'])
+        self.assertTrue(moonraker.discover_objects())
+        self.assertNotIn('filament_switch_sensor runout', self.queried(moonraker))
+        self.assertIn('print_stats', self.queried(moonraker))
+
+    def test_unreachable_moonraker(self):
+        self.fake.faults.down = True
+        try:
+            moonraker = self.build()
+            self.assertEqual(moonraker.get_full_status(), {})
+        finally:
+            self.fake.faults.down = False
+        self.assertEqual(moonraker.klippy_state, 'unavailable')
+
+
+class ChannelDiscoveryTest(MoonrakerTestCase):
+
+    def test_discovered_heaters_sensors_and_fans(self):
+        moonraker = self.build()
+        channels = moonraker.collect_channels(moonraker.get_full_status())  # Descubre en la primera consulta
+
+        self.assertEqual([h['name'] for h in channels['heaters']], ['extruder', 'extruder1', 'chamber', 'heater_bed'])
+        self.assertEqual([s['name'] for s in channels['temperature_sensors']], ['raspberry_pi'])
+        self.assertEqual(sorted(f['name'] for f in channels['fans']), ['exhaust', 'fan'])
+
+        chamber = next(h for h in channels['heaters'] if h['name'] == 'chamber')
+        self.assertEqual(chamber, {'name': 'chamber', 'temp': 38.0, 'target': 40, 'power': 20})
+        self.assertEqual(self.queried(moonraker)['heater_generic chamber'], ['temperature', 'target', 'power'])
+
+    def test_without_discovery_uses_the_usual_channels(self):
+        moonraker = self.build()
+        self.assertEqual(sorted(name for _, name, _ in moonraker.channel_table), ['extruder', 'fan', 'heater_bed'])
+
+    def test_klippy_restart_discovers_again(self):
+        moonraker = self.build()
+        moonraker.discover_objects()
+        moonraker.objects = ['extruder', 'heater_bed', 'webhooks', 'print_stats']
+        moonraker._build_status_query()
+
+        self.fake.klippy_state = 'startup'
+        try:
+            moonraker.get_full_status()
+        finally:
+            self.fake.klippy_state = 'ready'
+        moonraker.get_full_status()
+        self.assertIn('extruder1', moonraker.objects)
+        self.assertIn('extruder1', self.queried(moonraker))
+
+
+if __name__ == "__main__":
+    unittest.main()
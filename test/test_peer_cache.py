@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la caché de G-code entre impresoras de la red local del cliente
+TecMedHub (varias instancias locales contra el servidor falso)
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import copy
+import hashlib
+import logging
+import os
+import socket
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from fake_services import FakeServer
+from klipper_client import DEFAULT_CONFIG, FileManager, PeerCache, RobustHTTPClient
+
+DATA = os.urandom(300 * 1024)
+MD5 = hashlib.md5(DATA).hexdigest()
+
+
+def free_port(kind=socket.SOCK_STREAM) -> int:
+    with socket.socket(socket.AF_INET, kind) as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class PeerCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.server = FakeServer().start()
+        self.server.downloads['pieza.gcode'] = DATA
+        self.instances = []
+
+    def tearDown(self):
+        for file_manager in self.instances:
+            file_manager.peers.stop()
+        self.server.stop()
+        self.workdir.cleanup()
+
+    def build(self, count, discovery=False):
+        """'count' impresoras: con pares fijos entre sí, o con multicast"""
+        ports = [free_port() for _ in range(count)]
+        discovery_port = free_port(socket.SOCK_DGRAM)
+        logger = logging.getLogger('test')
+        for index, port in enumerate(ports):
+            root = os.path.join(self.workdir.name, f'printer{index}')
+            config = copy.deepcopy(DEFAULT_CONFIG)
+            config['retries'] = {'max_attempts': 1, 'base_delay': 0.01, 'exponential_backoff': False}
+            config['file_management']['gcode_directory'] = os.path.join(root, 'gcodes')
+            config['gcode_cache']['index_file'] = os.path.join(root, 'gcode_cache.json')
+            config['download_throttle']['lower_priority'] = False
+            config['peer_cache'].update({
+                'enabled': True, 'port': port, 'discovery': discovery, 'discovery_port': discovery_port,
+                'bind': '0.0.0.0' if discovery else '127.0.0.1',
+                'peers': [] if discovery else [f"http://127.0.0.1:{p}" for p in ports],  # Incluye la propia
+                'announce_interval': 5
+            })
+            file_manager = FileManager(config, logger, RobustHTTPClient(config, logger))
+            file_manager.peers = PeerCache(config, logger, file_manager)
+            file_manager.peers.STATIC_REFRESH = 0  # Todas arrancan en el mismo segundo que descargan
+            file_manager.peers.start()
+            self.instances.append(file_manager)
+        return self.instances
+
+    def download(self, file_manager, checksum=MD5):
+        success, error = file_manager.download_file(
+            'pieza.gcode', f"{self.server.files_url}?action=download_file&file=pieza.gcode", checksum)
+        self.assertTrue(success, error)
+        with open(file_manager.gcode_dir / 'pieza.gcode', 'rb') as f:
+            self.assertEqual(f.read(), DATA)
+
+    def test_server_sends_one_copy_for_the_whole_lab(self):
+        first, *others = self.build(3)
+        self.assertEqual(first.peers.lookup(MD5), [])
+        self.download(first)
+        for file_manager in others:
+            self.download(file_manager)
+
+        self.assertEqual(self.server.served['pieza.gcode'], 1)
+        self.assertEqual(first.peers.stats['served'] + others[0].peers.stats['served'], 2)
+        self.assertEqual(others[1].peers.stats['hits'], 1)
+
+    def test_own_instance_is_not_a_peer(self):
+        first, second = self.build(2)
+        self.download(first)
+        first.peers._poll_static_peers()
+        self.assertEqual(first.peers.lookup(MD5), [])
+        self.assertEqual(second.peers.lookup(MD5), [f"http://127.0.0.1:{first.peers.port}"])
+
+    def test_corrupt_peer_copy_falls_back_to_the_server(self):
+        first, second = self.build(2)
+        self.download(first)
+        with open(first.gcode_dir / 'pieza.gcode', 'r+b') as f:
+            f.write(b'X' * 100)  # La copia del par se dañó después de verificarla
+
+        self.download(second)
+        self.assertEqual(self.server.served['pieza.gcode'], 2)
+        self.assertEqual((second.peers.stats['hits'], second.peers.stats['misses']), (0, 1))
+
+    def test_without_checksum_peers_are_not_asked(self):
+        first, second = self.build(2)
+        self.download(first)
+        self.download(second, checksum='')
+        self.assertEqual(self.server.served['pieza.gcode'], 2)
+        self.assertEqual(first.peers.stats['served'], 0)
+
+    def test_multicast_discovery(self):
+        first, second = self.build(2, discovery=True)
+        if first.peers.sock is None or second.peers.sock is None:
+            self.skipTest("Multicast no disponible en este equipo")
+        self.download(first)
+        deadline = time.monotonic() + 3
+        while not second.peers.lookup(MD5) and time.monotonic() < deadline:
+            time.sleep(0.05)
+        if not second.peers.lookup(MD5):
+            self.skipTest("Los anuncios multicast no llegan en este equipo")
+        self.download(second)
+        self.assertEqual(self.server.served['pieza.gcode'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la descarga anticipada del cliente TecMedHub (contra el servidor
+falso)
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import copy
+import logging
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from fake_services import FakeServer
+from klipper_client import DEFAULT_CONFIG, FileManager, FilePrefetcher, RobustHTTPClient
+
+
+class FilePrefetcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.server = FakeServer().start()
+        self.server.downloads = {
+            'propio.gcode': b'G1 X1\n' * 100,
+            'global.gcode': b'G28\n' * 100,
+            'de_otra.gcode': b'G1 Y1\n' * 100
+        }
+        self.server.owners = {'propio.gcode': 'token-a', 'de_otra.gcode': 'token-b'}
+
+        config = copy.deepcopy(DEFAULT_CONFIG)
+        config.update(files_url=self.server.files_url, printer_token='token-a')
+        config['retries'] = {'max_attempts': 1, 'base_delay': 0.01, 'exponential_backoff': False}
+        config['file_management']['gcode_directory'] = os.path.join(self.workdir.name, 'gcodes')
+        config['gcode_cache']['index_file'] = os.path.join(self.workdir.name, 'gcode_cache.json')
+        config['peer_cache']['enabled'] = False
+        logger = logging.getLogger('test')
+        self.file_manager = FileManager(config, logger, RobustHTTPClient(config, logger))
+        self.prefetcher = FilePrefetcher(config, logger, self.file_manager, lambda: True)
+
+    def tearDown(self):
+        self.server.stop()
+        self.workdir.cleanup()
+
+    def test_only_assigned_files_are_prefetched_and_marked(self):
+        self.assertTrue(self.prefetcher.sync())
+        self.assertEqual(sorted(os.listdir(self.file_manager.gcode_dir)), ['propio.gcode'])
+        self.assertEqual(self.server.served, {'propio.gcode': 1})
+        self.assertEqual(self.server.downloaded, {'propio.gcode'})
+
+    def test_only_assigned_files_are_pinned(self):
+        self.prefetcher.sync()
+        cache = self.file_manager.cache
+        self.assertTrue(cache.is_pinned('propio.gcode'))
+        self.assertFalse(cache.is_pinned('global.gcode'))
+
+    def test_current_copy_is_not_downloaded_again(self):
+        self.prefetcher.sync()
+        self.prefetcher.sync()
+        self.assertEqual(self.server.served, {'propio.gcode': 1})
+
+    def test_global_library_is_not_prefetched(self):
+        self.server.owners = {}  # Todo global
+        self.assertTrue(self.prefetcher.sync())
+        self.assertEqual(os.listdir(self.file_manager.gcode_dir), [])
+        self.assertEqual(self.server.downloaded, set())
+
+
+if __name__ == "__main__":
+    unittest.main()
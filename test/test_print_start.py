@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Pruebas del inicio de impresión con precalentamiento y descarga en paralelo
+del cliente TecMedHub (contra Moonraker y servidor falsos)
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import copy
+import hashlib
+import logging
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from fake_services import FakeMoonraker, FakeServer
+from klipper_client import (DEFAULT_CONFIG, CommandProcessor, FileManager,
+                            MoonrakerInterface, RobustHTTPClient)
+
+GCODE = (b"; generated by PrusaSlicer\n"
+         b"M140 S65\n"
+         b"M104 S215\n"
+         b"G28\n" + b"G1 X10 Y10 E0.5\n" * 20000)
+
+
+class PipelinedPrintTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.moonraker = FakeMoonraker().start()
+        cls.server = FakeServer().start()
+        cls.server.downloads['pieza.gcode'] = GCODE
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.moonraker.stop()
+        cls.server.stop()
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.moonraker.gcode_scripts.clear()
+        self.moonraker.script_times.clear()
+        self.moonraker.print_starts.clear()
+        self.moonraker.print_state = 'standby'
+        self.server.faults.delay = 0.0
+
+    def tearDown(self):
+        self.moonraker.print_state = 'printing'
+        self.server.faults.delay = 0.0
+        self.workdir.cleanup()
+
+    def build(self, **print_start):
+        config = copy.deepcopy(DEFAULT_CONFIG)
+        config['moonraker_url'] = self.moonraker.url
+        config['retries'] = {'max_attempts': 1, 'base_delay': 0.01, 'exponential_backoff': False}
+        config['file_management']['gcode_directory'] = self.workdir.name
+        config['print_start'].update(print_start)
+        logger = logging.getLogger('test')
+        http = RobustHTTPClient(config, logger)
+        return CommandProcessor(config, logger, MoonrakerInterface(config, logger, http),
+                                FileManager(config, logger, http))
+
+    def print_file(self, processor, checksum=None, **params):
+        params.update(file='pieza.gcode', checksum=hashlib.md5(GCODE).hexdigest() if checksum is None else checksum,
+                      download_url=f"{self.server.files_url}?action=download_file&file=pieza.gcode")
+        return processor.print_file(params)
+
+    def test_preheat_from_command_runs_during_the_download(self):
+        self.server.faults.delay = 0.5  # Enlace lento
+        started = time.monotonic()
+        self.assertTrue(self.print_file(self.build(), hotend_temp=210, bed_temp=60))
+
+        self.assertEqual(self.moonraker.gcode_scripts, ["M104 S210\nM140 S60"])
+        self.assertEqual([name for _, name in self.moonraker.print_starts], ['pieza.gcode'])
+        preheated_after = self.moonraker.script_times[0] - started
+        printed_after = self.moonraker.print_starts[0][0] - started
+        self.assertLess(preheated_after, 0.4)  # Antes de que llegue el archivo
+        self.assertGreaterEqual(printed_after, 0.5)
+        with open(os.path.join(self.workdir.name, 'pieza.gcode'), 'rb') as f:
+            self.assertEqual(f.read(), GCODE)
+
+    def test_preheat_from_the_gcode_header(self):
+        self.assertTrue(self.print_file(self.build()))
+        self.assertEqual(self.moonraker.gcode_scripts, ["M140 S65\nM104 S215"])
+        self.assertLess(self.moonraker.script_times[0], self.moonraker.print_starts[0][0])
+
+    def test_bad_checksum_cools_down_and_does_not_print(self):
+        self.assertFalse(self.print_file(self.build(), checksum='0' * 32, hotend_temp=210))
+        self.assertEqual(self.moonraker.gcode_scripts, ["M104 S210", "M104 S0\nM140 S0"])
+        self.assertEqual(self.moonraker.print_starts, [])
+        self.assertEqual(os.listdir(self.workdir.name), [])  # Ni el archivo ni el .part
+
+    def test_heaters_are_not_touched_while_printing(self):
+        self.moonraker.print_state = 'printing'
+        self.print_file(self.build(), hotend_temp=210, bed_temp=60)
+        self.assertEqual(self.moonraker.gcode_scripts, [])
+
+    def test_sequential_mode_downloads_before_heating(self):
+        self.assertTrue(self.print_file(self.build(pipelined=False), hotend_temp=210))
+        self.assertEqual(self.moonraker.gcode_scripts, [])
+        self.assertEqual(len(self.moonraker.print_starts), 1)
+
+    def test_file_already_present_prints_right_away(self):
+        with open(os.path.join(self.workdir.name, 'pieza.gcode'), 'wb') as f:
+            f.write(GCODE)
+        served = self.server.served.get('pieza.gcode', 0)
+        self.assertTrue(self.print_file(self.build(), hotend_temp=210))
+        self.assertEqual(self.server.served.get('pieza.gcode', 0), served)
+        self.assertEqual(self.moonraker.gcode_scripts, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Pruebas del profiling bajo demanda del cliente TecMedHub
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import copy
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from klipper_client import DEFAULT_CONFIG, Profiler
+
+
+def busy_loop_for_profiler(stop: threading.Event):
+    """Carga conocida para buscar en las pilas muestreadas"""
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+class ProfilerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.config = copy.deepcopy(DEFAULT_CONFIG)
+        self.config['profiling'].update(output_dir=self.workdir.name, sample_interval=0.005)
+        self.reports = []
+        self.profiler = Profiler(self.config, logging.getLogger('test'), self.reports.append)
+
+        self.stop_load = threading.Event()
+        self.load = threading.Thread(target=busy_loop_for_profiler, args=(self.stop_load,), name='carga')
+        self.load.start()
+
+    def tearDown(self):
+        self.profiler.stop()
+        self.stop_load.set()
+        self.load.join()
+        self.workdir.cleanup()
+
+    def wait(self):
+        self.profiler.thread.join(timeout=10)
+        self.assertFalse(self.profiler.running)
+
+    def test_report_shows_where_the_threads_are(self):
+        self.assertTrue(self.profiler.start(0.3, reason='prueba'))
+        self.wait()
+
+        files = sorted(os.listdir(self.workdir.name))
+        self.assertEqual([os.path.splitext(name)[1] for name in files], ['.folded', '.txt'])
+        with open(os.path.join(self.workdir.name, files[1]), encoding='utf-8') as f:
+            summary = f.read()
+        self.assertIn('Motivo: prueba', summary)
+        self.assertIn('[carga] busy_loop_for_profiler (test_profiler.py:', summary)
+        self.assertIn('== Crecimiento de memoria del cliente ==', summary)
+
+        with open(os.path.join(self.workdir.name, files[0]), encoding='utf-8') as f:
+            folded = f.read().splitlines()
+        self.assertTrue(folded)
+        for line in folded:
+            stack, count = line.rsplit(' ', 1)
+            self.assertGreater(int(count), 0)
+            self.assertFalse(stack.startswith('profiler;'))  # El hilo del profiler no se muestrea
+        self.assertTrue(any(line.startswith('carga;') for line in folded))
+
+    def test_one_session_at_a_time_and_stop_cuts_it_short(self):
+        started = time.monotonic()
+        self.assertTrue(self.profiler.start(60))
+        self.assertFalse(self.profiler.start(60))
+        time.sleep(0.1)
+        self.profiler.stop()
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertFalse(self.profiler.running)
+        self.assertEqual(len(os.listdir(self.workdir.name)), 2)  # El reporte se escribe igual
+
+    def test_upload_only_when_configured(self):
+        self.profiler.start(0.05)
+        self.wait()
+        self.assertEqual(self.reports, [])
+
+        self.config['profiling']['upload'] = True
+        self.profiler.apply_config(self.config)
+        self.profiler.start(0.05)
+        self.wait()
+        self.assertEqual(len(self.reports), 1)
+        self.assertEqual(sorted(self.reports[0]), ['created', 'stacks', 'summary'])
+
+    def test_old_reports_are_rotated(self):
+        self.config['profiling']['max_reports'] = 2
+        self.profiler.apply_config(self.config)
+        for i in range(4):
+            report = {'created': f'20260101-00000{i}', 'summary': 'x\n', 'stacks': ''}
+            self.profiler._write(report)
+        self.assertEqual(sorted(os.listdir(self.workdir.name)), [
+            'profile-20260101-000002.folded', 'profile-20260101-000002.txt',
+            'profile-20260101-000003.folded', 'profile-20260101-000003.txt'
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Pruebas del planificador de tareas del cliente TecMedHub
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from klipper_client import Scheduler
+
+
+class FakeClock:
+    """Reloj monotónico que solo avanza cuando la prueba lo pide"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class SchedulerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = FakeClock()
+        patcher = mock.patch('tecmedhub.scheduler.time', self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.runs = []
+
+    def build(self, **scheduler_config):
+        return Scheduler({'scheduler': dict({'jitter': 0}, **scheduler_config)}, logging.getLogger('test'))
+
+    def job(self, duration=0.0):
+        """Tarea que anota cuándo corrió (relativo al inicio) y tarda 'duration'"""
+        def run():
+            self.runs.append(round(self.clock.now - 1000, 3))
+            self.clock.now += duration
+        return run
+
+    def advance_to(self, scheduler, t):
+        """Avanzar el reloj hasta t ejecutando lo que vence en el camino"""
+        while True:
+            delay = scheduler.run_pending()
+            if delay is None or self.clock.now + delay > 1000 + t:
+                self.clock.now = 1000 + t
+                scheduler.run_pending()
+                return
+            self.clock.now += delay
+
+    def test_job_duration_does_not_drift(self):
+        scheduler = self.build()
+        scheduler.add('status_update', self.job(duration=3), 10)
+        self.advance_to(scheduler, 45)
+        self.assertEqual(self.runs, [0, 10, 20, 30, 40])  # No 0, 13, 26, 39
+
+    def test_misfire_policies(self):
+        # La ejecución de las 10 corre tarde a las 35; las de las 20 y las 30 son las perdidas
+        for policy, expected, skipped in (('skip', [0, 35, 40], 2),
+                                          ('catch_up', [0, 35, 35, 35, 40], 0),
+                                          ('reschedule', [0, 35, 45], 0)):
+            with self.subTest(policy=policy):
+                self.clock.now = 1000.0
+                self.runs = []
+                scheduler = self.build(misfire=policy)
+                scheduler.add('tarea', self.job(), 10)
+                scheduler.run_pending()
+                self.clock.now = 1035  # El equipo estuvo colgado 35 s
+                self.advance_to(scheduler, 45)
+                self.assertEqual(self.runs, expected)
+                self.assertEqual(scheduler.stats()['tarea']['skipped'], skipped)
+
+    def test_jitter_delays_runs_without_moving_the_grid(self):
+        scheduler = self.build(jitter=0.5)
+        scheduler.add('tarea', self.job(), 10)
+        self.advance_to(scheduler, 100)
+        self.assertEqual(len(self.runs), 10)
+        for k, t in enumerate(self.runs):
+            self.assertTrue(10 * k <= t < 10 * k + 5, self.runs)
+
+    def test_per_job_override_and_interval_reread(self):
+        interval = {'value': 10}
+        scheduler = self.build(jitter=0.5, jobs={'tarea': {'jitter': 0}})
+        scheduler.add('tarea', self.job(), lambda: interval['value'])
+        self.advance_to(scheduler, 15)
+        interval['value'] = 2  # Recarga de configuración
+        self.advance_to(scheduler, 25)
+        self.assertEqual(self.runs, [0, 10, 20, 22, 24])
+
+    def test_run_soon_restarts_the_grid_from_now(self):
+        scheduler = self.build()
+        scheduler.add('tarea', self.job(), 10)
+        self.advance_to(scheduler, 4)
+        scheduler.run_soon('tarea')
+        self.advance_to(scheduler, 25)
+        self.assertEqual(self.runs, [0, 4, 14, 24])
+
+    def test_delay_and_lateness_stats(self):
+        scheduler = self.build(late_warning=1)
+        scheduler.add('tarea', self.job(duration=0.5), 10, delay=5)
+        self.clock.now = 1007  # Dos segundos tarde
+        with self.assertLogs('test', 'WARNING') as logs:
+            scheduler.run_pending()
+        self.assertIn("Tarea 'tarea' ejecutada 2.0s tarde", logs.output[0])
+        self.assertEqual(self.runs, [7])
+        self.assertEqual(scheduler.stats()['tarea'], {
+            'runs': 1, 'skipped': 0, 'late_avg_ms': 2000.0, 'late_max_ms': 2000.0,
+            'duration_avg_ms': 500.0, 'duration_max_ms': 500.0
+        })
+        self.assertEqual(scheduler.run_pending(), 7.5)  # Próxima en la grilla: 15
+
+
+class SchedulerWakeupTest(unittest.TestCase):
+
+    def test_sleeps_until_the_next_job_and_wakes_for_new_ones(self):
+        scheduler = Scheduler({'scheduler': {'jitter': 0}}, logging.getLogger('test'))
+        wakeups = []
+        wait = scheduler._wait
+        scheduler._wait = lambda timeout: (wakeups.append(timeout), wait(timeout))
+        ran = threading.Event()
+        running = True
+
+        scheduler.add('lejana', lambda: None, 3600)
+        loop = threading.Thread(target=scheduler.run, args=(lambda: running,), daemon=True)
+        loop.start()
+        time.sleep(0.2)
+        self.assertEqual(len(wakeups), 1)  # Una sola espera larga, sin sondeo
+        self.assertGreater(wakeups[0], 3599)
+
+        started = time.monotonic()
+        scheduler.add('nueva', ran.set, 60)
+        self.assertTrue(ran.wait(1))
+        self.assertLess(time.monotonic() - started, 0.1)
+
+        running = False
+        scheduler.wake()
+        loop.join(timeout=2)
+        self.assertFalse(loop.is_alive())
+
+
+class SchedulerStopTest(unittest.TestCase):
+
+    def test_stop_is_noticed_while_jobs_are_always_due(self):
+        scheduler = Scheduler({'scheduler': {'jitter': 0, 'misfire': 'catch_up'}}, logging.getLogger('test'))
+        running = True
+        abandoned = False
+
+        def overrunning_job():
+            if abandoned:
+                raise RuntimeError("prueba abandonada")
+            time.sleep(0.02)  # Más que el intervalo: siempre queda algo vencido
+
+        scheduler.add('lenta', overrunning_job, 0.01)
+        loop = threading.Thread(target=scheduler.run, args=(lambda: running,), daemon=True)
+        loop.start()
+        time.sleep(0.2)
+        running = False
+        scheduler.wake()
+        loop.join(timeout=2)
+        abandoned = True
+        self.assertFalse(loop.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()
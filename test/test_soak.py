@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Pruebas del soak test del cliente TecMedHub: que detecte crecimiento y
+empeoramiento de latencia, y una corrida corta de punta a punta
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import contextlib
+import io
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+import soak_test
+
+
+def samples(rss_growth_kb=0, fd_growth=0, count=100):
+    return [{'simulated_hours': i, 'rss_kb': 30000 + rss_growth_kb * i // count,
+             'fds': 10 + fd_growth * i // count, 'threads': 5, 'fault': ''} for i in range(count)]
+
+
+def latencies(first=0.05, last=0.05, count=100):
+    return [(i, first if i < count // 2 else last, True) for i in range(count)]
+
+
+class EvaluateTest(unittest.TestCase):
+
+    def evaluate(self, samples, latencies, returncode=0):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            result = soak_test.evaluate(soak_test.parse_args([]), samples, latencies, returncode)
+        return result, output.getvalue()
+
+    def test_flat_run_passes(self):
+        result, output = self.evaluate(samples(), latencies())
+        self.assertEqual(result, 0)
+        self.assertIn('✅ Soak test OK', output)
+
+    def test_memory_and_descriptor_leaks_fail(self):
+        result, output = self.evaluate(samples(rss_growth_kb=20 * 1024, fd_growth=20), latencies())
+        self.assertEqual(result, 1)
+        self.assertIn('rss_kb: creció', output)
+        self.assertIn('fds: creció', output)
+
+    def test_latency_regression_fails(self):
+        result, output = self.evaluate(samples(), latencies(first=0.05, last=0.5))
+        self.assertEqual(result, 1)
+        self.assertIn('Latencia p95 empeoró', output)
+
+        result, output = self.evaluate(samples(), latencies(first=2.5, last=2.5))
+        self.assertIn('supera 2.0s', output)
+
+    def test_client_that_died_early_fails(self):
+        result, output = self.evaluate(samples(count=3), [], returncode=1)
+        self.assertEqual(result, 1)
+        self.assertIn('Muy pocas muestras (3)', output)
+
+
+class HarnessTest(unittest.TestCase):
+
+    def test_fault_schedule_repeats_every_cycle(self):
+        hour = 3600
+        self.assertIsNone(soak_test.current_fault(0.5 * hour))
+        self.assertEqual(soak_test.current_fault(1.65 * hour), 'moonraker_lento')
+        self.assertEqual(soak_test.current_fault(1.95 * hour), 'moonraker_caido')
+        self.assertEqual(soak_test.current_fault(3.75 * hour), 'servidor_500')
+
+    def test_accelerated_clock(self):
+        clock, accelerated_datetime = soak_test.accelerated_clock(100)
+        started = clock.monotonic(), clock.time(), accelerated_datetime.now().timestamp()
+        real_started = time.monotonic()
+        clock.sleep(5)  # 0.05 s reales
+        real = time.monotonic() - real_started
+        self.assertLess(real, 1)
+        self.assertAlmostEqual(clock.monotonic() - started[0], real * 100, delta=1)
+        self.assertAlmostEqual(clock.time() - started[1], real * 100, delta=1)
+        self.assertAlmostEqual(accelerated_datetime.now().timestamp() - started[2], real * 100, delta=1)
+
+    def test_short_run_end_to_end(self):
+        # En 2 s la línea base cae en el arranque del cliente: aquí solo interesa que
+        # la corrida funcione (los umbrales se prueban en EvaluateTest)
+        args = soak_test.parse_args(['--days', '0.005', '--speed', '200', '--sample-interval', '0.05',
+                                     '--max-rss-growth-mb', '500', '--max-fd-growth', '50',
+                                     '--max-thread-growth', '50', '--max-latency-ratio', '100'])
+        output = io.StringIO()
+        started = time.monotonic()
+        with contextlib.redirect_stdout(output):
+            result = soak_test.run_soak(args)
+        self.assertEqual(result, 0, output.getvalue())
+        self.assertRegex(output.getvalue(), r'updates +[1-9]\d* +[1-9]')  # Hubo actualizaciones exitosas
+        self.assertLess(time.monotonic() - started, 15)  # El cliente se detiene con terminate()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Pruebas del arranque del cliente TecMedHub (proceso real contra los
+servicios falsos)
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__))
+
+from bench_startup import CLIENT, build_config
+from fake_services import FakeMoonraker, FakeServer
+
+
+class StartupTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.server = FakeServer().start()
+        self.moonraker = FakeMoonraker().start()
+
+    def tearDown(self):
+        self.server.stop()
+        self.moonraker.stop()
+        self.workdir.cleanup()
+
+    def run_client(self, fast_start):
+        config = build_config(self.server, self.moonraker, fast_start, os.path.join(self.workdir.name, 'gcodes'))
+        config['retries'] = {'max_attempts': 1, 'base_delay': 0.01, 'exponential_backoff': False}
+        with open(os.path.join(self.workdir.name, 'printer_config.json'), 'w') as f:
+            json.dump(config, f)
+        return subprocess.run([sys.executable, CLIENT], cwd=self.workdir.name, timeout=60,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode
+
+    def test_fast_start_failure_reports_error_and_exits(self):
+        self.moonraker.faults.down = True
+        self.assertEqual(self.run_client(fast_start=True), 1)
+        statuses = [payload.get('status') for _, payload in self.server.updates]
+        self.assertEqual(statuses, ['booting', 'error'])
+
+    def test_failure_without_fast_start_exits(self):
+        self.moonraker.faults.down = True
+        self.assertEqual(self.run_client(fast_start=False), 1)
+        self.assertEqual(self.server.updates, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Pruebas del estado persistente del cliente TecMedHub
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from klipper_client import JsonStateBackend, StateManager
+
+
+class StateManagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.workdir.name, 'printer_state.json')
+
+    def tearDown(self):
+        self.workdir.cleanup()
+
+    def test_changes_are_written_only_after_the_interval(self):
+        manager = StateManager(self.path, flush_interval=3600)
+        manager.state['total_updates'] = 1
+        manager.mark_dirty()
+        self.assertFalse(manager.maybe_flush())
+        self.assertFalse(os.path.exists(self.path))
+
+        manager.last_flush -= 3600
+        self.assertTrue(manager.maybe_flush())
+        self.assertFalse(manager.maybe_flush())  # Ya no está sucio
+        self.assertEqual(manager.writes, 1)
+
+    def test_pending_updates_survive_a_restart(self):
+        manager = StateManager(self.path)
+        manager.add_pending_update({'status': 'idle'})
+        manager.close()
+
+        reloaded = StateManager(self.path)
+        self.assertEqual([u['data'] for u in reloaded.get_pending_updates()], [{'status': 'idle'}])
+        self.assertNotIn('pending_updates', reloaded.state)
+
+    def test_corrupt_file_is_quarantined(self):
+        with open(self.path, 'w') as f:
+            f.write('{"total_updates": 3')
+        manager = StateManager(self.path)
+        self.assertIsNotNone(manager.load_error)
+        self.assertEqual(manager.state['total_updates'], 0)
+        self.assertTrue(os.path.exists(self.path + '.corrupt'))
+
+    def test_failed_write_keeps_the_previous_file(self):
+        backend = JsonStateBackend(self.path)
+        backend.write({'version': 1})
+        with mock.patch('os.replace', side_effect=OSError('disco lleno')):
+            with self.assertRaises(OSError):
+                backend.write({'version': 2})
+        self.assertEqual(backend.read(), {'version': 1})
+        self.assertEqual(os.listdir(self.workdir.name), ['printer_state.json'])  # Sin temporales
+
+    def test_failed_save_does_not_raise_and_stays_dirty(self):
+        manager = StateManager(self.path)
+        manager.mark_dirty()
+        with mock.patch.object(manager.backend, 'write', side_effect=OSError('solo lectura')):
+            self.assertFalse(manager.save())
+        self.assertTrue(manager.dirty)
+
+    def test_sqlite_backend_round_trip(self):
+        manager = StateManager(self.path, backend='sqlite')
+        manager.state['total_updates'] = 7
+        manager.add_pending_update({'status': 'printing'})
+        manager.close()
+
+        reloaded = StateManager(self.path, backend='sqlite')
+        self.assertEqual(reloaded.state['total_updates'], 7)
+        self.assertEqual(len(reloaded.pending_updates), 1)
+        reloaded.close()
+        self.assertTrue(os.path.exists(os.path.join(self.workdir.name, 'printer_state.db')))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la subida de capturas por streaming del cliente TecMedHub
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import copy
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from email.parser import BytesParser
+from email.policy import HTTP
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from fake_services import FakeServer
+from klipper_client import DEFAULT_CONFIG, MultipartStream, PrinterClient, stop_logging
+
+
+def parse_multipart(content_type, body):
+    """Campos del formulario: nombre -> (nombre de archivo, bytes)"""
+    message = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {content_type}\r\n\r\n".encode() + body)
+    return {part.get_param('name', header='content-disposition'): (part.get_filename(), part.get_payload(decode=True))
+            for part in message.iter_parts()}
+
+
+class MultipartStreamTest(unittest.TestCase):
+
+    def stream(self, data, length=None, buffer_size=1024):
+        return MultipartStream({'token': 'abc'}, 'image', 'snapshot.jpg', 'image/jpeg',
+                               io.BytesIO(data), length=length, buffer_size=buffer_size)
+
+    def test_body_is_valid_multipart_with_known_length(self):
+        data = os.urandom(10000)
+        body = self.stream(data, length=len(data))
+        encoded = b''.join(bytes(chunk) for chunk in body)
+        self.assertEqual(len(encoded), len(body))
+        self.assertEqual(parse_multipart(body.content_type, encoded),
+                         {'token': (None, b'abc'), 'image': ('snapshot.jpg', data)})
+
+    def test_chunks_reuse_one_buffer(self):
+        body = self.stream(os.urandom(10000), buffer_size=1024)
+        chunks = list(body)[1:-1]
+        self.assertEqual(len(chunks), 10)
+        self.assertTrue(all(chunk.obj is body.buffer for chunk in chunks))
+
+    def test_unknown_length_streams_until_the_end(self):
+        data = os.urandom(3000)
+        body = self.stream(data)
+        with self.assertRaises(TypeError):
+            len(body)
+        encoded = b''.join(bytes(chunk) for chunk in body)
+        self.assertEqual(parse_multipart(body.content_type, encoded)['image'][1], data)
+
+    def test_short_camera_response_fails(self):
+        body = self.stream(b'x' * 100, length=200)
+        with self.assertRaises(IOError):
+            list(body)
+
+
+class SnapshotUploadTest(unittest.TestCase):
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.workdir = tempfile.TemporaryDirectory()
+        os.chdir(self.workdir.name)
+        self.server = FakeServer().start()
+        config = copy.deepcopy(DEFAULT_CONFIG)
+        config.update(server_url=self.server.api_url, printer_token='token-a')
+        config['camera']['urls'] = [f"{self.server.url}/snapshot"]
+        config['logging']['level'] = 'WARNING'
+        config['telemetry']['enabled'] = False
+        with open('printer_config.json', 'w') as f:
+            json.dump(config, f)
+        self.client = PrinterClient('printer_config.json')
+
+    def tearDown(self):
+        self.client.shutdown()
+        stop_logging()
+        self.server.stop()
+        os.chdir(self.cwd)
+        self.workdir.cleanup()
+
+    def test_camera_bytes_reach_the_server_unchanged(self):
+        self.assertTrue(self.client.upload_snapshot().startswith('printer_images/'))
+        content_type, body = self.server.uploads[-1]
+        fields = parse_multipart(content_type, body)
+        self.assertEqual(fields['token'], (None, b'token-a'))
+        self.assertEqual(fields['image'], ('snapshot.jpg', self.server.snapshot))
+
+    def test_camera_down_uploads_nothing(self):
+        self.server.faults.down = True
+        self.assertIsNone(self.client.upload_snapshot_stream())
+        self.server.faults.down = False
+        self.assertEqual(self.server.uploads, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
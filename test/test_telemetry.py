@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la telemetría de alta frecuencia del cliente TecMedHub
+
+Uso:
+    python3 -m unittest discover -s test -p 'test_*.py'
+"""
+
+import copy
+import logging
+import math
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(__file__))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'client'))
+
+from fake_services import FakeMoonraker
+from klipper_client import (DEFAULT_CONFIG, MoonrakerInterface, RobustHTTPClient, TelemetryBuffer,
+                            TelemetrySampler, lttb_downsample)
+
+
+class LttbTest(unittest.TestCase):
+
+    def test_keeps_ends_and_peaks(self):
+        times = list(range(1000))
+        values = [0.0] * 1000
+        values[437] = 50.0
+        values[800] = -20.0
+        sampled = lttb_downsample(times, values, 20)
+        self.assertEqual(len(sampled), 20)
+        self.assertEqual(sampled[0], (0, 0.0))
+        self.assertEqual(sampled[-1], (999, 0.0))
+        self.assertIn((437, 50.0), sampled)
+        self.assertIn((800, -20.0), sampled)
+
+    def test_short_series_pass_through(self):
+        self.assertEqual(lttb_downsample([1, 2, 3], [4, 5, 6], 10), [(1, 4), (2, 5), (3, 6)])
+
+
+class TelemetryBufferTest(unittest.TestCase):
+
+    def test_ring_keeps_the_latest_samples_in_order(self):
+        buffer = TelemetryBuffer(['a', 'b'], 3)
+        for t in range(1, 6):
+            buffer.append(t, {'a': t * 10})
+        times, values = buffer.window(0)
+        self.assertEqual(times, [3, 4, 5])
+        self.assertEqual(values['a'], [30, 40, 50])
+        self.assertTrue(all(math.isnan(v) for v in values['b']))
+
+        self.assertEqual(buffer.window(4)[0], [5])
+
+    def test_memory_is_fixed(self):
+        buffer = TelemetryBuffer(['a', 'b'], 100)
+        before = buffer.memory_bytes()
+        for t in range(1000):
+            buffer.append(t, {'a': 1, 'b': 2})
+        self.assertEqual(buffer.memory_bytes(), before)
+        self.assertEqual(before, 100 * 8 + 2 * 100 * 4)
+
+
+class TelemetrySamplerTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.moonraker = FakeMoonraker().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.moonraker.stop()
+
+    def build(self, **telemetry):
+        config = copy.deepcopy(DEFAULT_CONFIG)
+        config['moonraker_url'] = self.moonraker.url
+        config['retries'] = {'max_attempts': 1, 'base_delay': 0.01, 'exponential_backoff': False}
+        config['telemetry'].update(telemetry)
+        logger = logging.getLogger('test')
+        return TelemetrySampler(config, logger, MoonrakerInterface(config, logger, RobustHTTPClient(config, logger)))
+
+    def test_query_asks_only_for_the_sampled_fields(self):
+        sampler = self.build(channels=['extruder.temperature', 'extruder.target', 'fan.speed'])
+        self.assertEqual(sampler.query, "printer/objects/query?extruder=temperature,target&fan=speed")
+
+    def test_report_summarises_the_window(self):
+        sampler = self.build(channels=['extruder.temperature', 'fan.speed', 'no_existe.valor'], series_points=3)
+        for _ in range(5):
+            self.assertTrue(sampler.sample())
+        report = sampler.report()
+
+        self.assertEqual(report['samples'], 5)
+        self.assertEqual(sorted(report['channels']), ['extruder.temperature', 'fan.speed'])
+        temperature = report['channels']['extruder.temperature']
+        self.assertTrue(209 <= temperature['min'] <= temperature['mean'] <= temperature['max'] <= 211)
+        self.assertEqual(report['channels']['fan.speed']['last'], 0.8)
+        self.assertEqual(len(report['series']['fan.speed']), 3)
+
+        # El siguiente reporte solo cubre lo nuevo
+        self.assertEqual(sampler.report()['samples'], 0)
+
+    def test_unreachable_moonraker_is_not_sampled(self):
+        self.moonraker.faults.down = True
+        try:
+            sampler = self.build()
+            self.assertFalse(sampler.sample())
+        finally:
+            self.moonraker.faults.down = False
+        self.assertEqual(sampler.buffer.count, 0)
+
+    def test_reload_keeps_the_buffer_unless_channels_change(self):
+        sampler = self.build(channels=['fan.speed'])
+        sampler.sample()
+        buffer = sampler.buffer
+        config = copy.deepcopy(sampler.config)
+        config['telemetry']['series_points'] = 10
+        sampler.apply_config(config)
+        self.assertIs(sampler.buffer, buffer)
+
+        config['telemetry']['channels'] = ['fan.speed', 'extruder.power']
+        sampler.apply_config(config)
+        self.assertIsNot(sampler.buffer, buffer)
+
+
+if __name__ == "__main__":
+    unittest.main()